@@ -0,0 +1,249 @@
+"""
+Дисковый кэш скачанных книг
+
+Файлы книг хранятся по SHA-256 содержимого (objects/ab/abcdef...), поэтому одинаковые файлы
+разных книг или форматов занимают место один раз. Индекс index.json связывает (ID книги, формат)
+с хешем, исходным именем файла из Content-Disposition, размером и временем последнего обращения.
+Объём ограничен max_bytes: при превышении вытесняются давно не запрашивавшиеся книги (LRU).
+Файлы и индекс пишутся атомарно (временный файл и os.replace), поэтому после падения процесса
+в кэше не остаётся недописанных книг.
+
+Книга записывается в кэш из временного файла скачивания (put_file) без чтения в память целиком.
+Методы выполняют дисковый ввод-вывод - из event loop их вызывают через asyncio.to_thread.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from time import time
+from typing import Any, BinaryIO, Dict, Optional
+
+from .constants import BOOK_CACHE_PATH, BOOK_CACHE_MAX_BYTES
+
+# Книга в кэше: путь к файлу, исходное имя файла, размер в байтах
+CachedBook = namedtuple('CachedBook', ['path', 'filename', 'size'])
+
+INDEX_FILE = 'index.json'
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BookFileCache:
+    """Thread-safe дисковый LRU-кэш файлов книг, ограниченный по объёму"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max(0, max_bytes)
+        self._objects_dir = os.path.join(root, 'objects')
+        self._tmp_dir = os.path.join(root, 'tmp')
+        self._index_path = os.path.join(root, INDEX_FILE)
+
+        self._entries: Dict[str, Dict[str, Any]] = {}  # 'book_id.format' -> sha256, filename, size, last_access
+        self._refs: Dict[str, int] = {}  # sha256 -> число записей, ссылающихся на файл
+        self._bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        if self.max_bytes:
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _key(book_id: int, book_format: str) -> str:
+        return f"{book_id}.{book_format}"
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self._objects_dir, sha256[:2], sha256)
+
+    def _load_index(self) -> None:
+        """Читает индекс; записи без файла на диске отбрасываются"""
+        try:
+            os.makedirs(self._objects_dir, exist_ok=True)
+            os.makedirs(self._tmp_dir, exist_ok=True)
+            if not os.path.exists(self._index_path):
+                return
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+        except Exception as e:
+            print(f"Error loading book cache index {self._index_path}: {e}")
+            return
+
+        for key, entry in entries.items():
+            if not os.path.exists(self._object_path(entry['sha256'])):
+                self._dirty = True
+                continue
+            self._add_entry(key, entry)
+        self._evict()
+
+    def _add_entry(self, key: str, entry: Dict[str, Any]) -> None:
+        sha256 = entry['sha256']
+        self._entries[key] = entry
+        if sha256 not in self._refs:
+            self._refs[sha256] = 0
+            self._bytes += entry['size']
+        self._refs[sha256] += 1
+
+    def _remove_entry(self, key: str) -> None:
+        """Удаляет запись; файл удаляется, когда на него больше не ссылается ни одна запись"""
+        entry = self._entries.pop(key)
+        sha256 = entry['sha256']
+        self._refs[sha256] -= 1
+        if self._refs[sha256] == 0:
+            del self._refs[sha256]
+            self._bytes -= entry['size']
+            try:
+                os.remove(self._object_path(sha256))
+            except OSError:
+                pass
+        self._dirty = True
+
+    def _evict(self) -> None:
+        """Вытесняет давно не запрашивавшиеся книги, пока объём больше max_bytes"""
+        if self._bytes <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]['last_access']):
+            if self._bytes <= self.max_bytes:
+                break
+            self._remove_entry(key)
+            self._evictions += 1
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """Пишет файл через временный файл в каталоге кэша и os.replace"""
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, book_id: int, book_format: str) -> Optional[CachedBook]:
+        """Книга из кэша или None"""
+        if not self.enabled:
+            return None
+        key = self._key(book_id, book_format)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not os.path.exists(self._object_path(entry['sha256'])):
+                # Файл удалён снаружи (например, при очистке tmp)
+                self._remove_entry(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+
+            entry['last_access'] = time()
+            self._dirty = True
+            self._hits += 1
+            return CachedBook(self._object_path(entry['sha256']), entry['filename'], entry['size'])
+
+    def put_file(self, book_id: int, book_format: str, src: BinaryIO, filename: Optional[str]) -> Optional[CachedBook]:
+        """
+        Сохраняет файл книги из открытого двоичного файла (копируется с начала кусками,
+        SHA-256 считается по ходу копирования); книги больше max_bytes не кэшируются
+        """
+        if not self.enabled:
+            return None
+
+        key = self._key(book_id, book_format)
+        tmp_path = None
+        try:
+            src.seek(0)
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+            with os.fdopen(fd, 'wb') as f:
+                while chunk := src.read(COPY_CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            if not size or size > self.max_bytes:
+                return None
+
+            sha256 = digest.hexdigest()
+            path = self._object_path(sha256)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry['sha256'] == sha256 and os.path.exists(path):
+                    # Та же книга уже в кэше
+                    entry['last_access'] = time()
+                    self._dirty = True
+                    return CachedBook(path, entry['filename'], entry['size'])
+                if entry is not None:
+                    self._remove_entry(key)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                    tmp_path = None
+                self._add_entry(key, {
+                    'sha256': sha256,
+                    'filename': filename,
+                    'size': size,
+                    'last_access': time(),
+                })
+                self._evict()
+                self._save_index()
+                if key not in self._entries:
+                    return None
+        except Exception as e:
+            print(f"Error saving book {key} to cache: {e}")
+            return None
+        finally:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        return CachedBook(path, filename, size)
+
+    def _save_index(self) -> None:
+        self._write_atomic(self._index_path, json.dumps({'entries': self._entries}).encode('utf-8'))
+        self._dirty = False
+
+    def flush(self) -> None:
+        """Сохраняет индекс, если менялось время обращения к книгам (периодически и при остановке)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self._save_index()
+            except Exception as e:
+                print(f"Error saving book cache index: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кэша для мониторинга"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'books': len(self._entries),
+                'files': len(self._refs),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'evictions': self._evictions,
+            }
+
+
+BOOK_CACHE = BookFileCache(
+    BOOK_CACHE_PATH,
+    int(os.getenv('BOOK_CACHE_MAX_MB', BOOK_CACHE_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+)
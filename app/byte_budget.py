@@ -0,0 +1,110 @@
+"""
+Общий для процесса бюджет байт книг «в полёте»
+
+Скачиваемые книги и книги, которые сейчас отправляются в Telegram (python-telegram-bot читает
+файл в память целиком), резервируют свой размер в бюджете. Когда бюджет исчерпан, следующие
+скачивания и отправки ждут в очереди (по порядку прихода), а не поднимают потребление памяти
+процесса до OOM при наплыве больших иллюстрированных книг.
+"""
+
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple
+
+from .constants import DOWNLOAD_MEMORY_BUDGET_BYTES
+
+
+class ByteBudget:
+    """
+    Семафор по байтам для event loop
+
+    - Резерв больше всего бюджета урезается до max_bytes: такая книга ждёт, пока бюджет освободится целиком
+    - Очередь FIFO: большой запрос не голодает из-за потока маленьких
+    - max_bytes = 0 - бюджет отключён, reserve() не ждёт
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max(0, max_bytes)
+        self._used = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+        # Метрики
+        self._peak = 0
+        self._reserved = 0
+        self._queued = 0
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        """Держит size байт бюджета на время блока, при нехватке ждёт освобождения"""
+        if not self.max_bytes:
+            yield
+            return
+
+        size = min(max(0, size), self.max_bytes)
+        await self._acquire(size)
+        try:
+            yield
+        finally:
+            self._release(size)
+
+    async def _acquire(self, size: int) -> None:
+        self._reserved += 1
+        if not self._waiters and self._used + size <= self.max_bytes:
+            self._take(size)
+            return
+
+        self._queued += 1
+        future = asyncio.get_running_loop().create_future()
+        waiter = (size, future)
+        self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Резерв выдан, но ожидающего уже отменили - возвращаем
+                self._release(size)
+            else:
+                self._waiters.remove(waiter)
+                self._wake()
+            raise
+
+    def _take(self, size: int) -> None:
+        self._used += size
+        self._peak = max(self._peak, self._used)
+
+    def _release(self, size: int) -> None:
+        self._used -= size
+        self._wake()
+
+    def _wake(self) -> None:
+        """Выдаёт резерв ожидающим по порядку, пока хватает бюджета"""
+        while self._waiters:
+            size, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self._used + size > self.max_bytes:
+                break
+            self._waiters.popleft()
+            self._take(size)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает статистику для мониторинга"""
+        return {
+            'used_bytes': self._used,
+            'max_bytes': self.max_bytes,
+            'peak_bytes': self._peak,
+            'waiting': len(self._waiters),
+            'reserved': self._reserved,
+            'queued': self._queued,
+        }
+
+
+DOWNLOAD_BUDGET = ByteBudget(
+    'downloads',
+    int(os.getenv('DOWNLOAD_MEMORY_BUDGET_MB', DOWNLOAD_MEMORY_BUDGET_BYTES // (1024 * 1024))) * 1024 * 1024
+)
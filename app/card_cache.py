@@ -0,0 +1,114 @@
+"""
+Кэш карточек книг и авторов в DatabaseBooks
+
+Карточки (информация о книге, аннотация, информация об авторе) и готовый HTML сообщений
+не меняются до следующего обновления каталога, а открывают чаще всего одни и те же книги
+из популярных списков. Кэш сбрасывается вместе с остальными в invalidate_db_cache.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def estimate_card_size(value: Any) -> int:
+    """Приблизительный размер карточки в байтах: словари, списки и строки учитываются вложенно"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_card_size(key) + estimate_card_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_card_size(item) for item in value)
+    return size
+
+
+class CardCache:
+    """
+    Thread-safe LRU-кэш карточек, ограниченный по объёму и времени жизни
+
+    - Ключ: кортеж (вид карточки, ID, ...), например ('book', book_id, locale)
+    - Вытеснение самых старых по использованию записей при превышении max_bytes
+    - Записи старше ttl секунд считаются промахом (ссылка на обложку могла быть найдена на сайте)
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl
+
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает карточку из кэша или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and monotonic() >= entry[0]:
+                del self._entries[key]
+                self._bytes -= entry[1]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Сохраняет карточку; None и слишком большие значения не кэшируются"""
+        if value is None:
+            return
+        size = estimate_card_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (monotonic() + self.ttl, size, value)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        """Значение из кэша или результат render(), который сохраняется в кэш"""
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Сбрасывает все записи (после обновления каталога)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кэша для мониторинга"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
@@ -0,0 +1,47 @@
+"""
+Поколение каталога и выборочный сброс кэшей
+
+Скрипты обновления БД (db_init/scripts/bump_generation.sh) после активации таблицы увеличивают
+её версию в таблице catalog_generation (TableName, Version, UpdatedAt). Бот раз в CLEANUP_INTERVAL
+читает эти строки и сбрасывает только кэши, которые строятся по изменившимся таблицам.
+Имена таблиц - как в db_init/scripts/tables.conf (без префикса cb_) и вспомогательные таблицы.
+"""
+
+from typing import Dict, Iterable, Set
+
+# Кэши, зависящие от каталога (сбрасываются в DatabaseBooks.invalidate_db_cache)
+CACHE_GENRES = 'genres'  # жанры с количеством книг и языки (снимок каталога)
+CACHE_STATS = 'stats'  # статистика библиотеки
+CACHE_LEADERBOARDS = 'leaderboards'  # рейтинги /pop
+CACHE_RESULTS = 'results'  # кэш результатов поиска и строк книг
+CACHE_CARDS = 'cards'  # карточки книг, аннотаций и авторов
+CACHE_REVIEWS = 'reviews'  # страницы отзывов
+CACHE_FILES = 'files'  # file_id отправленных в Telegram книг (FileIdRepository)
+
+# Кэш -> таблицы, из которых он строится
+CACHE_TABLES: Dict[str, frozenset] = {
+    CACHE_GENRES: frozenset({'libbook', 'libgenre', 'libgenrelist'}),
+    CACHE_STATS: frozenset({'libbook', 'libavtor', 'libtranslator', 'libgenrelist', 'libseqname'}),
+    # libgenre: update_single_table.sh пересчитывает по нему cb_libbook.PrimaryGenreID на месте, без версии libbook
+    CACHE_LEADERBOARDS: frozenset({'libbook', 'libgenre', 'book_stats', 'librecs', 'libreviews'}),
+    CACHE_RESULTS: frozenset({'libbook', 'libbook_fts', 'libavtor', 'libavtorname', 'libtranslator', 'libseq',
+                              'libseqname', 'libgenre', 'libgenrelist', 'book_stats', 'libbannotations',
+                              'libaannotations'}),
+    CACHE_CARDS: frozenset({'libbook', 'book_cards', 'book_stats', 'libavtorname', 'libbannotations',
+                            'libaannotations', 'libbpics', 'libapics'}),
+    CACHE_REVIEWS: frozenset({'libreviews'}),
+    CACHE_FILES: frozenset({'libbook'}),
+}
+
+ALL_CACHES = frozenset(CACHE_TABLES)
+
+
+def changed_tables(old: Dict[str, int], new: Dict[str, int]) -> Set[str]:
+    """Таблицы, версия которых отличается (в т.ч. появившиеся и пропавшие)"""
+    return {table for table in old.keys() | new.keys() if old.get(table) != new.get(table)}
+
+
+def affected_caches(tables: Iterable[str]) -> Set[str]:
+    """Кэши, зависящие от хотя бы одной из таблиц"""
+    tables = set(tables)
+    return {cache for cache, deps in CACHE_TABLES.items() if deps & tables}
@@ -0,0 +1,63 @@
+"""
+Снимок кэшей каталога на диске (жанры, языки, статистика библиотеки)
+
+Кэши DatabaseBooks заполняются тяжёлыми запросами по всему каталогу (GROUP BY по cb_libbook
+и cb_libgenre, COUNT(DISTINCT ...)), а каталог меняется только при обновлении БД. Снимок
+помечается максимальным BookID каталога: при старте бот сразу поднимает кэши из снимка,
+а перечитывает их из БД в фоне, только если BookID в БД отличается.
+"""
+
+import os
+import pickle
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Версия формата снимка: при изменении структуры кэшей старые снимки игнорируются
+SNAPSHOT_FORMAT = 1
+
+
+def save_snapshot(path: str, max_book_id: int, caches: Dict[str, Any]) -> bool:
+    """
+    Атомарно записывает снимок кэшей (через временный файл и os.replace)
+
+    Returns:
+        True, если снимок записан
+    """
+    snapshot = {
+        'format': SNAPSHOT_FORMAT,
+        'max_book_id': max_book_id,
+        'saved_at': datetime.now().isoformat(),
+        'caches': caches,
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error saving catalog snapshot {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def load_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Читает снимок: {'max_book_id', 'saved_at', 'caches'}; None, если снимка нет или он другого формата"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception as e:
+        print(f"Error loading catalog snapshot {path}: {e}")
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('format') != SNAPSHOT_FORMAT:
+        return None
+    if snapshot.get('max_book_id') is None or not isinstance(snapshot.get('caches'), dict):
+        return None
+    return snapshot
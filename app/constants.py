@@ -1,3 +1,5 @@
+import os
+
 # Пути к базам данных и файлам
 PREFIX_FILE_PATH = "./data"
 PREFIX_TMP_PATH = "./tmp"  # путь для временных файлов и резервных копий
@@ -6,6 +8,9 @@ FLIBUSTA_LOG_PATH = './logs'
 #FLIBUSTA_DB_BOOKS_PATH = f"{PREFIX_FILE_PATH}/Flibusta_FB2_local.hlc2"
 FLIBUSTA_DB_SETTINGS_PATH = f"{PREFIX_FILE_PATH}/FlibustaSettings.sqlite"
 FLIBUSTA_DB_LOGS_PATH = f"{PREFIX_FILE_PATH}/FlibustaLogs.sqlite"
+FLIBUSTA_DB_FILES_PATH = f"{PREFIX_FILE_PATH}/FlibustaFiles.sqlite"  # file_id отправленных книг (кэш, без резервной копии)
+# Снимок кэшей жанров, языков и статистики каталога для быстрого старта (см. catalog_snapshot.py)
+CATALOG_SNAPSHOT_PATH = f"{PREFIX_FILE_PATH}/catalog_cache.pickle"
 
 # пути для резервных копий
 BACKUP_TMP_PATH = PREFIX_TMP_PATH
@@ -24,6 +29,28 @@ MAX_SERIES_SEARCH = 100
 
 #WEB
 FLIBUSTA_BASE_URL = "https://www.flibusta.is"
+# Сколько секунд ждать уже выполняющееся скачивание той же книги или поиск той же обложки (single_flight.py)
+FLIBUSTA_DOWNLOAD_WAIT_TIMEOUT = 120
+FLIBUSTA_COVER_WAIT_TIMEOUT = 30
+# Скачивание книг потоком во временный файл (см. FlibustaClient.download_book и byte_budget.py)
+TELEGRAM_MAX_FILE_SIZE = 50 * 1024 * 1024  # бот не может отправить файл больше 50 MB
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_SPOOL_MAX_MEMORY = 1024 * 1024  # больше - временный файл переносится на диск
+DOWNLOAD_MEMORY_BUDGET_BYTES = 200 * 1024 * 1024  # переопределяется DOWNLOAD_MEMORY_BUDGET_MB, 0 - без ограничения
+# Общий пул HTTP-соединений (http_transport.py), лимиты переопределяются HTTP_POOL_LIMIT и HTTP_POOL_LIMIT_PER_HOST
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 20
+HTTP_KEEPALIVE_TIMEOUT = 30  # секунд простоя, после которых соединение закрывается
+HTTP_DNS_CACHE_TTL = 300
+# Виды запросов и их таймауты, секунд: (подключение, чтение из сокета, весь запрос)
+HTTP_CALL_PAGE = 'page'
+HTTP_CALL_DOWNLOAD = 'download'
+HTTP_CALL_UPLOAD = 'upload'
+HTTP_TIMEOUTS = {
+    HTTP_CALL_PAGE: (10, 20, 30),
+    HTTP_CALL_DOWNLOAD: (10, 30, 300),  # весь запрос дополнительно ограничен FLIBUSTA_DOWNLOAD_WAIT_TIMEOUT
+    HTTP_CALL_UPLOAD: (10, 60, 300),
+}
 
 BOOK_FORMAT_FB2 = 'fb2'
 BOOK_FORMAT_MOBI = 'mobi'
@@ -34,6 +61,57 @@ DEFAULT_BOOK_FORMAT = BOOK_FORMAT_FB2  # По умолчанию формат н
 # MONITORING_INTERVAL=1800 # каждые полчаса мониторим потребление памяти
 CLEANUP_INTERVAL=3600 # каждый час очищаем старые сохранённые контексты поисков
 
+# Пул соединений с MariaDB (значения по умолчанию, переопределяются переменными окружения DB_POOL_*)
+# Размер пула - потоки executor'ов каталога (поиски и карточки) плюс резерв соединений для фоновых задач
+DB_POOL_BACKGROUND_CONNECTIONS = 2  # рейтинги /pop, кэши каталога, проверка обновления каталога
+DB_POOL_SIZE = min(32, (os.cpu_count() or 1) + 4) + DB_POOL_BACKGROUND_CONNECTIONS
+DB_POOL_ACQUIRE_TIMEOUT = 10  # сколько секунд ждать свободное соединение
+DB_POOL_MAX_LIFETIME = 3600  # пересоздаём соединения старше часа
+DB_POOL_PING_AFTER_IDLE = 30  # проверяем соединение, если оно простаивало дольше 30 секунд
+DB_POOL_DRAIN_TIMEOUT = 10  # сколько секунд ждать возврата соединений при остановке бота
+DB_CALL_TIMEOUT = 15  # таймаут async-запроса к каталогу (информация о книге, авторе, отзывы), секунд
+# Executor запросов к каталогу (переопределяется переменными окружения DB_EXECUTOR_*)
+# Потоков не больше DB_POOL_SIZE - DB_POOL_BACKGROUND_CONNECTIONS (по соединению на поток, резерв - фоновым задачам);
+# 0 - ровно столько
+DB_EXECUTOR_WORKERS = 0
+DB_EXECUTOR_MAX_QUEUE = 50  # сколько запросов может ждать свободный поток, остальным - "занято, повторите"
+# Из DB_EXECUTOR_WORKERS потоков столько отдано запросам карточек книг, авторов и отзывов (своя очередь),
+# остальные - поискам. Переопределяются DB_LOOKUP_WORKERS и DB_LOOKUP_MAX_QUEUE
+DB_LOOKUP_WORKERS = 2
+DB_LOOKUP_MAX_QUEUE = 100
+DB_SEARCH_TIMEOUT = 60  # таймаут поиска книг/серий/авторов, секунд
+DB_MAX_STATEMENT_TIME = 30  # лимит выполнения поискового запроса на сервере MariaDB (max_statement_time), секунд; 0 - без лимита
+# Подготовленные выражения (server-side prepared statements) на соединение пула, переопределяется DB_PREPARED_STATEMENTS;
+# 0 - обычные текстовые запросы. Всего выражений на сервере не больше DB_POOL_SIZE * DB_PREPARED_STATEMENTS
+# (должно быть меньше max_prepared_stmt_count MariaDB, по умолчанию 16382). Соединения с подготовленными
+# выражениями не сбрасываются целиком (reset_session) - только переменные, которые меняет бот, поэтому включается явно
+DB_PREPARED_STATEMENTS = 0
+
+# Режим выполнения поиска книг (по умолчанию, переопределяется переменной окружения SEARCH_MODE)
+SEARCH_MODE_JOINED = 'joined'  # один запрос: JOIN всех таблиц для всех совпадений, затем ROW_NUMBER и LIMIT
+SEARCH_MODE_TWO_PHASE = 'two_phase'  # сначала ID книг по FT-индексу и фильтрам, затем JOIN только для этих ID
+SEARCH_MODES = (SEARCH_MODE_JOINED, SEARCH_MODE_TWO_PHASE)
+SEARCH_MODE = SEARCH_MODE_JOINED
+
+# Общий кэш результатов поиска (переопределяется переменными окружения SEARCH_CACHE_MAX_MB и SEARCH_CACHE_TTL)
+SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MB, 0 - кэш отключён
+SEARCH_CACHE_TTL = 3600  # секунд; при обновлении каталога кэш сбрасывается в invalidate_db_cache
+# Кэш строк книг для страниц результатов поиска (в сессиях пользователей хранятся только ID книг)
+BOOK_ROW_CACHE_SIZE = 20000  # строк на процесс, 0 - кэш отключён
+# Постраничный просмотр отзывов о книге (см. review_pages.py)
+REVIEWS_PAGE_ROWS = 10  # сколько отзывов читать из БД на одно сообщение
+REVIEWS_PAGE_CHARS = 3800  # длина текста страницы отзывов (лимит сообщения Telegram - 4096 с заголовком)
+REVIEW_TEXT_MAX_CHARS = 3000  # текст отзыва обрезается на сервере: в сообщении показывается не больше 1000 символов
+# Кэш карточек книг и авторов и их HTML (переопределяется CARD_CACHE_MAX_MB и CARD_CACHE_TTL)
+CARD_CACHE_MAX_BYTES = 16 * 1024 * 1024  # 16 MB, 0 - кэш отключён
+CARD_CACHE_TTL = 6 * 3600  # секунд; при обновлении каталога кэш сбрасывается в invalidate_db_cache
+REVIEW_PAGES_CACHE_BOOKS = 200  # сколько книг держать в кэше готовых страниц отзывов, 0 - кэш отключён
+# Дисковый кэш скачанных книг (переопределяется BOOK_CACHE_MAX_MB), см. book_cache.py
+BOOK_CACHE_PATH = f"{PREFIX_TMP_PATH}/book_cache"
+BOOK_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB, 0 - кэш отключён
+# Локали, для которых кэши жанров прогреваются в фоне и сохраняются в снимок каталога
+CATALOG_CACHE_LOCALES = ('ru', 'en')
+
 # Константы для типов настроек
 SETTING_MAX_BOOKS = 'max_books'
 SETTING_LANG_SEARCH = 'lang_search'
@@ -82,6 +160,12 @@ BOOK_RATINGS = {
 
 UI_SEPARATOR = "__NEWLINE__"
 
+# Категории размера книги в cb_libbook.SizeBucket (заполняются в zz_47_fill_book_filters.sql)
+SIZE_BUCKET_UNKNOWN = 0
+SIZE_BUCKET_LESS800 = 1
+SIZE_BUCKET_MORE800 = 2
+SIZE_BUCKETS = {'less800': SIZE_BUCKET_LESS800, 'more800': SIZE_BUCKET_MORE800}
+
 # Словарь опций для настроек
 SETTING_OPTIONS = {
     SETTING_MAX_BOOKS: [
@@ -125,6 +209,11 @@ SHOW_POPULAR_30_DAYS = 'show_pop_30'
 SHOW_POPULAR_7_DAYS = 'show_pop_7'
 SHOW_NOVELTY = 'show_pop_0'
 
+# Предрассчитанные рейтинги /pop (days_back из SHOW_* выше; 0 - новинки)
+LEADERBOARD_PERIODS = (999, 30, 7, 0)
+LEADERBOARD_DEPTH = 5000  # сколько книг каждого языка хранить в рейтинге периода
+LEADERBOARD_FIRST_REFRESH = 30  # через сколько секунд после старта посчитать рейтинги
+
 # ============================================================
 # POPULARITY WEIGHTS CONFIGURATION
 # ============================================================
@@ -4,6 +4,7 @@ from typing import Any, List, Optional
 from telegram.ext import Application, CallbackContext
 
 from .database import DatabaseSettings, UserSettingsType
+from .result_sessions import BookResultSession
 # from custom_types import UserSettingsType
 
 
@@ -26,7 +27,7 @@ class CMConst:
 
     # Ключи для поисковых данных
     class CMC_SearchData:
-        PAGES_OF_BOOKS = "PAGES_OF_BOOKS"
+        BOOKS_SESSION = "BOOKS_SESSION"  # BookResultSession: ID найденных книг и параметры запроса
         FOUND_BOOKS_COUNT = "FOUND_BOOKS_COUNT"
         PAGES_OF_SERIES = "PAGES_OF_SERIES"
         FOUND_SERIES_COUNT = "FOUND_SERIES_COUNT"
@@ -322,9 +323,9 @@ def set_switch_search(context: CallbackContext, value: Optional[str]) -> None:
 
 
 # Данные поиска
-def get_pages_of_books(context: CallbackContext) -> List[List[Any]]:
-    result = ContextManager.get(context, CMConst.CMC_SearchData.PAGES_OF_BOOKS, [])
-    return result if isinstance(result, list) else []
+def get_books_session(context: CallbackContext) -> Optional[BookResultSession]:
+    result = ContextManager.get(context, CMConst.CMC_SearchData.BOOKS_SESSION)
+    return result if isinstance(result, BookResultSession) and len(result) else None
 
 
 def get_pages_of_series(context: CallbackContext) -> List[List[Any]]:
@@ -349,9 +350,9 @@ def get_found_authors_count(context: CallbackContext) -> Optional[int]:
     return ContextManager.get(context, CMConst.CMC_SearchData.FOUND_AUTHORS_COUNT)
 
 
-def set_books(context: CallbackContext, pages_of_books: List[List[Any]], count: int) -> None:
+def set_books(context: CallbackContext, books_session: BookResultSession, count: int) -> None:
     # ContextManager.set(context, CMConst.CMC_SearchData.BOOKS, books)
-    ContextManager.set(context, CMConst.CMC_SearchData.PAGES_OF_BOOKS, pages_of_books)
+    ContextManager.set(context, CMConst.CMC_SearchData.BOOKS_SESSION, books_session)
     ContextManager.set(context, CMConst.CMC_SearchData.FOUND_BOOKS_COUNT, count)
 
 
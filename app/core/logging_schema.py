@@ -121,6 +121,7 @@ class DownloadEvent:
     file_size: int
     success: bool
     via_tmpfiles: bool = False
+    from_cache: bool = False  # отправлено по сохранённому file_id без скачивания
 
 
 @dataclass
@@ -138,7 +138,8 @@ class StructuredLogger:
             success: bool,
             via_tmpfiles: bool = False,
             chat_type: str = "private",
-            chat_id: Optional[int] = None
+            chat_id: Optional[int] = None,
+            from_cache: bool = False
     ) -> None:
         """Логирует скачивание книги"""
         # print(f"DEBUG: book_id={book_id}, type={type(book_id)}")
@@ -152,7 +153,8 @@ class StructuredLogger:
             format=format,
             file_size=file_size,
             success=success,
-            via_tmpfiles=via_tmpfiles
+            via_tmpfiles=via_tmpfiles,
+            from_cache=from_cache
         )
 
         event = LogEvent(
@@ -1,16 +1,39 @@
+import asyncio
+import json
 import os
 import sqlite3
+import threading
 from collections import namedtuple
-from typing import Dict, List, Any, Coroutine
+from typing import Dict, List, Any, Coroutine, Tuple
 
-import mysql.connector
 from contextlib import contextmanager
 
+from mysql.connector import Error as MySQLError
+
+from .db_pool import MariaDBPool
+from .db_async import DBExecutor, QueryRegistry, QueryCancelledError, QueryTimeoutError, db_call, current_query, \
+    remaining_call_time
+from .search_cache import SearchResultCache, normalize_query
+from .leaderboards import Leaderboard
+from .result_sessions import BookResultSession, BookRowCache, ColumnarResultSet, SearchFingerprint
+from .sql_templates import QueryTemplates, id_list, pad_ids, placeholders
 from .flibusta_client import FlibustaClient, flibusta_client
 from .constants import FLIBUSTA_DB_SETTINGS_PATH, FLIBUSTA_DB_LOGS_PATH, MAX_BOOKS_SEARCH, \
     SETTING_SEARCH_AREA_B, SETTING_SEARCH_AREA_BA, SETTING_SEARCH_AREA_AA, MAX_SERIES_SEARCH, MAX_AUTHORS_SEARCH, \
-    POPULARITY_WEIGHT_RATE, POPULARITY_WEIGHT_RECS, POPULARITY_WEIGHT_REVIEWS
-from .tools import load_bot_news
+    POPULARITY_WEIGHT_RATE, POPULARITY_WEIGHT_RECS, POPULARITY_WEIGHT_REVIEWS, DB_POOL_SIZE, DB_POOL_BACKGROUND_CONNECTIONS, \
+    DB_POOL_ACQUIRE_TIMEOUT, DB_POOL_MAX_LIFETIME, DB_POOL_PING_AFTER_IDLE, DB_POOL_DRAIN_TIMEOUT, \
+    SEARCH_MODE, SEARCH_MODES, SEARCH_MODE_JOINED, SEARCH_MODE_TWO_PHASE, SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL, \
+    LEADERBOARD_PERIODS, LEADERBOARD_DEPTH, DB_CALL_TIMEOUT, DB_EXECUTOR_WORKERS, DB_EXECUTOR_MAX_QUEUE, \
+    DB_LOOKUP_WORKERS, DB_LOOKUP_MAX_QUEUE, DB_MAX_STATEMENT_TIME, BOOK_ROW_CACHE_SIZE, SIZE_BUCKETS, \
+    DB_PREPARED_STATEMENTS, REVIEWS_PAGE_ROWS, \
+    REVIEWS_PAGE_CHARS, REVIEW_TEXT_MAX_CHARS, REVIEW_PAGES_CACHE_BOOKS, CARD_CACHE_MAX_BYTES, CARD_CACHE_TTL, \
+    CATALOG_SNAPSHOT_PATH, CATALOG_CACHE_LOCALES
+from .card_cache import CardCache
+from .catalog_snapshot import load_snapshot, save_snapshot
+from .catalog_generation import ALL_CACHES, CACHE_GENRES, CACHE_STATS, CACHE_LEADERBOARDS, CACHE_RESULTS, \
+    CACHE_CARDS, CACHE_REVIEWS, affected_caches, changed_tables
+from .review_pages import ReviewCursor, ReviewPageCache, next_cursor
+from .tools import load_bot_news, format_reviews_page
 
 # from logger import logger
 
@@ -18,6 +41,15 @@ Book = namedtuple('Book',
                    ['FileName', 'Title', 'LastName', 'FirstName', 'MiddleName', 'Genre', 'BookSize',
                     'SearchYear', 'LibRate', 'SeriesTitle', 'Relevance',
                     'SrcLang', 'TransLastName', 'TransFirstName', 'TransMiddleName', 'TransID'])
+# Числовые колонки Book в компактном результате: поле -> (typecode массива, 0 означает NULL)
+BOOK_NUMERIC_COLUMNS = {
+    'FileName': ('I', False),
+    'BookSize': ('I', False),
+    'SearchYear': ('h', False),
+    'LibRate': ('B', False),
+    'Relevance': ('d', False),
+    'TransID': ('I', True),
+}
 UserSettingsType = namedtuple('UserSettingsType',
                               ['User_ID', 'MaxBooks', 'Lang',
                                # 'DateSortOrder',
@@ -32,10 +64,7 @@ BASE_FIELDS = """
     b.Title,
     b.FileSize as BookSize,
     b.Year as SearchYear,
-    case 
-      when b.FileSize <= 800 * 1024 then 'less800'
-      when b.FileSize > 800 * 1024 then 'more800'
-    end as BookSizeCat,  
+    b.SizeBucket as BookSizeCat,
     an.LastName,
     an.FirstName, 
     an.MiddleName,
@@ -43,7 +72,7 @@ BASE_FIELDS = """
     gl.GenreDesc AS Genre,
     sn.SeqName as SeriesTitle, 
     sn.SeqId as SeriesID, 
-    ROUND(COALESCE(r.LibRate, 0)) as LibRate,
+    b.RoundedRate as LibRate,
     b.SrcLang,
     tn.LastName as TransLastName,
     tn.FirstName as TransFirstName,
@@ -61,21 +90,17 @@ LEFT JOIN cb_libavtor a ON a.BookID = b.BookID
 LEFT JOIN cb_libavtorname an ON an.AvtorID = a.AvtorID
 LEFT JOIN cb_libtranslator t ON t.BookID = b.BookID
 LEFT JOIN cb_libavtorname tn ON tn.AvtorID = t.TranslatorId
-LEFT JOIN (select bookid, min(genreid) as genreid from cb_libgenre group by bookid) g ON g.BookID = b.BookID
--- LEFT JOIN cb_libgenre g ON g.BookID = b.BookID
-LEFT JOIN {genre_table} gl ON gl.GenreID = g.GenreID
+-- основной жанр книги предрассчитан в cb_libbook.PrimaryGenreID (zz_47_fill_book_filters.sql)
+LEFT JOIN {genre_table} gl ON gl.GenreID = b.PrimaryGenreID
 -- LEFT JOIN (select bookid, min(SeqID) as SeqID from cb_libseq group by bookid) s ON s.BookID = b.BookID
 LEFT JOIN cb_libseq s ON s.BookID = b.BookID
 LEFT JOIN cb_libseqname sn on sn.SeqID = s.SeqID
-LEFT JOIN (
-    SELECT BookId, AVG(CAST(Rate AS SIGNED)) as LibRate
-    FROM cb_librate 
-    GROUP BY BookId
-) r ON r.BookId = b.BookId
+-- агрегаты оценок/рекомендаций/отзывов считаются при обновлении БД (zz_45_fill_book_stats.sql)
+LEFT JOIN cb_book_stats r ON r.BookId = b.BookId
 """
 
 # Основной полнотекстовый поиск
-SQL_QUERY_BOOKS = lambda locale, is_empty=False, genre_filter=None: f"""
+SQL_QUERY_BOOKS = lambda locale, is_empty=False, inner_where='': f"""
 select * from (
 SELECT 
     {BASE_FIELDS},
@@ -85,12 +110,12 @@ JOIN cb_libbook b ON b.BookID = fts.BookID
 {get_base_joins(locale)}
 WHERE b.Deleted = '0'
   {'' if is_empty else 'AND MATCH(fts.FT) AGAINST(%s IN BOOLEAN MODE)'}
-  {"AND g.GenreID IN (" + genre_filter + ")" if genre_filter and genre_filter.strip() and all(c.isdigit() or c == ',' for c in genre_filter) else ""}
+  {inner_where}
 ) as subq 
 """
 
 # Поиск по аннотациям книг
-SQL_QUERY_ABOOKS = lambda locale, is_empty=False, genre_filter=None: f"""
+SQL_QUERY_ABOOKS = lambda locale, is_empty=False, inner_where='': f"""
 select * from (
 SELECT 
     {BASE_FIELDS},
@@ -100,12 +125,12 @@ JOIN cb_libbook b ON b.BookID = ba.BookID
 {get_base_joins(locale)}
 WHERE b.Deleted = '0'
   {'' if is_empty else 'AND MATCH(ba.Body) AGAINST(%s IN BOOLEAN MODE)'}
-  {"AND g.GenreID IN (" + genre_filter + ")" if genre_filter and genre_filter.strip() and all(c.isdigit() or c == ',' for c in genre_filter) else ""}
+  {inner_where}
 ) as subq2
 """
 
 # Поиск по аннотациям авторов
-SQL_QUERY_AAUTHORS = lambda locale, is_empty=False, genre_filter=None: f"""
+SQL_QUERY_AAUTHORS = lambda locale, is_empty=False, inner_where='': f"""
 select * from (
 SELECT 
     {BASE_FIELDS},
@@ -116,16 +141,59 @@ JOIN cb_libbook b ON b.BookID = ab.BookID
 {get_base_joins(locale)}
 WHERE b.Deleted = '0'
   AND MATCH(aa.Body) AGAINST(%s IN BOOLEAN MODE)
-  {"AND g.GenreID IN (" + genre_filter + ")" if genre_filter and genre_filter.strip() and all(c.isdigit() or c == ',' for c in genre_filter) else ""}
+  {inner_where}
 ) as subq2
 """
 
+# Полнотекстовые запросы принимают фильтры пользователя (inner_where, см. DatabaseBooks.build_sql_where_inner)
+# и применяют их к реальным колонкам во внутреннем WHERE - до материализации найденных строк.
+# Параметры запроса по порядку: поисковая строка дважды (если запрос не пустой), затем параметры inner_where
 SELECT_SQL_QUERY = {
     SETTING_SEARCH_AREA_B: SQL_QUERY_BOOKS,
     SETTING_SEARCH_AREA_BA: SQL_QUERY_ABOOKS,
     SETTING_SEARCH_AREA_AA: SQL_QUERY_AAUTHORS
 }
 
+# Источники первой фазы двухфазного поиска (SEARCH_MODE_TWO_PHASE):
+# только полнотекстовая таблица и cb_libbook, без JOIN авторов/переводчиков/серий/жанров
+# (FROM с JOIN, выражение релевантности)
+SELECT_SQL_IDS_SOURCE = {
+    SETTING_SEARCH_AREA_B: (
+        "FROM cb_libbook_fts fts JOIN cb_libbook b ON b.BookID = fts.BookID",
+        "MATCH(fts.FT) AGAINST(%s IN BOOLEAN MODE)"
+    ),
+    SETTING_SEARCH_AREA_BA: (
+        "FROM cb_libbannotations ba JOIN cb_libbook b ON b.BookID = ba.BookID",
+        "MATCH(ba.Body) AGAINST(%s IN BOOLEAN MODE)"
+    ),
+    SETTING_SEARCH_AREA_AA: (
+        "FROM cb_libaannotations aa JOIN cb_libavtor ab ON ab.AvtorId = aa.AvtorId JOIN cb_libbook b ON b.BookID = ab.BookID",
+        "MATCH(aa.Body) AGAINST(%s IN BOOLEAN MODE)"
+    )
+}
+
+def book_result_set(rows) -> ColumnarResultSet:
+    """Компактный (по колонкам) результат из строк Book или строк курсора в порядке полей Book"""
+    return ColumnarResultSet(Book, BOOK_NUMERIC_COLUMNS, rows)
+
+
+def _parse_json_list(value) -> List[Dict[str, Any]]:
+    """Разбирает JSON-массив [{"id": .., "name": ..}] из cb_book_cards, отбрасывая пустые элементы"""
+    if not value:
+        return []
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return [item for item in items if isinstance(item, dict) and item.get('id') is not None and item.get('name')]
+
+
+# MariaDB: запрос прерван по max_statement_time
+ER_STATEMENT_TIMEOUT = 1969
+
+
 def _get_genre_table(locale: str) -> str:
     """Return correct genre table based on user's locale"""
     return 'cb_libgenrelist' if locale == 'ru' else 'cb_libgenrelist_en'
@@ -156,6 +224,23 @@ SQL_QUERY_CHILDREN_GENRES_COUNT = lambda locale: f"""
     order by 1	
 """
 
+# Отзывы о книге порциями (DatabaseBooks.get_book_reviews): первая и следующие по курсору Time
+SQL_QUERY_REVIEWS_FIRST = """
+    SELECT Name, Time, LEFT(Text, %s)
+    FROM cb_libreviews
+    WHERE BookID = %s
+    ORDER BY Time DESC
+    LIMIT %s
+"""
+
+SQL_QUERY_REVIEWS_AFTER = """
+    SELECT Name, Time, LEFT(Text, %s)
+    FROM cb_libreviews
+    WHERE BookID = %s AND Time <= %s
+    ORDER BY Time DESC
+    LIMIT %s
+"""
+
 SQL_QUERY_LANGS = """
     SELECT Lang, COUNT(Lang) AS count
     FROM cb_libbook b
@@ -831,19 +916,198 @@ class DatabaseBooks():
     _class_cached_parent_genres = {}
     _class_cached_genres = {}  # Словарь для кеширования жанров по родительским категориям
     _class_stats = {}  # Статистика по библиотеке
-
-    def __init__(self, db_config):
+    _class_generation = {}  # Версии таблиц каталога, по которым построены кэши (см. invalidate_db_cache)
+    _class_max_book_id = None  # MAX(BookID) последней проверки - если таблицы поколений нет
+    _class_generation_lock = threading.Lock()  # Одна проверка поколения за раз (см. invalidate_db_cache)
+
+    def __init__(self, db_config, pool_size: int = DB_POOL_SIZE, pool_acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+                 pool_max_lifetime: float = DB_POOL_MAX_LIFETIME, pool_ping_after_idle: float = DB_POOL_PING_AFTER_IDLE,
+                 pool_background_connections: int = DB_POOL_BACKGROUND_CONNECTIONS, search_mode: str = SEARCH_MODE, search_cache_max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+                 search_cache_ttl: float = SEARCH_CACHE_TTL, call_timeout: float = DB_CALL_TIMEOUT,
+                 executor_workers: int = DB_EXECUTOR_WORKERS, executor_max_queue: int = DB_EXECUTOR_MAX_QUEUE,
+                 lookup_workers: int = DB_LOOKUP_WORKERS, lookup_max_queue: int = DB_LOOKUP_MAX_QUEUE,
+                 max_statement_time: float = DB_MAX_STATEMENT_TIME, book_row_cache_size: int = BOOK_ROW_CACHE_SIZE,
+                 prepared_statements: int = DB_PREPARED_STATEMENTS, card_cache_max_bytes: int = CARD_CACHE_MAX_BYTES,
+                 card_cache_ttl: float = CARD_CACHE_TTL):
         self.db_config = db_config
-        self._connection = None
+        self.max_statement_time = max_statement_time
+        if search_mode not in SEARCH_MODES:
+            print(f"Unknown search mode '{search_mode}', using '{SEARCH_MODE_JOINED}'")
+            search_mode = SEARCH_MODE_JOINED
+        self.search_mode = search_mode
+        self._search_cache = SearchResultCache(search_cache_max_bytes, search_cache_ttl)
+        self._row_cache = BookRowCache(book_row_cache_size)  # строки книг для страниц сессий результатов
+        self._leaderboards: Dict[int, Leaderboard] = {}  # days_back -> рейтинг, см. refresh_leaderboards
+        self._templates = QueryTemplates()  # тексты запросов по форме (см. sql_templates.py)
+        self._review_pages = ReviewPageCache(REVIEW_PAGES_CACHE_BOOKS)  # готовые страницы отзывов по книгам
+        self._card_cache = CardCache(card_cache_max_bytes, card_cache_ttl)  # карточки книг/авторов и их HTML
+        self._pool = MariaDBPool(
+            db_config,
+            size=pool_size,
+            acquire_timeout=pool_acquire_timeout,
+            max_lifetime=pool_max_lifetime,
+            ping_after_idle=pool_ping_after_idle,
+            prepared_statements=prepared_statements
+        )
+        # Потоки по одному на соединение пула, кроме pool_background_connections соединений для фоновых
+        # задач (рейтинги /pop, кэши каталога, проверка обновления): они не ждут, пока поиски займут весь пул.
+        # Часть потоков (lookup_workers) с отдельной очередью отдана быстрым запросам пользователей
+        # (db_call: карточки, авторы, отзывы), чтобы наплыв медленных поисков не переполнял их очередь
+        max_workers = max(2, pool_size - max(0, pool_background_connections))
+        executor_workers = min(executor_workers, max_workers) if executor_workers > 0 else max_workers
+        lookup_workers = max(1, min(lookup_workers, executor_workers - 1))
+        self._executor = DBExecutor(max_workers=max(1, executor_workers - lookup_workers), call_timeout=call_timeout,
+                                    max_queue=executor_max_queue, name='db-books')
+        self._lookup_executor = DBExecutor(max_workers=lookup_workers, call_timeout=call_timeout,
+                                           max_queue=lookup_max_queue, name='db-lookups')
+        # Выполняющиеся поиски по (user_id, chat_id) - новый поиск прерывает предыдущий
+        self._queries = QueryRegistry()
 
     @contextmanager
-    def connect(self):
-        """Устанавливает соединение с MariaDB"""
-        conn = mysql.connector.connect(**self.db_config)
-        try:
+    def connect(self, max_statement_time: float = 0):
+        """Берёт соединение с MariaDB из пула и возвращает его после использования.
+        Внутри async-вызова (db_call) ожидание соединения ограничено оставшимся временем вызова
+
+        Args:
+            max_statement_time: Лимит выполнения запросов на сервере, секунд (0 - без лимита)
+        """
+        remaining = remaining_call_time()
+        timeout = None if remaining is None else min(remaining, self._pool.acquire_timeout)
+        with self._pool.connection(timeout) as conn:
+            self._set_statement_time(conn, max_statement_time)
             yield conn
+
+    def _set_statement_time(self, conn, max_statement_time: float) -> None:
+        """Выставляет max_statement_time сессии (0 - значение по умолчанию, без запроса к серверу)"""
+        # Сессия (или с подготовленными выражениями - её переменные) сбрасывается при возврате
+        # соединения в пул - по умолчанию лимита нет
+        if not max_statement_time:
+            return
+
+        statements = self._pool.statement_cache(conn)
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION max_statement_time = %s", (float(max_statement_time),))
+        cursor.close()
+        if statements is not None:
+            statements.session['max_statement_time'] = max_statement_time
+
+    def _fetchall(self, conn, sql: str, params=()) -> list:
+        """Выполняет запрос и возвращает все строки. При включённых подготовленных выражениях
+        запрос готовится на сервере один раз на соединение и дальше только выполняется с новыми параметрами"""
+        statements = self._pool.statement_cache(conn)
+        if statements is None:
+            cursor = conn.cursor(buffered=True)
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+        cursor = statements.cursor(sql)
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        except Exception:
+            statements.discard(sql)
+            raise
+
+    @contextmanager
+    def search_connection(self):
+        """Соединение для поискового запроса: время выполнения ограничено на сервере (max_statement_time),
+        а запрос, запущенный через run_in_executor с cancel_key, можно прервать новым поиском (KILL QUERY)"""
+        query = current_query()
+        with self.connect(self.max_statement_time) as conn:
+            if query is not None:
+                with query.lock:
+                    if query.cancelled:
+                        raise QueryCancelledError()
+                    query.connection_id = conn.connection_id
+
+            try:
+                yield conn
+            except MySQLError as e:
+                if query is not None and query.cancelled:
+                    raise QueryCancelledError() from e
+                if e.errno == ER_STATEMENT_TIMEOUT:
+                    raise QueryTimeoutError(f"Query exceeded max_statement_time={self.max_statement_time}s") from e
+                raise
+            finally:
+                if query is not None:
+                    with query.lock:
+                        query.connection_id = None
+
+    def _kill_query(self, query) -> None:
+        """Прерывает запрос на сервере, если он сейчас выполняется"""
+        with query.lock:
+            if query.connection_id is None:
+                return
+            try:
+                self._pool.kill_query(query.connection_id)
+                self._queries.count_killed()
+            except Exception as e:
+                print(f"Не удалось прервать запрос (соединение {query.connection_id}): {e}")
+
+    def pool_stats(self) -> dict:
+        """Статистика пула соединений (для мониторинга)"""
+        return self._pool.stats()
+
+    def executor_stats(self) -> dict:
+        """Статистика executor'ов поисков и быстрых запросов к каталогу и отмен поисков (для мониторинга)"""
+        return {**self._executor.stats(), **self._queries.stats(), 'lookups': self._lookup_executor.stats()}
+
+    async def run_in_executor(self, fn, *args, timeout: float = None, cancel_key=None, **kwargs):
+        """
+        Выполняет блокирующий вызов (например, поиск) в executor'е каталога
+
+        Args:
+            cancel_key: Ключ отмены (обычно (user_id, chat_id)). Новый вызов с тем же ключом прерывает
+                предыдущий: его запрос снимается на сервере, а вызов завершается QueryCancelledError
+
+        Raises:
+            DBBusyError: очередь переполнена
+            asyncio.TimeoutError: не уложились в timeout или сервер прервал запрос по max_statement_time
+            QueryCancelledError: вызов вытеснен более новым с тем же cancel_key
+        """
+        if cancel_key is None:
+            return await self._executor.run(fn, *args, timeout=timeout, **kwargs)
+
+        query, previous = self._queries.start(cancel_key)
+        if previous is not None and previous.connection_id is not None:
+            await asyncio.to_thread(self._kill_query, previous)
+
+        try:
+            return await self._executor.run(self._queries.run_bound, query, fn, *args, timeout=timeout, **kwargs)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Результат больше никто не ждёт - не занимаем сервер и соединение пула
+            query.cancelled = True
+            if query.connection_id is not None:
+                await asyncio.to_thread(self._kill_query, query)
+            raise
         finally:
-            conn.close()
+            self._queries.finish(query)
+
+    def search_cache_stats(self) -> dict:
+        """Статистика кэша результатов поиска (для мониторинга)"""
+        return self._search_cache.stats()
+
+    def card_cache_stats(self) -> dict:
+        """Статистика кэша карточек книг и авторов (для мониторинга)"""
+        return self._card_cache.stats()
+
+    def render_card(self, key, render) -> str:
+        """Готовый HTML карточки из кэша или результат render() (ключ должен включать язык интерфейса)"""
+        return self._card_cache.get_or_render(('html',) + tuple(key), render)
+
+    def row_cache_stats(self) -> dict:
+        """Статистика кэша строк книг для страниц результатов (для мониторинга)"""
+        return self._row_cache.stats()
+
+    def statement_stats(self) -> dict:
+        """Статистика шаблонов запросов и подготовленных выражений (для мониторинга)"""
+        return {**self._templates.stats(), **self._pool.statement_stats()}
+
+    def close(self, timeout: float = DB_POOL_DRAIN_TIMEOUT) -> None:
+        """Закрывает пул соединений, дождавшись завершения текущих запросов"""
+        self._executor.shutdown()
+        self._lookup_executor.shutdown()
+        self._pool.close(timeout)
 
 
     @property
@@ -968,8 +1232,6 @@ class DatabaseBooks():
         # If we already have any cached data for this locale, assume it's already loaded
         if locale in DatabaseBooks._class_cached_genres and DatabaseBooks._class_cached_genres[locale]:
             return
-        else:
-            DatabaseBooks._class_cached_genres[locale] = {}
         # Localized string for null genre
         null_genre_str = STR_WITHOUT_GENRES(locale)
         sql = f"""
@@ -996,9 +1258,8 @@ class DatabaseBooks():
             if parent not in grouped:
                 grouped[parent] = []
             grouped[parent].append((child_desc, count, genre_id))
-        # Update class cache
-        for parent_genre, child_list in grouped.items():
-            DatabaseBooks._class_cached_genres[locale][parent_genre] = child_list
+        # Update class cache at once: the cache may be warmed in background while handlers read it
+        DatabaseBooks._class_cached_genres[locale] = grouped
 
 
     def get_langs(self):
@@ -1010,92 +1271,289 @@ class DatabaseBooks():
                 DatabaseBooks._class_cached_langs = cursor.fetchall()
         return DatabaseBooks._class_cached_langs
 
+    def _invalidate_caches(self, caches) -> None:
+        """Сбрасывает указанные кэши (имена из catalog_generation.CACHE_TABLES)"""
+        if CACHE_GENRES in caches:
+            DatabaseBooks._class_cached_langs = None
+            DatabaseBooks._class_cached_parent_genres = {}
+            DatabaseBooks._class_cached_genres = {}
+        if CACHE_STATS in caches:
+            DatabaseBooks._class_stats = {}
+        if CACHE_LEADERBOARDS in caches:
+            self._leaderboards = {}
+        if CACHE_RESULTS in caches:
+            self._search_cache.clear()
+            self._row_cache.clear()
+        if CACHE_CARDS in caches:
+            self._card_cache.clear()
+        if CACHE_REVIEWS in caches:
+            self._review_pages.clear()
+
+    @staticmethod
+    def catalog_caches_ready(locales=CATALOG_CACHE_LOCALES) -> bool:
+        """Заполнены ли кэши жанров всех локалей, языков и статистики"""
+        return bool(DatabaseBooks._class_stats) and DatabaseBooks._class_cached_langs is not None and all(
+            locale in DatabaseBooks._class_cached_parent_genres and DatabaseBooks._class_cached_genres.get(locale)
+            for locale in locales
+        )
+
+    def load_catalog_snapshot(self, path: str = CATALOG_SNAPSHOT_PATH) -> int | None:
+        """
+        Поднимает кэши жанров, языков и статистики из снимка на диске (при старте, без запросов к БД)
+
+        Returns:
+            Максимальный BookID каталога, по которому сделан снимок, или None, если снимка нет
+        """
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            return None
+
+        caches = snapshot['caches']
+        DatabaseBooks._class_stats = caches.get('stats') or {}
+        DatabaseBooks._class_cached_langs = caches.get('langs')
+        DatabaseBooks._class_cached_parent_genres = caches.get('parent_genres') or {}
+        DatabaseBooks._class_cached_genres = caches.get('genres') or {}
+        DatabaseBooks._class_generation = caches.get('generation') or {}
+        DatabaseBooks._class_max_book_id = snapshot['max_book_id']
+        print(f"📚 Catalog caches loaded from snapshot {path} "
+              f"(max book {snapshot['max_book_id']}, saved {snapshot['saved_at']})")
+        return snapshot['max_book_id']
+
+    def save_catalog_snapshot(self, path: str = CATALOG_SNAPSHOT_PATH) -> bool:
+        """Сохраняет кэши жанров, языков и статистики в снимок, помеченный поколением и максимальным BookID каталога"""
+        max_book_id = DatabaseBooks._class_stats.get('max_filename')
+        if not isinstance(max_book_id, int):
+            return False
+        return save_snapshot(path, max_book_id, {
+            'stats': DatabaseBooks._class_stats,
+            'langs': DatabaseBooks._class_cached_langs,
+            'parent_genres': DatabaseBooks._class_cached_parent_genres,
+            'genres': DatabaseBooks._class_cached_genres,
+            'generation': DatabaseBooks._class_generation,
+        })
+
+    def refresh_catalog_caches(self, locales=CATALOG_CACHE_LOCALES, path: str = CATALOG_SNAPSHOT_PATH) -> bool:
+        """
+        Заполняет кэши каталога из БД, если их нет (фоновая задача после проверки обновления каталога)
+
+        Кэши из снимка остаются, пока поколение каталога в БД совпадает с меткой снимка:
+        устаревшие жанры и статистику сбрасывает invalidate_db_cache, после чего они
+        загружаются из БД здесь и снимок перезаписывается.
+
+        Returns:
+            True, если кэши загружались из БД
+        """
+        if self.catalog_caches_ready(locales):
+            return False
+
+        self.get_library_stats()
+        self.get_langs()
+        for locale in locales:
+            self.get_parent_genres_count(locale)
+            self.load_all_child_genres_cache(locale)
+        self.save_catalog_snapshot(path)
+        return True
+
 
     def search_books(self, query, lang, size_limit, rating_filter=None, search_area=SETTING_SEARCH_AREA_B, series_id=0,
                      author_id=0, person_type='author',
-                     locale: str = 'ru', genre_filter=None):
-        """Ищем книги по запросу пользователя"""
+                     locale: str = 'ru', genre_filter=None, search_mode=None):
+        """Ищем книги по запросу пользователя (с общим кэшем результатов)"""
+        cache_key = ('books', normalize_query(query), search_area, lang, size_limit, rating_filter, genre_filter,
+                     locale, series_id, author_id, person_type)
+        books = self._search_cache.get(cache_key)
+        if books is not None:
+            return books
+
+        if (search_mode or self.search_mode) == SEARCH_MODE_TWO_PHASE:
+            books = self.search_books_two_phase(query, lang, size_limit, rating_filter, search_area, series_id,
+                                                author_id, person_type, locale, genre_filter)
+        else:
+            books = self.search_books_joined(query, lang, size_limit, rating_filter, search_area, series_id,
+                                             author_id, person_type, locale, genre_filter)
+
+        self._search_cache.put(cache_key, books)
+        return books
+
+    def search_books_joined(self, query, lang, size_limit, rating_filter=None, search_area=SETTING_SEARCH_AREA_B,
+                            series_id=0, author_id=0, person_type='author', locale: str = 'ru', genre_filter=None):
+        """Поиск книг одним запросом: JOIN всех таблиц для всех совпадений, затем ROW_NUMBER и LIMIT"""
         is_empty = not query
-        sql_where = self.build_sql_where_ft(lang, size_limit, rating_filter, series_id, author_id, person_type)
-        # Строим запросы для поиска книг и подсчёта количества найденных книг
-        sql_query = self.build_sql_query_books(sql_where, 'desc', search_area, locale, is_empty, genre_filter)
+        # Все фильтры - во внутреннем WHERE полнотекстового запроса, снаружи фильтровать нечего
+        inner_where, inner_params = self.build_sql_where_inner(lang, size_limit, rating_filter, series_id, author_id,
+                                                               person_type, genre_filter)
+        # Текст запроса зависит только от формы, значения фильтров передаются параметрами
+        sql_query = self._templates.get(
+            ('books', search_area, locale, is_empty, inner_where),
+            lambda: self.build_sql_query_books("WHERE 1=1", 'desc', search_area, locale, is_empty, inner_where))
 
         params = []
         # Пара одинаковых параметров в виде полного запроса для FullText поиска
         if not is_empty:
             params.extend([query] * 2)
+        params.extend(inner_params)
 
         # #DEBUG
         # print(f"[DEBUG] search_books, sql_query = {sql_query}")
         # print(f"[DEBUG] params = {params}")
 
         # выполняем запросы поиска книг и подсчёта количества найденных книг
-        with self.connect() as conn:
-            cursor = conn.cursor(buffered=True)
-            cursor.execute(sql_query, params)
-            books = [Book(*row) for row in cursor.fetchall()]
+        with self.search_connection() as conn:
+            books = book_result_set(self._fetchall(conn, sql_query, params))
 
         return books
 
+    def search_books_two_phase(self, query, lang, size_limit, rating_filter=None, search_area=SETTING_SEARCH_AREA_B,
+                               series_id=0, author_id=0, person_type='author', locale: str = 'ru', genre_filter=None):
+        """
+        Двухфазный поиск книг:
+        1. ID книг и релевантность по FT-индексу и фильтрам по cb_libbook (не больше MAX_BOOKS_SEARCH)
+        2. Полные данные (авторы, переводчики, серии, жанры, рейтинг) только для этих ID
+        Результат совпадает с search_books в режиме SEARCH_MODE_JOINED
+        """
+        is_empty = not query
+        sql_where_ids, params = self.build_sql_where_book_ids(query, lang, size_limit, rating_filter, search_area,
+                                                              series_id, author_id, person_type, is_empty,
+                                                              genre_filter)
+        sql_query_ids = self._templates.get(
+            ('book_ids', search_area, is_empty, sql_where_ids),
+            lambda: self.build_sql_query_book_ids(search_area, sql_where_ids, is_empty))
+
+        with self.search_connection() as conn:
+            ranked = self._fetchall(conn, sql_query_ids, params)
+            if not ranked:
+                return book_result_set([])
+
+            # Повторяем фильтры по алиасам, чтобы из размноженных JOIN строк выбрать подходящую
+            # (например, строку с нужным автором при поиске книг автора)
+            sql_where, where_params = self.build_sql_where_ft(lang, size_limit, rating_filter, series_id, author_id,
+                                                              person_type)
+            hydrated = self._hydrate_books(conn, [row[0] for row in ranked], sql_where, where_params, locale)
+
+        # Порядок и релевантность берём из первой фазы
+        return book_result_set(hydrated[book_id]._replace(Relevance=relevance)
+                               for book_id, relevance in ranked if book_id in hydrated)
+
+
+    def remember_books(self, session: BookResultSession, books) -> None:
+        """Кладёт уже загруженные строки (обычно первую страницу) в кэш строк, чтобы не догружать их по ID"""
+        self._row_cache.put_many((session.row_key(book.FileName), book) for book in books)
+
+    async def get_books_page(self, session: BookResultSession, page: int) -> List[Book]:
+        """Строки книг страницы сессии: из кэша строк, недостающие - одним запросом по ID"""
+        return await self._get_session_rows(session, session.page_ids(page))
+
+    async def get_session_books(self, session: BookResultSession) -> ColumnarResultSet:
+        """Все книги сессии (для выгрузки в CSV); в кэш строк не попадают, чтобы не вытеснять страницы"""
+        return book_result_set(await self._get_session_rows(session, session.book_ids.tolist(), cache=False))
+
+    async def _get_session_rows(self, session: BookResultSession, book_ids: List[int], cache: bool = True) -> List[Book]:
+        keys = [session.row_key(book_id) for book_id in book_ids]
+        rows = self._row_cache.get_many(keys)
+        missing = [book_id for book_id, key in zip(book_ids, keys) if key not in rows]
+        if missing:
+            hydrated = await self.get_books_by_ids(missing, session.fingerprint)
+            loaded = [(session.row_key(book_id), book) for book_id, book in hydrated.items()]
+            rows.update(loaded)
+            if cache:
+                self._row_cache.put_many(loaded)
+        # Книги, пропавшие из каталога после поиска, пропускаем
+        return [rows[key] for key in keys if key in rows]
+
+    @db_call
+    def get_books_by_ids(self, book_ids: List[int], fingerprint: SearchFingerprint) -> Dict[int, Book]:
+        """Строки книг по ID с теми же фильтрами выбора строки, что и при поиске (см. search_books_two_phase)"""
+        if fingerprint.days_back is not None:
+            sql_where, where_params = "WHERE 1=1", []
+        else:
+            sql_where, where_params = self.build_sql_where_ft(fingerprint.lang, fingerprint.size_limit,
+                                                              fingerprint.rating_filter, fingerprint.series_id,
+                                                              fingerprint.author_id, fingerprint.person_type)
+        with self.connect() as conn:
+            return self._hydrate_books(conn, book_ids, sql_where, where_params, fingerprint.locale)
+
+    def _hydrate_books(self, conn, book_ids: List[int], sql_where: str, where_params: List[Any],
+                       locale: str = 'ru') -> Dict[int, Book]:
+        """Полные строки книг по ID: BookID -> Book. Список ID дополняется до одного из немногих размеров
+        (pad_ids), чтобы страницы разной длины выполнялись одним подготовленным выражением"""
+        ids = pad_ids(book_ids)
+        sql_query = self._templates.get(
+            ('hydrate', len(ids), locale, sql_where),
+            lambda: self.build_sql_query_hydrate_books(len(ids), sql_where, locale))
+        return {row[0]: Book(*row) for row in self._fetchall(conn, sql_query, ids + list(where_params))}
+
+
+    @db_call
+    def get_book_card(self, book_id, locale: str = 'ru'):
+        """Строка карточки книги из cb_book_cards (см. zz_46_fill_book_cards.sql)"""
+        genres_column = 'Genres' if locale == 'ru' else 'GenresEn'
+        sql_query = self._templates.get(('book_card', genres_column), lambda: f"""
+                SELECT Title, Year, SrcLang, Series, {genres_column}, Authors, Translators,
+                       CoverFile, FileSize, Pages, Lang, LibRate, BookId
+                FROM cb_book_cards
+                WHERE BookId = %s
+            """)
+        with self.connect() as conn:
+            rows = self._fetchall(conn, sql_query, (book_id,))
+            return rows[0] if rows else None
 
     async def get_book_info(self, book_id, locale: str = 'ru'):
-        """Получает основную информацию о книге"""
-        genre_table = _get_genre_table(locale)
-        with self.connect() as conn:
-            cursor = conn.cursor(buffered=True)
-            cursor.execute(f"""
-                SELECT b.Title, b.Year, b.SrcLang, sn.SeqName,
-                       GROUP_CONCAT(DISTINCT CONCAT(gl.GenreID, ',', gl.GenreDesc) SEPARATOR ',') as Genres,
-                       GROUP_CONCAT(DISTINCT CONCAT(an.AvtorID, ',', an.LastName, ' ', an.FirstName, ' ', an.MiddleName) SEPARATOR ',') as Authors,
-                       GROUP_CONCAT(DISTINCT CONCAT(tn.AvtorID, ',', tn.LastName, ' ', tn.FirstName, ' ', tn.MiddleName) SEPARATOR ',') as Translators,
-                       bp.File, b.FileSize, b.Pages, b.Lang, r.LibRate, b.BookId,
-                       sn.SeqID
-                FROM cb_libbook b
-                LEFT JOIN cb_libavtor a ON a.BookID = b.BookID
-                LEFT JOIN cb_libavtorname an ON a.AvtorID = an.AvtorID
-                LEFT JOIN cb_libtranslator t ON t.BookID = b.BookID
-                LEFT JOIN cb_libavtorname tn ON t.TranslatorID = tn.AvtorID
-                LEFT JOIN cb_libseq s ON s.BookID = b.BookID
-                LEFT JOIN cb_libseqname sn ON s.SeqID = sn.SeqID
-                LEFT JOIN cb_libgenre g ON g.BookID = b.BookID
-                LEFT JOIN {genre_table} gl ON g.GenreID = gl.GenreID
-                LEFT JOIN cb_libbpics bp ON b.BookID = bp.BookID
-                left outer join ( 
-                    select 
-                        r.BookId, 
-                        avg(cast(r.Rate as signed)) as Librate
-                    from cb_librate r 
-                    group by r.BookId 
-                    ) r on r.BookId = b.BookId
-                WHERE b.BookID = %s
-                GROUP BY b.Title, b.Year, b.SrcLang, sn.SeqName, bp.File, b.FileSize, b.Pages, b.Lang
-            """, (book_id,))
-            result = cursor.fetchone()
-            cover_url = FlibustaClient.get_cover_url_direct(result[7]) if result[7] else None
-            # print(f"DEBUG: cover_url = {cover_url}")
-            # Получение ссылки на обложку со страницы книги, если нет в БД
-            if cover_url is None:
-                cover_url = await flibusta_client.get_book_cover_url(book_id)
-                # print(f"DEBUG: cover_url = {cover_url}")
+        """Получает основную информацию о книге (через кэш карточек)"""
+        key = ('book', int(book_id), locale)
+        book_info = self._card_cache.get(key)
+        if book_info is None:
+            book_info = await self.load_book_info(book_id, locale)
+            self._card_cache.put(key, book_info)
+        return book_info
+
+    async def load_book_info(self, book_id, locale: str = 'ru'):
+        """Загружает основную информацию о книге одним запросом (авторы и переводчики - с ID).
+        Ссылка на обложку со страницы книги ищется параллельно с запросом к БД
+        и отменяется, если обложка есть в БД"""
+        cover_task = asyncio.create_task(flibusta_client.get_book_cover_url(book_id))
+        try:
+            result = await self.get_book_card(book_id, locale)
+        except BaseException:
+            cover_task.cancel()
+            raise
+
+        if not result or result[7]:
+            cover_task.cancel()
+        if not result:
+            return None
 
-            return {
-                'title': result[0],      # b.Title
-                'year': result[1],       # b.Year
-                'src_lang': result[2],   # b.SrcLang
-                'series': result[3],     # sn.SeqName
-                'genres': result[4],     # Genres
-                'authors': result[5],    # Authors
-                'translators': result[6],# Translators
-                'cover_url': cover_url,  # bp.File (processed above)
-                'size': result[8],       # b.FileSize
-                'pages': result[9],      # b.Pages
-                'lang': result[10],      # b.Lang
-                'rate': result[11],      # r.LibRate
-                'bookid': result[12],    # b.BookId
-                'seqid': result[13],     # sn.SeqID
-            } if result else None
+        cover_url = FlibustaClient.get_cover_url_direct(result[7]) if result[7] else None
+        # Получение ссылки на обложку со страницы книги, если нет в БД
+        if cover_url is None:
+            cover_url = await cover_task
+
+        return {
+            'title': result[0],                     # Title
+            'year': result[1],                      # Year
+            'src_lang': result[2],                  # SrcLang
+            'series': _parse_json_list(result[3]),  # [{'id', 'name'}]
+            'genres': _parse_json_list(result[4]),
+            'authors': _parse_json_list(result[5]),
+            'translators': _parse_json_list(result[6]),
+            'cover_url': cover_url,                 # CoverFile (processed above)
+            'size': result[8],                      # FileSize
+            'pages': result[9],                     # Pages
+            'lang': result[10],                     # Lang
+            'rate': result[11],                     # LibRate
+            'bookid': result[12],                   # BookId
+        }
 
     async def get_book_details(self, book_id):
+        """Получает аннотацию книги (через кэш карточек)"""
+        key = ('details', int(book_id))
+        book_details = self._card_cache.get(key)
+        if book_details is None:
+            book_details = await self.load_book_details(book_id)
+            self._card_cache.put(key, book_details)
+        return book_details
+
+    @db_call
+    def load_book_details(self, book_id):
         """Получает детальную информацию о книге с обложкой и аннотацией"""
         with self.connect() as conn:
             cursor = conn.cursor(buffered=True)
@@ -1132,29 +1590,40 @@ class DatabaseBooks():
 
     def search_series(self, query, lang, size_limit, rating_filter=None, search_area=SETTING_SEARCH_AREA_B, series_id=0, author_id=0, locale: str = 'ru', genre_filter=None):
         """Ищет серии по запросу"""
-        sql_where = self.build_sql_where_ft(lang, size_limit, rating_filter)
+        cache_key = ('series', normalize_query(query), search_area, lang, size_limit, rating_filter, genre_filter,
+                     locale)
+        series = self._search_cache.get(cache_key)
+        if series is not None:
+            return series
+
+        # Фильтры пользователя применяются во внутреннем WHERE полнотекстового запроса
+        inner_where, inner_params = self.build_sql_where_inner(lang, size_limit, rating_filter,
+                                                               genre_filter=genre_filter)
 
         params = []
         # Пара одинаковых параметров в виде полного запроса для FullText поиска
         params.extend([query] * 2)
+        params.extend(inner_params)
 
         # запрос для поиска серий
-        sql_query_nested = SELECT_SQL_QUERY.get(search_area)(locale, False, genre_filter)
-        sql_query = self.build_sql_query_series(sql_query_nested, sql_where)
+        sql_query = self._templates.get(
+            ('series', search_area, locale, inner_where),
+            lambda: self.build_sql_query_series(SELECT_SQL_QUERY.get(search_area)(locale, False, inner_where),
+                                                "WHERE 1=1"))
 
         # #DEBUG
         # print(f"DEBUG: sql_query = {sql_query}")
         # print(f"DEBUG: params = {params}")
 
-        with self.connect() as conn:
-            cursor = conn.cursor(buffered=True)
-            cursor.execute(sql_query, params)
-            series = cursor.fetchall()
+        with self.search_connection() as conn:
+            series = self._fetchall(conn, sql_query, params)
 
+        self._search_cache.put(cache_key, series)
         return series
 
 
-    async def get_authors_id(self, book_id: int) -> list[ int | None | Any] | None:
+    @db_call
+    def get_authors_id(self, book_id: int) -> list[ int | None | Any] | None:
         """Получает ID авторов книги"""
         with self.connect() as conn:
             cursor = conn.cursor(buffered=True)
@@ -1173,7 +1642,8 @@ class DatabaseBooks():
                 return [author_id[0] for author_id in author_result]
 
 
-    async def get_translators_id(self, book_id: int) -> list[int | None | Any] | None:
+    @db_call
+    def get_translators_id(self, book_id: int) -> list[int | None | Any] | None:
         """Получает ID переводчиков книги"""
         with self.connect() as conn:
             cursor = conn.cursor(buffered=True)
@@ -1192,6 +1662,16 @@ class DatabaseBooks():
 
 
     async def get_author_info(self, author_id: int) -> dict[str, str | None | Any] | None:
+        """Получает информацию об авторе/переводчике (через кэш карточек)"""
+        key = ('author', int(author_id))
+        author_info = self._card_cache.get(key)
+        if author_info is None:
+            author_info = await self.load_author_info(author_id)
+            self._card_cache.put(key, author_info)
+        return author_info
+
+    @db_call
+    def load_author_info(self, author_id: int) -> dict[str, str | None | Any] | None:
         """Получает информацию об авторе книги"""
         with self.connect() as conn:
             cursor = conn.cursor(buffered=True)
@@ -1228,21 +1708,54 @@ class DatabaseBooks():
             } if annotation_result else None
 
 
-    async def get_book_reviews(self, book_id):
-        """Получает отзывы о книге"""
+    @db_call
+    def get_book_reviews(self, book_id, cursor: ReviewCursor = None, limit: int = REVIEWS_PAGE_ROWS):
+        """Получает отзывы о книге от новых к старым: не больше limit строк (Name, Time, Text) после cursor.
+        Keyset по (BookID, Time) читает только нужные строки индекса idx_libreviews_bookid_time_desc;
+        отзывы с Time курсора, которые уже были показаны, отбрасываются по имени автора отзыва"""
         with self.connect() as conn:
-            cursor = conn.cursor(buffered=True)
-            cursor.execute("""
-                SELECT Name, Time, Text 
-                FROM cb_libreviews 
-                WHERE BookID = %s 
-                ORDER BY Time DESC
-            """, (book_id,))
-            return cursor.fetchall()
+            if cursor is None:
+                return self._fetchall(conn, SQL_QUERY_REVIEWS_FIRST, (REVIEW_TEXT_MAX_CHARS, book_id, limit))
+
+            last_time, shown_names = cursor
+            rows = self._fetchall(conn, SQL_QUERY_REVIEWS_AFTER,
+                                  (REVIEW_TEXT_MAX_CHARS, book_id, last_time, limit + len(shown_names)))
+        return [row for row in rows if row[1] != last_time or row[0] not in shown_names][:limit]
+
+    async def get_book_review_page(self, book_id: int, page: int):
+        """Страница отзывов о книге для одного сообщения: (текст без заголовка, есть ли следующая страница).
+        None - такой страницы нет (в том числе у книги нет отзывов)"""
+        entry = self._review_pages.get(book_id)
+        self._review_pages.count(entry.has_page(page))
+
+        while not entry.has_page(page) and not entry.complete:
+            cursor = entry.cursor
+            # На строку больше, чем помещается на страницу, - чтобы знать, есть ли продолжение
+            rows = await self.get_book_reviews(book_id, cursor, REVIEWS_PAGE_ROWS + 1)
+            if entry.cursor != cursor or entry.complete:
+                # Параллельный запрос уже дочитал эту страницу
+                continue
+
+            text, shown = format_reviews_page(rows, REVIEWS_PAGE_CHARS)
+            if shown:
+                entry.pages.append(text)
+                entry.cursor = next_cursor(cursor, rows[:shown])
+            entry.complete = shown >= len(rows)
+
+        if not entry.has_page(page):
+            return None
+        return entry.pages[page], entry.has_more(page)
+
+    def review_cache_stats(self) -> dict:
+        """Статистика кэша страниц отзывов (для мониторинга)"""
+        return self._review_pages.stats()
 
     @classmethod
     def build_sql_query_authors(cls,sql_query_nested, sql_where) -> str:
-        """Собирает SQL запрос поиска авторов и переводчиков"""
+        """Собирает SQL запрос поиска авторов и переводчиков.
+        Найденные книги просматриваются один раз: каждая строка разворачивается в автора
+        и переводчика через JOIN с таблицей из двух строк (STRAIGHT_JOIN - полнотекстовый
+        запрос остаётся ведущим и не выполняется повторно)"""
         return f"""
         SELECT
             CONCAT(COALESCE(LastName, ''), ' ', COALESCE(FirstName, ''), ' ', COALESCE(MiddleName, '')) as AuthorName,
@@ -1250,35 +1763,19 @@ class DatabaseBooks():
             AuthorID,
             PersonType
         FROM (
-            -- Authors
             SELECT
-                LastName,
-                FirstName,
-                MiddleName,
-                FileName,
-                AuthorID,
-                'author' as PersonType,
-                SearchLang,
-                BookSizeCat,
-                LibRate
+                CASE pt.PersonType WHEN 'author' THEN subquery.LastName ELSE subquery.TransLastName END as LastName,
+                CASE pt.PersonType WHEN 'author' THEN subquery.FirstName ELSE subquery.TransFirstName END as FirstName,
+                CASE pt.PersonType WHEN 'author' THEN subquery.MiddleName ELSE subquery.TransMiddleName END as MiddleName,
+                subquery.FileName,
+                CASE pt.PersonType WHEN 'author' THEN subquery.AuthorID ELSE subquery.TransID END as AuthorID,
+                pt.PersonType
             FROM ({sql_query_nested}) as subquery
-            WHERE (LastName <> '' OR FirstName <> '' OR MiddleName <> '')
-            
-            UNION ALL
-            
-            -- Translators
-            SELECT
-                TransLastName as LastName,
-                TransFirstName as FirstName,
-                TransMiddleName as MiddleName,
-                FileName,
-                TransID as AuthorID,
-                'translator' as PersonType,
-                SearchLang,
-                BookSizeCat,
-                LibRate
-            FROM ({sql_query_nested}) as subquery
-            WHERE (TransLastName <> '' OR TransFirstName <> '' OR TransMiddleName <> '')
+            STRAIGHT_JOIN (SELECT 'author' as PersonType UNION ALL SELECT 'translator') as pt
+            WHERE (pt.PersonType = 'author'
+                   AND (subquery.LastName <> '' OR subquery.FirstName <> '' OR subquery.MiddleName <> ''))
+               OR (pt.PersonType = 'translator'
+                   AND (subquery.TransLastName <> '' OR subquery.TransFirstName <> '' OR subquery.TransMiddleName <> ''))
         ) combined
         {sql_where}
         GROUP BY AuthorName, AuthorID, PersonType
@@ -1288,23 +1785,33 @@ class DatabaseBooks():
 
     def search_authors(self, query, lang, size_limit, rating_filter=None, search_area=SETTING_SEARCH_AREA_B, series_id=0, author_id=0, locale: str = 'ru', genre_filter=None):
         """Ищет авторов по запросу"""
-        sql_where = self.build_sql_where_ft(lang, size_limit, rating_filter)
+        cache_key = ('authors', normalize_query(query), search_area, lang, size_limit, rating_filter, genre_filter,
+                     locale)
+        authors = self._search_cache.get(cache_key)
+        if authors is not None:
+            return authors
+
+        # Фильтры пользователя применяются во внутреннем WHERE полнотекстового запроса
+        inner_where, inner_params = self.build_sql_where_inner(lang, size_limit, rating_filter,
+                                                               genre_filter=genre_filter)
 
         params = []
         # Пара одинаковых параметров в виде полного запроса для FullText поиска
-        params.extend([query] * 4)
+        params.extend([query] * 2)
+        params.extend(inner_params)
 
         # Модифицируем запрос для поиска авторов
-        sql_query_nested = SELECT_SQL_QUERY.get(search_area)(locale, False, genre_filter)
-        sql_query = self.build_sql_query_authors(sql_query_nested, sql_where)
+        sql_query = self._templates.get(
+            ('authors', search_area, locale, inner_where),
+            lambda: self.build_sql_query_authors(SELECT_SQL_QUERY.get(search_area)(locale, False, inner_where),
+                                                 "WHERE 1=1"))
 
         # print(f"[DEBUG] search_authors, sql_query={sql_query}")
 
-        with self.connect() as conn:
-            cursor = conn.cursor(buffered=True)
-            cursor.execute(sql_query, params)
-            authors = cursor.fetchall()
+        with self.search_connection() as conn:
+            authors = self._fetchall(conn, sql_query, params)
 
+        self._search_cache.put(cache_key, authors)
         return authors
 
     def search_pop_books(self, lang, size_limit, rating_filter=None, days_back: int = 0, locale: str = 'ru',
@@ -1312,66 +1819,110 @@ class DatabaseBooks():
         """Поиск популярных книг за период"""
         # assert lang.isalpha() and len(lang) <= 3, "Invalid lang"
 
+        # Сначала пробуем предрассчитанный рейтинг (refresh_leaderboards), иначе - живой запрос
+        books = self.search_pop_books_precomputed(lang, size_limit, rating_filter, days_back, locale, genre_filter)
+        if books is not None:
+            return books
+
         # sql_where = self.build_sql_where_ft(lang, size_limit, rating_filter)
-        # Build filter conditions - using actual table columns, not aliases
+        # Build filter conditions - using actual table columns, not aliases; values are bound as parameters
         conditions = ["b.Deleted = '0'"]
+        where_params = []
 
         if lang:
-            conditions.append(f"b.Lang = '{lang.lower()}'")
-
-        # Size filter uses actual FileSize column, not BookSizeCat alias
-        if size_limit:
-            if size_limit == 'less800':
-                conditions.append("b.FileSize <= 819200")  # 800 * 1024
-            elif size_limit == 'more800':
-                conditions.append("b.FileSize > 819200")
-
-        # Rating filter uses actual LibRate from joined table, not alias
-        if rating_filter and rating_filter != '':
-            conditions.append(f"ROUND(COALESCE(r.LibRate, 0)) IN ({rating_filter})")
-
-        # Genre filter — uses g.GenreID from cb_libgenre table (joined via get_base_joins)
-        if genre_filter and genre_filter.strip():
-            if all(c.isdigit() or c == ',' for c in genre_filter):
-                conditions.append(f"g.GenreID IN ({genre_filter})")
+            conditions.append("b.Lang = %s")
+            where_params.append(lang.lower())
+
+        # Size filter uses precomputed SizeBucket column, not BookSizeCat alias
+        if size_limit in SIZE_BUCKETS:
+            conditions.append("b.SizeBucket = %s")
+            where_params.append(SIZE_BUCKETS[size_limit])
+
+        # Rating filter uses precomputed RoundedRate column, not alias
+        rates = id_list(rating_filter)
+        if rates:
+            conditions.append(f"b.RoundedRate IN ({placeholders(len(rates))})")
+            where_params.extend(rates)
+
+        # Genre filter — uses precomputed primary genre of the book
+        genres = id_list(genre_filter)
+        if genres:
+            conditions.append(f"b.PrimaryGenreID IN ({placeholders(len(genres))})")
+            where_params.extend(genres)
 
         sql_where = " AND ".join(conditions)
 
         if days_back == 0:
             # Поиск новинок
-            sql_query_nested = DatabaseBooks.build_sql_query_nov(sql_where, locale)
+            template_key = ('nov', locale, sql_where)
+            build_nested = lambda: DatabaseBooks.build_sql_query_nov(sql_where, locale)
+            params = where_params
         else:
             # Поиск популярных
             filter_recent = 1 if days_back < 999 else 0
-            current_date = self.lib_last_update
-            sql_query_nested = DatabaseBooks.build_sql_query_pop(filter_recent, current_date, sql_where, days_back, locale)
+            template_key = ('pop', filter_recent, locale, sql_where)
+            build_nested = lambda: DatabaseBooks.build_sql_query_pop(filter_recent, sql_where, locale)
+            # Параметры окна периода (recent_joins) стоят в запросе раньше фильтров
+            params = DatabaseBooks.popularity_params(filter_recent, self.lib_last_update, days_back) + where_params
 
         select_fields = ', '.join(Book._fields)
 
-        sql_query = f"""
+        sql_query = self._templates.get(template_key, lambda: f"""
         SELECT {select_fields} FROM (
         -- SELECT /BASE_FIELDS/
             -- , b.relevance
             -- , ROW_NUMBER() OVER (PARTITION BY b.BookId ORDER BY b.BookId) AS rn 
         -- FROM ( /sql_query_nested/ ) b
         -- /BASE_JOINS/ 
-        {sql_query_nested} ) subq
+        {build_nested()} ) subq
         -- /sql_where/ 
         -- and rn = 1
         where rn = 1
         ORDER BY relevance DESC
-        LIMIT {MAX_BOOKS_SEARCH};
-        """
+        LIMIT {MAX_BOOKS_SEARCH}
+        """)
 
         # print(f"DEBUG: {sql_query}")
 
-        with self.connect() as conn:
-            cursor = conn.cursor(buffered=True)
-            cursor.execute(sql_query)
-            books = [Book(*row) for row in cursor.fetchall()]
+        with self.search_connection() as conn:
+            books = book_result_set(self._fetchall(conn, sql_query, params))
 
         return books
 
+    def search_pop_books_precomputed(self, lang, size_limit, rating_filter=None, days_back: int = 0,
+                                     locale: str = 'ru', genre_filter=None):
+        """Популярные книги/новинки из предрассчитанного рейтинга: фильтр по ID и догрузка данных.
+        None - рейтинг ещё не посчитан или не может дать точный результат для этих фильтров"""
+        leaderboard = self._leaderboards.get(days_back)
+        if leaderboard is None:
+            return None
+
+        ranked = leaderboard.select(lang, size_limit, rating_filter, genre_filter, MAX_BOOKS_SEARCH)
+        if ranked is None:
+            return None
+        if not ranked:
+            return book_result_set([])
+
+        with self.search_connection() as conn:
+            hydrated = self._hydrate_books(conn, [book_id for book_id, _ in ranked], "WHERE 1=1", [], locale)
+
+        return book_result_set(hydrated[book_id]._replace(Relevance=relevance)
+                               for book_id, relevance in ranked if book_id in hydrated)
+
+    def refresh_leaderboards(self, depth: int = LEADERBOARD_DEPTH) -> dict:
+        """Пересчитывает рейтинги популярных книг и новинок для всех периодов /pop.
+        Возвращает количество книг в рейтинге каждого периода"""
+        current_date = self.lib_last_update
+        leaderboards = {}
+        with self.connect() as conn:
+            for days_back in LEADERBOARD_PERIODS:
+                sql_query, params = self.build_sql_query_leaderboard(days_back, current_date, depth)
+                leaderboards[days_back] = Leaderboard(self._fetchall(conn, sql_query, params), depth)
+
+        # Подменяем целиком: параллельные запросы видят либо старые, либо новые рейтинги
+        self._leaderboards = leaderboards
+        return {days_back: len(leaderboard) for days_back, leaderboard in leaderboards.items()}
+
     # def search_pop_series(self, lang, size_limit, rating_filter=None, days_back:int=0):
     #     """Поиск популярных книг по сериям за период"""
     #     # assert lang.isalpha() and len(lang) <= 3, "Invalid lang"
@@ -1433,7 +1984,57 @@ class DatabaseBooks():
     #     return authors
 
     @staticmethod
-    def build_sql_query_pop(filter_recent: int, current_date: str, sql_where: str, days_back: int, locale: str = 'ru'):
+    def build_popularity_expressions(filter_recent: int):
+        """Weighted popularity expressions shared by build_sql_query_pop and build_sql_query_leaderboard.
+
+        Returns:
+            (weighted_all_time, weighted_recent, recent_joins); expressions reference
+            cb_book_stats as r, recent_joins adds the period-windowed re/rv tables
+            (its parameters come from popularity_params)
+        """
+        # Weighted expressions using configurable constants
+        # All-time counters come from the precomputed cb_book_stats (joined as r in get_base_joins)
+        weighted_all_time = f"""
+            COALESCE(r.RateCount, 0) * {POPULARITY_WEIGHT_RATE} +
+            COALESCE(r.RecsCount, 0) * {POPULARITY_WEIGHT_RECS} +
+            COALESCE(r.ReviewsCount, 0) * {POPULARITY_WEIGHT_REVIEWS}
+        """
+
+        # Recent counters still need the period window, so only that mode aggregates recs/reviews
+        if filter_recent:
+            weighted_recent = f"""
+            COALESCE(re.cnt, 0) * {POPULARITY_WEIGHT_RECS} +
+            COALESCE(rv.cnt, 0) * {POPULARITY_WEIGHT_REVIEWS}
+        """
+            recent_joins = """
+    LEFT JOIN (
+        SELECT bid AS bookid, COUNT(DISTINCT id) AS cnt
+        FROM cb_librecs
+        WHERE %s - INTERVAL %s DAY <= timestamp
+        GROUP BY bid
+    ) re ON re.BookId = b.BookId
+    LEFT JOIN (
+        SELECT bookid, COUNT(DISTINCT time) AS cnt
+        FROM cb_libreviews
+        WHERE %s - INTERVAL %s DAY <= time
+        GROUP BY bookid
+    ) rv ON rv.BookId = b.BookId"""
+        else:
+            weighted_recent = f"""
+            COALESCE(r.RecsCount, 0) * {POPULARITY_WEIGHT_RECS} +
+            COALESCE(r.ReviewsCount, 0) * {POPULARITY_WEIGHT_REVIEWS}
+        """
+            recent_joins = ""
+
+        return weighted_all_time, weighted_recent, recent_joins
+
+    @staticmethod
+    def popularity_params(filter_recent: int, current_date, days_back: int) -> List[Any]:
+        """Parameters of recent_joins from build_popularity_expressions: period window for recs and reviews"""
+        return [current_date, days_back] * 2 if filter_recent else []
+
+    @staticmethod
+    def build_sql_query_pop(filter_recent: int, sql_where: str, locale: str = 'ru'):
         """Build SQL query for popular books with weighted scoring.
 
         Popularity formula:
@@ -1444,26 +2045,16 @@ class DatabaseBooks():
 
         Args:
             filter_recent: 0 for all-time popularity, 1 for recent period
-            current_date: Reference date for period calculation (ISO date string)
-            days_back: Number of days to look back for recent mode
+            sql_where: Filter conditions on cb_libbook columns with %s placeholders
 
         Returns:
-            SQL query string with weighted relevance scoring
+            SQL query string with weighted relevance scoring; parameters are
+            popularity_params(...) followed by the sql_where parameters
         """
         # assert filter_recent in (0, 1), "filter_recent must be 0 or 1"
         # assert 1 <= days_back <= 999, "days_back out of range"
 
-        # Weighted expressions using configurable constants
-        weighted_all_time = f"""
-            COALESCE(ra.cnt, 0) * {POPULARITY_WEIGHT_RATE} +
-            COALESCE(re.cnt, 0) * {POPULARITY_WEIGHT_RECS} +
-            COALESCE(rv.cnt, 0) * {POPULARITY_WEIGHT_REVIEWS}
-        """
-
-        weighted_recent = f"""
-            COALESCE(re.cnt, 0) * {POPULARITY_WEIGHT_RECS} +
-            COALESCE(rv.cnt, 0) * {POPULARITY_WEIGHT_REVIEWS}
-        """
+        weighted_all_time, weighted_recent, recent_joins = DatabaseBooks.build_popularity_expressions(filter_recent)
 
         return f"""
     SELECT 
@@ -1483,26 +2074,7 @@ class DatabaseBooks():
         END AS relevance_oppos,
         ROW_NUMBER() OVER (PARTITION BY b.BookId ORDER BY b.BookId) AS rn
     FROM cb_libbook b
-    {get_base_joins(locale)}
-    LEFT JOIN (
-        SELECT bookid, COUNT(DISTINCT id) AS cnt
-        FROM cb_librate
-        GROUP BY bookid
-    ) ra ON ra.BookId = b.BookId
-    LEFT JOIN (
-        SELECT bid AS bookid, COUNT(DISTINCT id) AS cnt
-        FROM cb_librecs
-        WHERE '{current_date}' - INTERVAL {days_back} DAY <= timestamp
-           OR {filter_recent} = 0
-        GROUP BY bid
-    ) re ON re.BookId = b.BookId
-    LEFT JOIN (
-        SELECT bookid, COUNT(DISTINCT time) AS cnt
-        FROM cb_libreviews
-        WHERE '{current_date}' - INTERVAL {days_back} DAY <= time
-           OR {filter_recent} = 0
-        GROUP BY bookid
-    ) rv ON rv.BookId = b.BookId
+    {get_base_joins(locale)}{recent_joins}
     -- WHERE b.Deleted = '0'
     WHERE {sql_where}
       AND (CASE {filter_recent}
@@ -1522,6 +2094,43 @@ class DatabaseBooks():
         """
 
 
+    @staticmethod
+    def build_sql_query_leaderboard(days_back: int, current_date: str, depth: int):
+        """Рейтинг периода для предрасчёта (см. leaderboards.py): не больше depth книг на язык,
+        с атрибутами для фильтров пользователя, по убыванию релевантности.
+        days_back=0 - новинки, иначе популярные (как в search_pop_books). Возвращает (sql_query, params)"""
+        if days_back == 0:
+            relevance, relevance_oppos, recent_joins, having = "b.BookID", "0", "", ""
+            params = []
+        else:
+            filter_recent = 1 if days_back < 999 else 0
+            weighted_all_time, weighted_recent, recent_joins = DatabaseBooks.build_popularity_expressions(filter_recent)
+            params = DatabaseBooks.popularity_params(filter_recent, current_date, days_back)
+            relevance, relevance_oppos = (weighted_recent, weighted_all_time) if filter_recent \
+                else (weighted_all_time, weighted_recent)
+            having = f"AND ({relevance}) > 0"
+
+        return f"""
+    SELECT BookID, Lang, SizeBucket, RoundedRate, PrimaryGenreID, Relevance FROM (
+        SELECT
+            b.BookID,
+            lower(b.Lang) AS Lang,
+            b.SizeBucket,
+            b.RoundedRate,
+            b.PrimaryGenreID,
+            {relevance} AS Relevance,
+            {relevance_oppos} AS RelevanceOppos,
+            ROW_NUMBER() OVER (PARTITION BY lower(b.Lang) ORDER BY {relevance} DESC, {relevance_oppos} DESC, b.BookID DESC) AS rn
+        FROM cb_libbook b
+        LEFT JOIN cb_book_stats r ON r.BookId = b.BookId
+        {recent_joins}
+        WHERE b.Deleted = '0'
+          {having}
+    ) ranked
+    WHERE rn <= %s
+    ORDER BY Relevance DESC, RelevanceOppos DESC, BookID DESC
+        """, params + [depth]
+
     @staticmethod
     def build_sql_query_nov(sql_where, locale: str = 'ru'):
         """Поиск новинок"""
@@ -1548,40 +2157,89 @@ class DatabaseBooks():
     @staticmethod
     def build_sql_where_ft(lang, size_limit, rating_filter=None, series_id=0, author_id=0, person_type='author',
                            genre_filter=None):
-        """Создает SQL-условие WHERE на основе списка слов и их операторов."""
+        """Создает SQL-условие WHERE по алиасам полей книги. Возвращает (sql_where, params)"""
         conditions = []
+        params = []
 
         # Добавляем условие по языку, если задан в настройках пользователя
         if lang:
-            conditions.append(f"SearchLang = '{lang.upper()}'")
+            conditions.append("SearchLang = %s")
+            params.append(lang.upper())
 
         # Добавляем ограничение по размеру книг, если задан в настройках пользователя
-        if size_limit:
-            conditions.append(f"BookSizeCat = '{size_limit}'")
+        if size_limit in SIZE_BUCKETS:
+            conditions.append("BookSizeCat = %s")
+            params.append(SIZE_BUCKETS[size_limit])
 
         # ДОБАВЛЯЕМ ФИЛЬТРАЦИЮ ПО РЕЙТИНГУ
-        if rating_filter and rating_filter != '':
-            rating_condition = f"LibRate IN ({rating_filter})"
-            conditions.append(rating_condition)
+        rates = id_list(rating_filter)
+        if rates:
+            conditions.append(f"LibRate IN ({placeholders(len(rates))})")
+            params.extend(rates)
 
         # Добавляем условие по серии в поиске книг по сериям
         if series_id != 0:
-            conditions.append(f"SeriesID = {series_id}")
+            conditions.append("SeriesID = %s")
+            params.append(int(series_id))
 
         # Добавляем условие по автору в поиске книг по авторам
         if author_id != 0:
-            conditions.append(f"AuthorID = {author_id}" if person_type=='author' else f"TransID = {author_id}")
+            conditions.append("AuthorID = %s" if person_type=='author' else "TransID = %s")
+            params.append(int(author_id))
 
         # Note: Genre filter is NOT added here because this WHERE clause is used outside the subquery
-        # where table aliases are not available. Genre filter is handled separately in build_sql_query_books.
+        # where table aliases are not available. Genre filter is handled separately in build_sql_where_inner.
 
         # в соновном sql вконце уже есть where, поэтому заменяем его на and
         sql_where = "WHERE " + " AND ".join(conditions) if conditions else "WHERE 1=1"
-        return sql_where #, params
+        return sql_where, params
+
+    @staticmethod
+    def build_sql_where_inner(lang, size_limit, rating_filter=None, series_id=0, author_id=0, person_type='author',
+                              genre_filter=None) -> Tuple[str, List[Any]]:
+        """Фильтры пользователя для внутреннего WHERE полнотекстового запроса (SELECT_SQL_QUERY).
+        Условия на реальных колонках cb_libbook и присоединённых таблиц, чтобы MariaDB отбрасывала
+        строки до материализации результата и могла использовать индексы (zz_20_create_indexes.sql).
+        Возвращает (строку вида "AND ... AND ..." или пустую строку, параметры условий)"""
+        conditions = []
+        params = []
+
+        if lang:
+            conditions.append("b.Lang = %s")
+            params.append(lang.lower())
+
+        if size_limit in SIZE_BUCKETS:
+            conditions.append("b.SizeBucket = %s")
+            params.append(SIZE_BUCKETS[size_limit])
+
+        rates = id_list(rating_filter)
+        if rates:
+            conditions.append(f"b.RoundedRate IN ({placeholders(len(rates))})")
+            params.extend(rates)
+
+        # Фильтр по жанру применяется к основному жанру книги (cb_libbook.PrimaryGenreID)
+        genres = id_list(genre_filter)
+        if genres:
+            conditions.append(f"b.PrimaryGenreID IN ({placeholders(len(genres))})")
+            params.extend(genres)
+
+        if series_id != 0:
+            conditions.append("s.SeqID = %s")
+            params.append(int(series_id))
+
+        if author_id != 0:
+            if person_type == 'author':
+                conditions.append("a.AvtorID = %s")
+            else:
+                conditions.append("t.TranslatorID = %s")
+            params.append(int(author_id))
+
+        return ''.join(f"AND {condition} " for condition in conditions), params
 
 
     @staticmethod
-    def build_sql_query_books(sql_where, sort_order='desc', search_area=SETTING_SEARCH_AREA_B, locale: str = 'ru', is_empty=False, genre_filter=None):
+    def build_sql_query_books(sql_where, sort_order='desc', search_area=SETTING_SEARCH_AREA_B, locale: str = 'ru', is_empty=False,
+                              inner_where=''):
         fields = Book._fields
 
         # Всегда используем sum для Relevance
@@ -1592,7 +2250,7 @@ class DatabaseBooks():
 
         select_fields = ', '.join(processed_fields)
 
-        sql_query_nested = SELECT_SQL_QUERY.get(search_area)(locale, is_empty, genre_filter)
+        sql_query_nested = SELECT_SQL_QUERY.get(search_area)(locale, is_empty, inner_where)
         from_clause = f"FROM ( {sql_query_nested} {sql_where} ) as subquery"
 
         sql_query = f"""
@@ -1612,35 +2270,153 @@ class DatabaseBooks():
 
         return sql_query
 
-    def invalidate_db_cache(self):
+    @staticmethod
+    def build_sql_where_book_ids(query, lang, size_limit, rating_filter=None, search_area=SETTING_SEARCH_AREA_B,
+                                 series_id=0, author_id=0, person_type='author', is_empty=False, genre_filter=None):
+        """Условия первой фазы двухфазного поиска. Возвращает (sql_where без WHERE, params);
+        params включают поисковую строку для выражения релевантности в SELECT"""
+        _, match_expr = SELECT_SQL_IDS_SOURCE.get(search_area)
+        conditions = ["b.Deleted = '0'"]
+        params = []
+
+        if not is_empty:
+            conditions.append(match_expr)
+            # Выражение релевантности в SELECT и условие в WHERE
+            params.extend([query] * 2)
+
+        if lang:
+            conditions.append("b.Lang = %s")
+            params.append(lang.lower())
+
+        if size_limit in SIZE_BUCKETS:
+            conditions.append("b.SizeBucket = %s")
+            params.append(SIZE_BUCKETS[size_limit])
+
+        rates = id_list(rating_filter)
+        if rates:
+            conditions.append(f"b.RoundedRate IN ({placeholders(len(rates))})")
+            params.extend(rates)
+
+        if series_id != 0:
+            conditions.append("b.BookID IN (SELECT BookID FROM cb_libseq WHERE SeqID = %s)")
+            params.append(series_id)
+
+        if author_id != 0:
+            if person_type == 'author':
+                conditions.append("b.BookID IN (SELECT BookID FROM cb_libavtor WHERE AvtorID = %s)")
+            else:
+                conditions.append("b.BookID IN (SELECT BookID FROM cb_libtranslator WHERE TranslatorID = %s)")
+            params.append(author_id)
+
+        # Как и в build_sql_where_inner, фильтр по жанру применяется к основному жанру книги
+        genres = id_list(genre_filter)
+        if genres:
+            conditions.append(f"b.PrimaryGenreID IN ({placeholders(len(genres))})")
+            params.extend(genres)
+
+        return ' AND '.join(conditions), params
+
+    @staticmethod
+    def build_sql_query_book_ids(search_area, sql_where, is_empty=False, sort_order='desc'):
+        """Первая фаза двухфазного поиска: ID книг с релевантностью (условия - build_sql_where_book_ids)"""
+        from_clause, match_expr = SELECT_SQL_IDS_SOURCE.get(search_area)
+        return f"""
+            SELECT b.BookID, MAX({'1' if is_empty else match_expr}) AS Relevance
+            {from_clause}
+            WHERE {sql_where}
+            GROUP BY b.BookID
+            ORDER BY Relevance DESC, b.BookID {sort_order}
+            LIMIT {MAX_BOOKS_SEARCH}
         """
-        Hourly check to detect database updates and invalidate cache if needed.
-        Called from cleanup_old_sessions task.
+
+    @staticmethod
+    def build_sql_query_hydrate_books(ids_count, sql_where, locale: str = 'ru'):
+        """Вторая фаза двухфазного поиска: полные данные книг по списку ID (одна строка на книгу).
+        Параметры: ids_count ID книг, затем параметры sql_where"""
+        select_fields = ', '.join(Book._fields)
+        ids = placeholders(ids_count)
+
+        return f"""
+            select {select_fields} from (
+            SELECT {select_fields},
+              ROW_NUMBER() OVER (PARTITION BY FileName ORDER BY FileName) AS rn
+            FROM (
+                SELECT {BASE_FIELDS},
+                    0 as Relevance
+                FROM cb_libbook b
+                {get_base_joins(locale)}
+                WHERE b.BookID IN ({ids})
+            ) as subquery
+            {sql_where}
+            ) as ranked
+            where rn = 1
+        """
+
+    @property
+    def file_generation(self) -> int | None:
+        """Поколение файлов книг для кэша file_id: версия libbook из catalog_generation, без неё - MAX(BookID).
+        None, пока поколение не известно (до загрузки снимка каталога или первой проверки invalidate_db_cache):
+        file_id, сохранённые с поколением-заглушкой, удалились бы первой же проверкой"""
+        return DatabaseBooks._class_generation.get('libbook') or DatabaseBooks._class_max_book_id
+
+    def get_catalog_generation(self) -> Dict[str, int] | None:
+        """
+        Версии таблиц каталога из catalog_generation (пишут скрипты обновления БД, bump_generation.sh)
+
+        Returns:
+            {таблица: версия} или None, если таблицы поколений нет или БД недоступна
+        """
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT TableName, Version FROM catalog_generation")
+                return {table: int(version) for table, version in cursor.fetchall()}
+        except Exception:
+            return None
+
+    def invalidate_db_cache(self) -> set:
+        """
+        Hourly check to detect database updates and invalidate only the caches that depend on changed tables.
+        Called only from the health.check_catalog_update job (in an executor thread), which starts the
+        follow-up jobs from the returned set; the lock keeps a second check from taking the same change.
+
+        The catalog_generation row versions are compared with the ones seen last time. Without the
+        generation table (or before it was seen for the first time) MAX(BookID) is compared instead
+        and every cache is dropped when it differs.
+
+        Returns:
+            Names of invalidated caches (see catalog_generation.CACHE_TABLES), empty if nothing changed
         """
         # from logger import logger
+        with DatabaseBooks._class_generation_lock:
+            return self._check_catalog_generation()
+
+    def _check_catalog_generation(self) -> set:
         try:
-            # Get current max book ID from DB
-            current_max = self.get_max_book_id()
-            if current_max is None:
-                return  # Cannot determine, skip
-
-            # Get cached max from _class_stats
-            cached_max = DatabaseBooks._class_stats.get('max_filename') if DatabaseBooks._class_stats else None
-
-            if current_max != cached_max:
-                # Database updated - clear all class-level caches
-                DatabaseBooks._class_cached_langs = None
-                DatabaseBooks._class_cached_parent_genres = {}
-                DatabaseBooks._class_cached_genres = {}
-                DatabaseBooks._class_stats = {}
-
-                # logger.log_system_action("Cache invalidated due to database update",
-                #                          f"old_max={cached_max}, new_max={current_max}, difference={current_max - cached_max if isinstance(cached_max, int) else None}")
+            generation = self.get_catalog_generation()
+            known_generation = DatabaseBooks._class_generation
+
+            if generation and known_generation:
+                stale = affected_caches(changed_tables(known_generation, generation))
+            else:
+                # Get current max book ID from DB
+                current_max = self.get_max_book_id()
+                if current_max is None:
+                    return set()  # Cannot determine, skip
+                stale = set(ALL_CACHES) if current_max != DatabaseBooks._class_max_book_id else set()
+                DatabaseBooks._class_max_book_id = current_max
+
+            if generation:
+                DatabaseBooks._class_generation = generation
+            if stale:
+                self._invalidate_caches(stale)
+                print(f"♻️ Catalog changed, invalidated caches: {', '.join(sorted(stale))}")
+            return stale
         except Exception as e:
             # logger.log_system_action("Cache invalidation check failed", str(e))
-            pass
-    
-    
+            return set()
+
+
 DB_BOOKS = DatabaseBooks({
     'host': os.getenv('DB_HOST'),
     'port': int(os.getenv('DB_PORT', 3306)),
@@ -1648,6 +2424,25 @@ DB_BOOKS = DatabaseBooks({
     'user': os.getenv('DB_USER'),
     'password': os.getenv('DB_PASSWORD'),
     'charset': os.getenv('DB_CHARSET', 'utf8mb4')
-})
+},
+    pool_size=int(os.getenv('DB_POOL_SIZE', DB_POOL_SIZE)),
+    pool_acquire_timeout=float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', DB_POOL_ACQUIRE_TIMEOUT)),
+    pool_max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', DB_POOL_MAX_LIFETIME)),
+    pool_ping_after_idle=float(os.getenv('DB_POOL_PING_AFTER_IDLE', DB_POOL_PING_AFTER_IDLE)),
+    search_mode=os.getenv('SEARCH_MODE', SEARCH_MODE),
+    search_cache_max_bytes=int(os.getenv('SEARCH_CACHE_MAX_MB', SEARCH_CACHE_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+    search_cache_ttl=float(os.getenv('SEARCH_CACHE_TTL', SEARCH_CACHE_TTL)),
+    call_timeout=float(os.getenv('DB_CALL_TIMEOUT', DB_CALL_TIMEOUT)),
+    pool_background_connections=int(os.getenv('DB_POOL_BACKGROUND_CONNECTIONS', DB_POOL_BACKGROUND_CONNECTIONS)),
+    executor_workers=int(os.getenv('DB_EXECUTOR_WORKERS', DB_EXECUTOR_WORKERS)),
+    executor_max_queue=int(os.getenv('DB_EXECUTOR_MAX_QUEUE', DB_EXECUTOR_MAX_QUEUE)),
+    lookup_workers=int(os.getenv('DB_LOOKUP_WORKERS', DB_LOOKUP_WORKERS)),
+    lookup_max_queue=int(os.getenv('DB_LOOKUP_MAX_QUEUE', DB_LOOKUP_MAX_QUEUE)),
+    max_statement_time=float(os.getenv('DB_MAX_STATEMENT_TIME', DB_MAX_STATEMENT_TIME)),
+    book_row_cache_size=int(os.getenv('BOOK_ROW_CACHE_SIZE', BOOK_ROW_CACHE_SIZE)),
+    prepared_statements=int(os.getenv('DB_PREPARED_STATEMENTS', DB_PREPARED_STATEMENTS)),
+    card_cache_max_bytes=int(os.getenv('CARD_CACHE_MAX_MB', CARD_CACHE_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+    card_cache_ttl=float(os.getenv('CARD_CACHE_TTL', CARD_CACHE_TTL))
+)
 
 DB_LOGS = DatabaseLogs()
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Асинхронный доступ к каталогу MariaDB
+
+mysql-connector блокирующий, поэтому поиски и async-методы DatabaseBooks выполняют
+запросы в отдельном ограниченном пуле потоков и не останавливают event loop.
+У каждого вызова есть таймаут: он ограничивает и ожидание результата, и ожидание
+свободного соединения в пуле. Поиски дополнительно регистрируются по ключу (пользователь
+в чате), чтобы новый поиск мог прервать на сервере предыдущий (KILL QUERY).
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Дедлайн текущего вызова в потоке executor'а (читается в DatabaseBooks.connect)
+_call_deadline = threading.local()
+# Отменяемый запрос, выполняющийся в текущем потоке (читается в DatabaseBooks.search_connection)
+_call_query = threading.local()
+
+
+def remaining_call_time() -> Optional[float]:
+    """Сколько секунд осталось у текущего вызова через DBExecutor (None - вызов без дедлайна)"""
+    deadline = getattr(_call_deadline, 'value', None)
+    if deadline is None:
+        return None
+    return max(0.0, deadline - monotonic())
+
+
+def current_query() -> Optional['RunningQuery']:
+    """Отменяемый запрос текущего потока (None - вызов без ключа отмены)"""
+    return getattr(_call_query, 'value', None)
+
+
+class DBBusyError(Exception):
+    """Очередь запросов к БД переполнена - пользователю стоит повторить попытку позже"""
+
+
+class QueryCancelledError(Exception):
+    """Запрос отменён: тот же пользователь в чате начал новый поиск"""
+
+
+class QueryTimeoutError(asyncio.TimeoutError):
+    """Сервер прервал запрос по max_statement_time"""
+
+
+class RunningQuery:
+    """
+    Поисковый запрос, который можно прервать по ключу
+
+    connection_id заполняется, пока запрос держит соединение из пула. lock удерживается
+    на время KILL QUERY, чтобы соединение не вернулось в пул (и не досталось другому
+    запросу) раньше, чем сервер получит команду.
+    """
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.connection_id: Optional[int] = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+
+class QueryRegistry:
+    """Последний запрос по каждому ключу (обычно (user_id, chat_id)) и счётчики отмен"""
+
+    def __init__(self):
+        self._queries: Dict[Hashable, RunningQuery] = {}
+        self._lock = threading.Lock()
+        self._superseded = 0
+        self._killed = 0
+
+    def start(self, key: Hashable) -> Tuple[RunningQuery, Optional[RunningQuery]]:
+        """Регистрирует новый запрос; возвращает его и помеченный отменённым предыдущий запрос по ключу"""
+        query = RunningQuery(key)
+        with self._lock:
+            previous = self._queries.get(key)
+            self._queries[key] = query
+            if previous is not None:
+                previous.cancelled = True
+                self._superseded += 1
+        return query, previous
+
+    def finish(self, query: RunningQuery) -> None:
+        """Снимает запрос с учёта (если его ещё не заменил более новый)"""
+        with self._lock:
+            if self._queries.get(query.key) is query:
+                del self._queries[query.key]
+
+    def count_killed(self) -> None:
+        with self._lock:
+            self._killed += 1
+
+    @staticmethod
+    def run_bound(query: RunningQuery, fn: Callable, *args, **kwargs) -> Any:
+        """Выполняет fn в потоке executor'а, сделав query текущим отменяемым запросом"""
+        _call_query.value = query
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _call_query.value = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику отмен для мониторинга"""
+        with self._lock:
+            return {
+                'active_queries': len(self._queries),
+                'superseded': self._superseded,
+                'killed': self._killed,
+            }
+
+
+class DBExecutor:
+    """
+    Именованный пул потоков для блокирующих запросов к MariaDB
+
+    - Ограниченное число потоков (по размеру пула соединений)
+    - Очередь ожидания с лимитом: при переполнении вызов сразу отклоняется (DBBusyError)
+    - Таймаут на вызов
+    - Метрики: глубина очереди, время ожидания в очереди и выполнения, отказы, таймауты
+    """
+
+    def __init__(self, max_workers: int, call_timeout: float, max_queue: int = 0, name: str = 'db-books'):
+        """
+        Args:
+            max_workers: Количество потоков (обычно равно размеру пула соединений)
+            call_timeout: Таймаут вызова по умолчанию в секундах
+            max_queue: Сколько вызовов может ждать свободный поток (0 - без ограничения)
+            name: Префикс имён потоков
+        """
+        self.max_workers = max(1, max_workers)
+        self.call_timeout = call_timeout
+        self.max_queue = max_queue
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        # Состояние и метрики
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Выполняет fn(*args, **kwargs) в потоке executor'а
+
+        Raises:
+            DBBusyError: очередь ожидания переполнена, вызов не выполнялся
+            asyncio.TimeoutError: вызов не уложился в timeout (запрос в потоке доработает и вернёт соединение)
+        """
+        timeout = self.call_timeout if timeout is None else timeout
+        submitted_at = monotonic()
+        deadline = submitted_at + timeout
+
+        with self._lock:
+            if self.max_queue and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise DBBusyError(f"DB executor '{self.name}' queue is full ({self._queued} waiting)")
+            self._queued += 1
+            self._submitted += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        def call():
+            started_at = monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                waited = started_at - submitted_at
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+            _call_deadline.value = deadline
+            failed = False
+            try:
+                if monotonic() >= deadline:
+                    # Вызов простоял в очереди дольше таймаута - ожидающего уже нет
+                    failed = True
+                    raise asyncio.TimeoutError()
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                _call_deadline.value = None
+                elapsed = monotonic() - started_at
+                with self._lock:
+                    self._running -= 1
+                    self._run_total += elapsed
+                    self._run_max = max(self._run_max, elapsed)
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+
+        future = self._executor.submit(call)
+        try:
+            # shield: при таймауте/отмене сами решаем, можно ли снять вызов из очереди
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._timeouts += 1
+                if future.cancel():
+                    # Вызов ещё не начал выполняться
+                    self._queued -= 1
+            raise
+
+    def shutdown(self) -> None:
+        """Останавливает executor: ждёт выполняющиеся запросы, ожидающие в очереди отменяет"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику executor'а для мониторинга"""
+        with self._lock:
+            started = self._completed + self._failed + self._running
+            finished = self._completed + self._failed
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queued': self._queued,
+                'running': self._running,
+                'max_queued': self._max_queued,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'wait_avg_ms': round(self._wait_total / started * 1000, 1) if started else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 1),
+                'run_avg_ms': round(self._run_total / finished * 1000, 1) if finished else 0.0,
+                'run_max_ms': round(self._run_max * 1000, 1),
+            }
+
+
+def db_call(method: Callable) -> Callable:
+    """
+    Декоратор для блокирующих методов DatabaseBooks: превращает метод в корутину,
+    выполняемую в self._lookup_executor (отдельно от поисков) с таймаутом вызова
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self._lookup_executor.run(method, self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,371 @@
+"""
+Пул соединений с MariaDB для DatabaseBooks
+"""
+
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, Dict, Optional
+
+import mysql.connector
+
+
+class PoolExhaustedError(Exception):
+    """Не удалось получить соединение из пула за отведённое время"""
+
+
+class PoolClosedError(Exception):
+    """Пул закрыт (бот останавливается)"""
+
+
+class PreparedStatementCache:
+    """
+    Подготовленные на сервере выражения одного соединения: LRU курсоров (prepared=True) по тексту SQL
+
+    Курсор prepared готовит выражение при первом execute и выполняет его повторно, пока текст
+    запроса тот же. Используется только потоком, который держит соединение, поэтому без блокировок
+    """
+
+    def __init__(self, conn, max_statements: int):
+        self.conn = conn
+        self.max_statements = max(1, max_statements)
+        self._cursors: OrderedDict[str, Any] = OrderedDict()
+        # Переменные сессии, изменённые владельцем соединения: reset_session в этом режиме не выполняется,
+        # пул возвращает их к DEFAULT при возврате соединения (MariaDBPool._reset_session_variables)
+        self.session: Dict[str, Any] = {}
+
+        # Метрики
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def cursor(self, sql: str):
+        """Курсор с подготовленным выражением для sql (новый - если выражение ещё не готовилось)"""
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return cursor
+
+        self.misses += 1
+        cursor = self.conn.cursor(prepared=True)
+        self._cursors[sql] = cursor
+        while len(self._cursors) > self.max_statements:
+            _, evicted = self._cursors.popitem(last=False)
+            self._close_cursor(evicted)
+            self.evictions += 1
+        return cursor
+
+    def discard(self, sql: str) -> None:
+        """Удаляет выражение (например, после ошибки выполнения - курсор мог остаться в неизвестном состоянии)"""
+        cursor = self._cursors.pop(sql, None)
+        if cursor is not None:
+            self._close_cursor(cursor)
+
+    @staticmethod
+    def _close_cursor(cursor) -> None:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+@dataclass
+class _PooledConnection:
+    """Соединение пула с временными метками для проверки здоровья и ротации"""
+    conn: Any
+    created_at: float
+    last_used_at: float
+    statements: Optional[PreparedStatementCache] = None
+
+
+class MariaDBPool:
+    """
+    Thread-safe пул соединений mysql-connector
+
+    Особенности:
+    - Соединения создаются лениво, но не больше size одновременно
+    - Ожидание свободного соединения с таймаутом (метрики времени ожидания)
+    - Проверка соединения (ping) перед выдачей, если оно долго простаивало
+    - Сброс сессии (rollback + reset_session) при возврате в пул
+    - Кэш подготовленных выражений на каждое соединение (prepared_statements > 0); в этом режиме
+      reset_session не выполняется - он удаляет выражения на сервере. Вместо него сбрасываются
+      переменные сессии, записанные в PreparedStatementCache.session; ничего другого (пользовательские
+      переменные, временные таблицы, другие SET SESSION) владельцы соединений менять не должны
+    - Пересоздание соединений старше max_lifetime секунд
+    - Аккуратное закрытие: ждём возврата выданных соединений и закрываем все
+    """
+
+    def __init__(self, db_config: Dict[str, Any], size: int, acquire_timeout: float = 10.0,
+                 max_lifetime: float = 3600.0, ping_after_idle: float = 30.0, prepared_statements: int = 0):
+        """
+        Args:
+            db_config: Параметры mysql.connector.connect
+            size: Максимальное количество соединений
+            acquire_timeout: Сколько секунд ждать свободное соединение
+            max_lifetime: Максимальное время жизни соединения в секундах
+            ping_after_idle: Проверять соединение, если оно простаивало дольше (сек)
+            prepared_statements: Сколько подготовленных выражений держать на соединение (0 - не использовать)
+        """
+        self.db_config = db_config
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after_idle = ping_after_idle
+        self.prepared_statements = max(0, prepared_statements)
+
+        self._idle: deque[_PooledConnection] = deque()
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # id(conn) -> кэш выражений выданных и простаивающих соединений (см. statement_cache)
+        self._statements: Dict[int, PreparedStatementCache] = {}
+
+        # Метрики
+        self._acquired = 0
+        self._created = 0
+        self._recycled = 0
+        self._broken = 0
+        self._timeouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # Счётчики выражений уже закрытых соединений: hits, misses, evictions
+        self._retired_statements = [0, 0, 0]
+
+    # ===== ВЫДАЧА И ВОЗВРАТ СОЕДИНЕНИЙ =====
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        Контекстный менеджер: берёт соединение из пула и возвращает его обратно
+
+        Args:
+            timeout: Сколько секунд ждать свободное соединение (по умолчанию acquire_timeout)
+        """
+        entry = self._acquire(self.acquire_timeout if timeout is None else timeout)
+        try:
+            yield entry.conn
+        finally:
+            self._release(entry)
+
+    def _acquire(self, timeout: float) -> _PooledConnection:
+        start = monotonic()
+        deadline = start + timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("MariaDB pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._total() < self.size:
+                    # Резервируем место и создаём соединение вне блокировки
+                    self._in_use += 1
+                    entry = None
+                    break
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        f"No free MariaDB connection in {timeout:.1f}s (pool size {self.size})")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._acquired += 1
+            if waited:
+                wait_time = monotonic() - start
+                self._waits += 1
+                self._wait_total += wait_time
+                self._wait_max = max(self._wait_max, wait_time)
+
+        try:
+            if entry is None:
+                return self._create()
+            return self._ensure_healthy(entry)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, entry: _PooledConnection) -> None:
+        now = monotonic()
+        expired = now - entry.created_at >= self.max_lifetime
+        keep = not self._closed and not expired and self._reset(entry.conn)
+
+        if keep:
+            entry.last_used_at = now
+        else:
+            self._close_entry(entry)
+
+        with self._cond:
+            if expired and not self._closed:
+                self._recycled += 1
+            self._in_use -= 1
+            if keep and not self._closed:
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def statement_cache(self, conn) -> Optional[PreparedStatementCache]:
+        """Кэш подготовленных выражений выданного соединения (None - выражения не используются)"""
+        return self._statements.get(id(conn))
+
+    def kill_query(self, connection_id: int) -> None:
+        """Прерывает текущий запрос соединения (KILL QUERY) через отдельное служебное соединение:
+        в самом пуле свободных соединений может не оказаться"""
+        conn = mysql.connector.connect(**self.db_config)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"KILL QUERY {int(connection_id)}")
+            cursor.close()
+        finally:
+            self._close_quietly(conn)
+
+    # ===== ОБСЛУЖИВАНИЕ СОЕДИНЕНИЙ =====
+
+    def _create(self) -> _PooledConnection:
+        conn = mysql.connector.connect(**self.db_config)
+        now = monotonic()
+        entry = _PooledConnection(conn=conn, created_at=now, last_used_at=now)
+        with self._cond:
+            self._created += 1
+            if self.prepared_statements:
+                entry.statements = PreparedStatementCache(conn, self.prepared_statements)
+                self._statements[id(conn)] = entry.statements
+        return entry
+
+    def _ensure_healthy(self, entry: _PooledConnection) -> _PooledConnection:
+        """Проверяет возраст и живость соединения, при необходимости пересоздаёт"""
+        now = monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            self._close_entry(entry)
+            with self._cond:
+                self._recycled += 1
+            return self._create()
+
+        if now - entry.last_used_at >= self.ping_after_idle:
+            try:
+                entry.conn.ping(reconnect=False)
+            except Exception:
+                self._close_entry(entry)
+                with self._cond:
+                    self._broken += 1
+                return self._create()
+        return entry
+
+    def _reset(self, conn) -> bool:
+        """Возвращает соединение в исходное состояние; False — соединение надо выбросить"""
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+            if not self.prepared_statements:
+                conn.reset_session()
+            else:
+                self._reset_session_variables(conn)
+            return True
+        except Exception:
+            with self._cond:
+                self._broken += 1
+            return False
+
+    def _reset_session_variables(self, conn) -> None:
+        """Возвращает к значениям по умолчанию переменные сессии, изменённые владельцем соединения"""
+        statements = self.statement_cache(conn)
+        if statements is None or not statements.session:
+            return
+        cursor = conn.cursor()
+        try:
+            for name in statements.session:
+                cursor.execute(f"SET SESSION {name} = DEFAULT")
+        finally:
+            cursor.close()
+        statements.session.clear()
+
+    def _close_entry(self, entry: _PooledConnection) -> None:
+        """Закрывает соединение пула; счётчики его выражений переходят в общую статистику"""
+        if entry.statements is not None:
+            with self._cond:
+                self._statements.pop(id(entry.conn), None)
+                retired = self._retired_statements
+                retired[0] += entry.statements.hits
+                retired[1] += entry.statements.misses
+                retired[2] += entry.statements.evictions
+        self._close_quietly(entry.conn)
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _total(self) -> int:
+        return len(self._idle) + self._in_use
+
+    # ===== ЗАКРЫТИЕ И МЕТРИКИ =====
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Закрывает пул: новые запросы отклоняются, ждём возврата выданных
+        соединений (не дольше timeout секунд) и закрываем все простаивающие
+        """
+        with self._cond:
+            self._closed = True
+            deadline = monotonic() + timeout
+            while self._in_use > 0:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for entry in idle:
+            self._close_entry(entry)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Возвращает статистику пула для мониторинга"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'acquired': self._acquired,
+                'created': self._created,
+                'recycled': self._recycled,
+                'broken': self._broken,
+                'timeouts': self._timeouts,
+                'waits': self._waits,
+                'wait_avg_ms': round(self._wait_total / self._waits * 1000, 1) if self._waits else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 1),
+            }
+
+    def statement_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику подготовленных выражений всех соединений для мониторинга"""
+        with self._cond:
+            caches = list(self._statements.values())
+            hits, misses, evictions = self._retired_statements
+        hits += sum(cache.hits for cache in caches)
+        misses += sum(cache.misses for cache in caches)
+        evictions += sum(cache.evictions for cache in caches)
+        lookups = hits + misses
+        return {
+            'prepared_per_connection': self.prepared_statements,
+            'prepared': sum(len(cache) for cache in caches),
+            'prepared_hits': hits,
+            'prepared_misses': misses,
+            'prepared_hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'prepared_evictions': evictions,
+        }
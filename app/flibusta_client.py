@@ -1,10 +1,22 @@
 import os
-import aiohttp
+import tempfile
 from urllib.parse import unquote
 import re
 from bs4 import BeautifulSoup
 
-from .constants import FLIBUSTA_BASE_URL
+from .constants import FLIBUSTA_BASE_URL, FLIBUSTA_DOWNLOAD_WAIT_TIMEOUT, FLIBUSTA_COVER_WAIT_TIMEOUT, \
+    TELEGRAM_MAX_FILE_SIZE, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_SPOOL_MAX_MEMORY, HTTP_CALL_PAGE, HTTP_CALL_DOWNLOAD
+from .http_transport import HTTP_TRANSPORT
+from .single_flight import SingleFlight
+from .byte_budget import DOWNLOAD_BUDGET
+
+
+class BookTooLargeError(Exception):
+    """Книга больше лимита Telegram на файлы бота (TELEGRAM_MAX_FILE_SIZE)"""
+
+    def __init__(self, size: int):
+        super().__init__(f"Book size {size} exceeds {TELEGRAM_MAX_FILE_SIZE} bytes")
+        self.size = size
 
 
 class FlibustaClient:
@@ -62,11 +74,14 @@ class FlibustaClient:
         self._password = password
         # self._base_url = base_url
         self._is_logged_in = False
+        # Одновременные скачивания одной книги и поиски одной обложки выполняются один раз
+        self._downloads = SingleFlight('downloads', FLIBUSTA_DOWNLOAD_WAIT_TIMEOUT)
+        self._covers = SingleFlight('covers', FLIBUSTA_COVER_WAIT_TIMEOUT)
 
     async def _create_session(self):
-        timeout = aiohttp.ClientTimeout(total=30)
-        return aiohttp.ClientSession(
-            timeout=timeout,
+        # Сессии без авторизации и с авторизацией - свои cookies на общем пуле соединений
+        return HTTP_TRANSPORT.create_session(
+            HTTP_CALL_PAGE,
             headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         )
 
@@ -124,27 +139,49 @@ class FlibustaClient:
         self._is_logged_in = False
 
     async def download_book(self, book_id, book_format, auth=False):
+        """
+        Скачивает книгу потоком во временный файл (до DOWNLOAD_SPOOL_MAX_MEMORY в памяти, дальше на диске)
+
+        Пока книга скачивается, её размер (Content-Length, а без него - TELEGRAM_MAX_FILE_SIZE)
+        зарезервирован в DOWNLOAD_BUDGET; при исчерпании бюджета скачивание ждёт в очереди.
+
+        Returns:
+            (временный файл в начале, размер, имя файла) или (None, 0, None); файл закрывает вызывающий
+
+        Raises:
+            BookTooLargeError: книга больше TELEGRAM_MAX_FILE_SIZE (по Content-Length или по ходу скачивания)
+        """
         session = await self._get_session(auth)
-        book_url = self.get_book_url(book_id)
         download_url = self.get_download_url(book_id, book_format)
+        book_file = None
 
         try:
             # Скачиваем книгу
-            async with session.get(download_url) as response:
+            async with session.get(download_url, timeout=HTTP_TRANSPORT.timeout(HTTP_CALL_DOWNLOAD)) as response:
                 if response.status != 200:
-                    return None, None
-                # Читаем ответ с содержимым книги
-                book_data = await response.read()
-                content_type = response.headers.get('Content-Type', '')
+                    return None, 0, None
+                # Не скачиваем книгу, которую всё равно нельзя отправить в Telegram
+                content_length = response.content_length
+                if content_length and content_length > TELEGRAM_MAX_FILE_SIZE:
+                    raise BookTooLargeError(content_length)
 
-                # print(f"DEBUG: {content_type} {len(book_data)}")
+                content_type = response.headers.get('Content-Type', '')
+                book_file = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_MEMORY)
+                book_size = 0
+                async with DOWNLOAD_BUDGET.reserve(content_length or TELEGRAM_MAX_FILE_SIZE):
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        book_size += len(chunk)
+                        if book_size > TELEGRAM_MAX_FILE_SIZE:
+                            raise BookTooLargeError(book_size)
+                        book_file.write(chunk)
 
                 # Выходим если вместо книги сайт отправляет html с текстом "Страница не найдена"
                 if 'html' in content_type:
-                    html = await response.text()
+                    book_file.seek(0)
+                    html = book_file.read().decode('utf-8', errors='replace')
                     if 'Страница не найдена' in html:
-                        # print(f"DEBUG: {await response.text()}")
-                        return None, None
+                        book_file.close()
+                        return None, 0, None
 
                 # Извлекаем имя файла из ответа по адресу скачивания
                 filename = None
@@ -152,11 +189,54 @@ class FlibustaClient:
                 if cd:
                     if m := re.search(r'filename[^;=\n]*=([\'"]?)([^\'"\n]+)\1', cd, re.IGNORECASE):
                         filename = unquote(m.group(2))
-                # Возвращаем содержимое книги и имя файла
-                return book_data, filename
+                # Возвращаем файл книги, её размер и имя файла
+                book_file.seek(0)
+                return book_file, book_size, filename
+        except BookTooLargeError:
+            if book_file:
+                book_file.close()
+            raise
         except Exception as e:
             print(f"Ошибка скачивания книги: {e}")
-            return None, None
+            if book_file:
+                book_file.close()
+            return None, 0, None
+
+    async def fetch_book(self, book_id, book_format, store):
+        """
+        Скачивает книгу сначала без авторизации на сайте, потом с авторизацией
+
+        Одновременные запросы той же книги в том же формате ждут одного скачивания
+        и получают общий результат (asyncio.TimeoutError, если ждать дольше FLIBUSTA_DOWNLOAD_WAIT_TIMEOUT).
+        Открытый временный файл нельзя отдать нескольким ожидающим, поэтому скачанная книга
+        передаётся в store(файл, размер, имя файла), а общим результатом становится то, что вернул store;
+        временный файл закрывается после store.
+
+        Returns:
+            результат store или None, если скачать не удалось
+        """
+        return await self._downloads.run(
+            (book_id, book_format),
+            lambda: self._download_book_any(book_id, book_format, store)
+        )
+
+    async def _download_book_any(self, book_id, book_format, store):
+        book_file, book_size, filename = await self.download_book(book_id, book_format, auth=False)
+        if not book_file:
+            book_file, book_size, filename = await self.download_book(book_id, book_format, auth=True)
+        if not book_file:
+            return None
+        try:
+            return await store(book_file, book_size, filename)
+        finally:
+            book_file.close()
+
+    def single_flight_stats(self) -> dict:
+        """Статистика объединения одновременных запросов к сайту"""
+        return {
+            'downloads': self._downloads.stats(),
+            'covers': self._covers.stats(),
+        }
 
     async def close(self):
         if self._session:
@@ -165,7 +245,14 @@ class FlibustaClient:
             await self._auth_session.close()
 
     async def get_book_cover_url(self, book_id: str):
-        """Простой поиск обложки через BeautifulSoup"""
+        """Простой поиск обложки через BeautifulSoup (одновременные запросы одной книги ждут одного поиска)"""
+        try:
+            return await self._covers.run(str(book_id), lambda: self._find_book_cover_url(book_id))
+        except Exception as e:
+            print(f"Ошибка получения обложки: {e}")
+            return None
+
+    async def _find_book_cover_url(self, book_id: str):
         try:
             url = self.get_book_url(book_id)
             # Без авторизации
@@ -22,7 +22,7 @@ from .constants import SETTING_MAX_BOOKS, SETTING_LANG_SEARCH, \
     SETTING_SEARCH_AREA, SEARCH_TYPE_BOOKS, SEARCH_TYPE_SERIES, SEARCH_TYPE_AUTHORS, SETTING_SIZE_LIMIT, \
     SETTING_LOCALE, SETTING_GENRE_FILTER
 from .context import get_pages_of_series, get_found_series_count, get_pages_of_authors, get_found_authors_count, \
-    get_pages_of_books, get_user_params, update_user_params, get_last_series_page, \
+    get_books_session, get_user_params, update_user_params, get_last_series_page, \
     get_last_authors_page, set_switch_search, get_switch_search
 from .flibusta_client import FlibustaClient
 from .tools import form_header_books
@@ -377,10 +377,10 @@ async def handle_download_books_csv(update, context, action, params):
     query = update.callback_query
     processing_msg = None
     try:
-        # Get books from context
-        pages_of_books = get_pages_of_books(context)
+        # Get result session from context
+        books_session = get_books_session(context)
 
-        if not pages_of_books:
+        if not books_session:
             await query.answer(t("callback.results_expired"))
             return
 
@@ -391,14 +391,15 @@ async def handle_download_books_csv(update, context, action, params):
             disable_notification=True
         )
 
-        # Generate CSV
-        filename, csv_buffer = generate_books_csv(pages_of_books)
+        # Load all books of the session by ID and generate CSV
+        books = await DB_BOOKS.get_session_books(books_session)
+        filename, csv_buffer = generate_books_csv(books)
 
         # Prepare buffer for sending
         csv_buffer.seek(0)
 
         # Count total books
-        total_books = sum(len(page) for page in pages_of_books)
+        total_books = len(books)
 
         # Send as document
         await query.message.reply_document(
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 
 from telegram import Update, InlineKeyboardMarkup
@@ -5,11 +6,13 @@ from telegram.constants import ParseMode
 from telegram.ext import CallbackContext
 
 from .database import DB_BOOKS
+from .db_async import DBBusyError, QueryCancelledError
+from .result_sessions import BookResultSession, SearchFingerprint
 from .handlers_info import handle_book_info, handle_book_details, handle_author_info, handle_book_reviews, \
     handle_close_info
 from .handlers_utils import create_books_keyboard, handle_send_file
-from .constants import SEARCH_TYPE_BOOKS
-from .context import set_last_activity, get_pages_of_books, get_found_books_count, set_last_search_query, \
+from .constants import SEARCH_TYPE_BOOKS, DB_SEARCH_TIMEOUT
+from .context import set_last_activity, get_books_session, get_found_books_count, set_last_search_query, \
     set_last_bot_message_id, get_user_params, update_user_params, set_books, get_last_bot_message_id
 from .tools import is_message_for_bot, extract_clean_query, form_header_books
 from .health import log_stats
@@ -87,21 +90,45 @@ async def handle_group_search(update: Update, context: CallbackContext):
         print(f"DEBUG: clean_query_text = {clean_query_text}")
 
         # Выполняем поиск книг
-        books = DB_BOOKS.search_books(
-            clean_query_text, user_params.Lang, user_params.BookSize, user_params.Rating,
-            search_area=user_params.SearchArea,
-            locale=user_params.Locale or 'ru'
-        )
+        try:
+            books = await DB_BOOKS.run_in_executor(
+                DB_BOOKS.search_books,
+                clean_query_text, user_params.Lang, user_params.BookSize, user_params.Rating,
+                search_area=user_params.SearchArea,
+                locale=user_params.Locale or 'ru',
+                timeout=DB_SEARCH_TIMEOUT,
+                cancel_key=(user.id, chat.id)
+            )
+        except QueryCancelledError:
+            # Пользователь отправил новый запрос - этот поиск прерван, его результат не нужен
+            await processing_msg.delete()
+            return
+        except asyncio.TimeoutError:
+            # Запрос не уложился в DB_SEARCH_TIMEOUT или прерван сервером по max_statement_time
+            await processing_msg.edit_text(t("search.timeout", context))
+            return
+        except DBBusyError:
+            # Очередь запросов к каталогу переполнена - просим повторить позже
+            await processing_msg.edit_text(t("search.busy", context))
+            return
         found_books_count = len(books)
 
         # Удаляем сообщение "Ищу книги..."
         await processing_msg.delete()
 
         if books and found_books_count > 0:
-            pages_of_books = [books[i:i + user_params.MaxBooks] for i in range(0, len(books), user_params.MaxBooks)]
+            # В bot_data храним только ID книг, строки остальных страниц догружаются при перелистывании
+            fingerprint = SearchFingerprint(
+                query=clean_query_text, lang=user_params.Lang, size_limit=user_params.BookSize,
+                rating_filter=user_params.Rating, search_area=user_params.SearchArea,
+                locale=user_params.Locale or 'ru'
+            )
+            books_session = BookResultSession.from_books(books, user_params.MaxBooks, fingerprint)
             page = 0
+            books_in_page = books[:books_session.page_size]
+            DB_BOOKS.remember_books(books_session, books_in_page)
 
-            keyboard = create_books_keyboard(page, pages_of_books, context)
+            keyboard = create_books_keyboard(page, books_in_page, books_session.pages_count, context)
             reply_markup = InlineKeyboardMarkup(keyboard)
 
             if reply_markup:
@@ -125,7 +152,7 @@ async def handle_group_search(update: Update, context: CallbackContext):
                 )
 
                 # Сохраняем контекст поиска в bot_data (доступно всем пользователям группы)
-                set_books(context, pages_of_books, found_books_count)
+                set_books(context, books_session, found_books_count)
                 set_last_search_query(context, clean_query_text)
                 set_last_activity(context, datetime.now())
                 set_last_bot_message_id(context, result_message.message_id)
@@ -213,14 +240,15 @@ async def handle_group_page_change(update, context, action, params, user):
         await query.edit_message_text(t('search.session_expired', context))
         return
 
-    pages_of_books = get_pages_of_books(context)
+    books_session = get_books_session(context)
     page = int(action.removeprefix(f"{SEARCH_TYPE_BOOKS}_page_"))
 
-    if not pages_of_books or page >= len(pages_of_books):
+    if not books_session or page >= books_session.pages_count:
         await query.edit_message_text(t('search.page_error', context))
         return
 
-    keyboard = create_books_keyboard(page, pages_of_books, context)
+    books_in_page = await DB_BOOKS.get_books_page(books_session, page)
+    keyboard = create_books_keyboard(page, books_in_page, books_session.pages_count, context)
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     if reply_markup:
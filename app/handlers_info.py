@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Any
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery, Update
@@ -5,7 +6,8 @@ from telegram.constants import ParseMode
 from telegram.ext import CallbackContext
 
 from .database import DB_BOOKS
-from .tools import format_book_reviews, format_author_info, format_book_details, format_book_info
+from .db_async import DBBusyError
+from .tools import format_author_info, format_book_details, format_book_info
 from .core.logging_schema import EventType
 from .core.structured_logger import structured_logger
 from .i18n import t, get_or_detect_locale
@@ -30,16 +32,9 @@ async def handle_book_info(update, context, action, params):
         book_id = int(file_name)
 
         # Initialize locale on first access
-        get_or_detect_locale(update, context)
-
-        processing_msg = await message.reply_text(
-            t('search.loading_book_info', context),
-            parse_mode=ParseMode.HTML,
-            disable_notification=True
-        )
-
-        # Получаем информацию о книге из БД
         locale = get_or_detect_locale(update, context)
+
+        # Карточка книги одним запросом к БД: информация, авторы и переводчики с ID (обложка ищется параллельно)
         book_info = await DB_BOOKS.get_book_info(book_id, locale)
 
         if not book_info:
@@ -49,28 +44,15 @@ async def handle_book_info(update, context, action, params):
                 await message.reply_text(t('errors.not_found', context))
             return
 
-        # Формируем сообщение с информацией о книге
-        message_text = format_book_info(book_info, context)
+        # Формируем сообщение с информацией о книге (готовый HTML кэшируется по книге и языку)
+        message_text = DB_BOOKS.render_card(('book', book_id, locale),
+                                            lambda: format_book_info(book_info, context))
 
         # print(f"DEBUG: book_info = {book_info}")
         # print(f"DEBUG: len = {len(message_text)} message_text = {message_text}")
 
-        # Отправляем сообщение без кнопок сначала
-        # Если есть обложка, отправляем фото
-        if book_info.get('cover_url'):
-            info_message = await message.reply_photo(
-                photo=book_info['cover_url'],
-                caption=message_text,
-                parse_mode=ParseMode.HTML
-            )
-        else:
-            info_message = await message.reply_text(
-                message_text,
-                parse_mode=ParseMode.HTML
-            )
-
-        author_ids = await DB_BOOKS.get_authors_id(book_id)
-        translator_ids = await DB_BOOKS.get_translators_id(book_id)
+        author_ids = [author['id'] for author in book_info['authors']]
+        translator_ids = [translator['id'] for translator in book_info['translators']]
 
         # print(f"DEBUG: authors_ids = {author_ids}")
         # print(f"DEBUG: translator_ids = {translator_ids}")
@@ -94,14 +76,27 @@ async def handle_book_info(update, context, action, params):
         keyboard.append(
             [InlineKeyboardButton(t('book.info', context), callback_data=f"book_details:{book_id}"),
              InlineKeyboardButton(t('book.reviews', context), callback_data=f"book_reviews:{book_id}"),
-             InlineKeyboardButton(t('common.close', context), callback_data=f"close_info:{info_message.message_id}")],
+             # close_info без ID закрывает сообщение, в котором нажата кнопка
+             InlineKeyboardButton(t('common.close', context), callback_data="close_info")],
         )
 
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await processing_msg.delete()
-
-        await info_message.edit_reply_markup(reply_markup)
+        # Карточка отправляется сразу с кнопками - одним вызовом Telegram API
+        # Если есть обложка, отправляем фото
+        if book_info.get('cover_url'):
+            await message.reply_photo(
+                photo=book_info['cover_url'],
+                caption=message_text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup
+            )
+        else:
+            await message.reply_text(
+                message_text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup
+            )
 
         structured_logger.log_user_action(
             event_type=EventType.BOOK_INFO_VIEW,
@@ -112,6 +107,9 @@ async def handle_book_info(update, context, action, params):
             chat_id=user.id
         )
 
+    except (DBBusyError, asyncio.TimeoutError):
+        # Каталог перегружен или не ответил за DB_CALL_TIMEOUT - просим повторить позже
+        await _reply_busy(update, message, context)
     except Exception as e:
         print(f"Error in handle_book_info: {e}")
         if update.callback_query:
@@ -126,7 +124,7 @@ async def handle_book_details(update, context, action, params):
     try:
         book_id = int(params[0])
         # Initialize locale on first access
-        get_or_detect_locale(update, context)
+        locale = get_or_detect_locale(update, context)
         book_details = await DB_BOOKS.get_book_details(book_id)
 
         # print(f"DEBUG: book_details = {book_details}")
@@ -135,7 +133,8 @@ async def handle_book_details(update, context, action, params):
             await query.message.reply_text(t('errors.not_found', context))
             return
 
-        message_text = format_book_details(book_details, context)
+        message_text = DB_BOOKS.render_card(('details', book_id, locale),
+                                            lambda: format_book_details(book_details, context))
 
         # Отправляем сообщение без кнопок сначала
         info_message = await query.message.reply_text(
@@ -146,6 +145,9 @@ async def handle_book_details(update, context, action, params):
         # Добавляем кнопку закрытия с ID сообщения
         await add_close_button_to_message(info_message, [info_message.message_id], context)
 
+    except (DBBusyError, asyncio.TimeoutError):
+        # Каталог перегружен или не ответил за DB_CALL_TIMEOUT - просим повторить позже
+        await _reply_busy(update, query.message, context)
     except Exception as e:
         print(f"Error in handle_book_details: {e}")
         await query.answer(t('errors.general', context))
@@ -168,7 +170,7 @@ async def handle_author_info(update, context: CallbackContext, action, params):
         person_id = int(params[0])
         # Получаем тип персоны из callback_data или контекста
         person_type = params[1] if len(params) > 1 else get_current_person_type(context)
-        get_or_detect_locale(update, context)
+        locale = get_or_detect_locale(update, context)
 
         # Try to get as author first, then as translator
         person_info = await DB_BOOKS.get_author_info(person_id)
@@ -179,8 +181,9 @@ async def handle_author_info(update, context: CallbackContext, action, params):
             return
 
         message_ids = []
-        # Use common format function for both authors and translators
-        message_text = format_author_info(person_info, context, person_type)
+        # Use common format function for both authors and translators (HTML is cached per person, role and locale)
+        message_text = DB_BOOKS.render_card(('author', person_id, person_type, locale),
+                                            lambda: format_author_info(person_info, context, person_type))
 
         # Сообщение 1: Фото без подписи (если есть)
         if person_info.get('photo_url'):
@@ -194,6 +197,9 @@ async def handle_author_info(update, context: CallbackContext, action, params):
         # Кнопка "Книги автора" и кнопка закрытия
         await add_author_buttons(bio_message, message_ids, person_id, person_type, context)
 
+    except (DBBusyError, asyncio.TimeoutError):
+        # Каталог перегружен или не ответил за DB_CALL_TIMEOUT - просим повторить позже
+        await _reply_busy(update, message, context)
     except Exception as e:
         print(f"Error in handle_author_info: {e}")
         if update.callback_query:
@@ -263,38 +269,57 @@ async def handle_author_by_id(update: Update, context: CallbackContext):
 
 
 async def handle_book_reviews(update, context, action, params):
-    """Показывает отзывы о книге"""
+    """Показывает отзывы о книге постранично: book_reviews:<book_id> - новое сообщение с первой страницей,
+    book_reviews:<book_id>:<page> - смена страницы в том же сообщении"""
     query = update.callback_query
     try:
-        book_id = params[0]
+        book_id = int(params[0])
+        # Страница в callback_data - листание в том же сообщении (в т.ч. «Назад» на страницу 0)
+        change_page = len(params) > 1
+        page = int(params[1]) if change_page else 0
         # Initialize locale on first access
         get_or_detect_locale(update, context)
-        reviews = await DB_BOOKS.get_book_reviews(book_id)
+        review_page = await DB_BOOKS.get_book_review_page(book_id, page)
 
         # if not reviews:
         #     await query.message.reply_text("📝 Отзывов пока нет")
         #     return
 
-        if reviews:
-            message_text = format_book_reviews(reviews, context)
-            info_message = await query.message.reply_text(
-                message_text,
-                parse_mode=ParseMode.HTML
+        if change_page:
+            if review_page is None:
+                await query.answer(t('search.page_error', context))
+                return
+            text, has_more = review_page
+            await query.edit_message_text(
+                f"{t('book.reviews_title', context)}\n\n{text}",
+                parse_mode=ParseMode.HTML,
+                reply_markup=create_reviews_keyboard(book_id, page, has_more, context)
+            )
+            return
+
+        if review_page:
+            text, has_more = review_page
+            await query.message.reply_text(
+                f"{t('book.reviews_title', context)}\n\n{text}",
+                parse_mode=ParseMode.HTML,
+                reply_markup=create_reviews_keyboard(book_id, page, has_more, context)
             )
         else:
             info_message = await query.message.reply_text(
                 t('book.reviews', context),
                 parse_mode=ParseMode.HTML
             )
+            # Добавляем кнопку закрытия с ID сообщения
+            await add_close_button_to_message(info_message, [info_message.message_id], context)
 
-        # Добавляем кнопку закрытия с ID сообщения
-        await add_close_button_to_message(info_message, [info_message.message_id], context)
-
+    except (DBBusyError, asyncio.TimeoutError):
+        # Каталог перегружен или не ответил за DB_CALL_TIMEOUT - просим повторить позже
+        await _reply_busy(update, query.message, context)
     except Exception as e:
         print(f"Error in handle_book_reviews: {e}")
         await query.answer(t('errors.general', context))
     else:
-        # Логируем успешный просмотр отзывов о книге
+        # Логируем успешный просмотр отзывов о книге (смена страницы завершается return в try)
         structured_logger.log_book_reviews_view(
             user_id=query.from_user.id,
             username=query.from_user.username or query.from_user.first_name or "Unknown",
@@ -304,6 +329,29 @@ async def handle_book_reviews(update, context, action, params):
         )
 
 
+def create_reviews_keyboard(book_id: int, page: int, has_more: bool, context: CallbackContext) -> InlineKeyboardMarkup:
+    """Кнопки листания отзывов о книге и закрытия сообщения"""
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(t('search.pagination.prev', context),
+                                               callback_data=f"book_reviews:{book_id}:{page - 1}"))
+    if has_more:
+        navigation.append(InlineKeyboardButton(t('search.pagination.next', context),
+                                               callback_data=f"book_reviews:{book_id}:{page + 1}"))
+
+    keyboard = [navigation] if navigation else []
+    keyboard.append([InlineKeyboardButton(t('common.close', context), callback_data="close_info")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def _reply_busy(update, message, context: CallbackContext):
+    """Сообщает, что каталог сейчас занят (тот же текст, что и при переполнении очереди поисков)"""
+    if update.callback_query:
+        await update.callback_query.answer(t('search.busy', context), show_alert=True)
+    else:
+        await message.reply_text(t('search.busy', context))
+
+
 async def add_close_button_to_message(to_message, close_message_ids: List[Any], context: CallbackContext):
     """Add a close button to a message.
     
@@ -346,8 +394,8 @@ async def handle_close_info(update, context, action, params):
     """Универсальный обработчик закрытия информационных сообщений по ID"""
     query = update.callback_query
     try:
-        # Удаляем все переданные message_id
-        for msg_id in params:
+        # Удаляем все переданные message_id (без параметров - сообщение с нажатой кнопкой)
+        for msg_id in params or [query.message.message_id]:
             # print(f"DEBUG: {msg_id}")
             await context.bot.delete_message(query.message.chat_id, int(msg_id))
     except Exception as e:
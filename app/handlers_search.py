@@ -12,11 +12,13 @@ from .context import ContextManager
 from .handlers_utils import create_books_keyboard, create_series_keyboard, create_authors_keyboard
 from .tools import form_header_books
 from .database import DB_BOOKS
+from .db_async import DBBusyError, QueryCancelledError
+from .result_sessions import BookResultSession, SearchFingerprint
 from .constants import SEARCH_TYPE_BOOKS, SEARCH_TYPE_SERIES, SEARCH_TYPE_AUTHORS, SETTING_SEARCH_AREA_B, \
-    SETTING_SEARCH_AREA_BA
+    SETTING_SEARCH_AREA_BA, DB_SEARCH_TIMEOUT
 from .context import get_user_params, get_last_bot_message_id, set_books, set_last_activity, set_last_bot_message_id, \
     set_last_search_query, set_series, set_last_series_page, get_last_search_query, set_current_series_name, \
-    set_authors, set_last_authors_page, set_current_author_id, set_current_author_name, get_pages_of_books, \
+    set_authors, set_last_authors_page, set_current_author_id, set_current_author_name, get_books_session, \
     get_current_author_id, get_current_person_type, set_current_person_type, get_found_books_count, \
     get_current_series_name, get_current_author_name, get_pages_of_series, \
     get_found_series_count, get_pages_of_authors, get_found_authors_count, get_switch_search, set_switch_search
@@ -111,18 +113,18 @@ async def async_search_books(context: CallbackContext, query_text: str, processi
 
         if switch_search:
             days = int(switch_search.removeprefix('show_pop_'))
-            books = await asyncio.get_event_loop().run_in_executor(
-                None,  # Используем стандартный ThreadPoolExecutor
+            books = await DB_BOOKS.run_in_executor(
                 lambda: DB_BOOKS.search_pop_books(
                     user_params.Lang, user_params.BookSize, user_params.Rating,
                     days,
                     locale=user_params.Locale or 'ru',
                     genre_filter=user_params.GenreFilter
-                )
+                ),
+                timeout=DB_SEARCH_TIMEOUT,
+                cancel_key=ContextManager._get_ids_from_context(context)
             )
         else:
-            books = await asyncio.get_event_loop().run_in_executor(
-                None,  # Используем стандартный ThreadPoolExecutor
+            books = await DB_BOOKS.run_in_executor(
                 lambda: DB_BOOKS.search_books(
                     query_text, user_params.Lang, user_params.BookSize, user_params.Rating,
                     search_area=user_params.SearchArea,
@@ -131,7 +133,9 @@ async def async_search_books(context: CallbackContext, query_text: str, processi
                     person_type=person_type,
                     locale=user_params.Locale or 'ru',
                     genre_filter=user_params.GenreFilter
-                )
+                ),
+                timeout=DB_SEARCH_TIMEOUT,
+                cancel_key=ContextManager._get_ids_from_context(context)
             )
         found_books_count = len(books)
 
@@ -159,19 +163,38 @@ async def async_search_books(context: CallbackContext, query_text: str, processi
             rating_filter=user_params.Rating,
             size_limit=user_params.BookSize,
             series_id=series_id,
-            author_id=author_id
+            author_id=author_id,
+            search_mode=DB_BOOKS.search_mode
         )
 
-        # Обрабатываем результаты
-        await process_search_books(context, books, found_books_count, processing_msg, query_text, user, author_id, person_type, search_type)
+        # Параметры запроса для догрузки строк книг при перелистывании страниц
+        fingerprint = SearchFingerprint(
+            query=query_text, lang=user_params.Lang, size_limit=user_params.BookSize, rating_filter=user_params.Rating,
+            search_area=user_params.SearchArea, series_id=series_id, author_id=author_id, person_type=person_type,
+            locale=user_params.Locale or 'ru', genre_filter=user_params.GenreFilter,
+            days_back=int(switch_search.removeprefix('show_pop_')) if switch_search else None
+        )
 
+        # Обрабатываем результаты
+        await process_search_books(context, books, found_books_count, processing_msg, query_text, user, author_id, person_type, search_type,
+                                   fingerprint=fingerprint)
+
+    except QueryCancelledError:
+        # Пользователь начал новый поиск в этом чате - у него своё сообщение о поиске, это убираем
+        await processing_msg.delete()
+    except asyncio.TimeoutError:
+        # Запрос не уложился в DB_SEARCH_TIMEOUT или прерван сервером по max_statement_time
+        await processing_msg.edit_text(t("search.timeout", context))
+    except DBBusyError:
+        # Очередь запросов к каталогу переполнена - просим повторить позже
+        await processing_msg.edit_text(t("search.busy", context))
     except Exception as e:
         # Обработка ошибок
         await processing_msg.edit_text(t("search.error_detail", context, error=str(e)))
 
 
 async def process_search_books(context: CallbackContext, books, found_books_count: int, processing_msg, query_text: str,
-                               user, author_id=0, person_type='author', search_type=None):
+                               user, author_id=0, person_type='author', search_type=None, fingerprint=None):
     """Обработка и отображение результатов поиска"""
     series_name = None
     author_name = None
@@ -191,8 +214,11 @@ async def process_search_books(context: CallbackContext, books, found_books_coun
     # Проверяем, найдены ли книги
     if books:
         # Извлекаем из контекста или БД настройки пользователя
-        pages_of_result = [books[i:i + user_params.MaxBooks] for i in range(0, len(books), user_params.MaxBooks)]
+        # В контексте храним только ID книг, строки остальных страниц догружаются при перелистывании
+        books_session = BookResultSession.from_books(books, user_params.MaxBooks, fingerprint or SearchFingerprint())
         page = 0
+        books_in_page = books[:books_session.page_size]
+        DB_BOOKS.remember_books(books_session, books_in_page)
 
         if search_type == SEARCH_TYPE_SERIES:
             # Извлекаем имя серии из данных первой книги
@@ -215,7 +241,7 @@ async def process_search_books(context: CallbackContext, books, found_books_coun
             set_current_person_type(context, person_type)
 
         # Собираем кнопки с книгами для настроенного вывода
-        keyboard = create_books_keyboard(page, pages_of_result, context, search_type)
+        keyboard = create_books_keyboard(page, books_in_page, books_session.pages_count, context, search_type)
 
         # формируем клавиатуру
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -235,7 +261,7 @@ async def process_search_books(context: CallbackContext, books, found_books_coun
             # Заменяем сообщение об ожидании на результаты
             await processing_msg.edit_text(header_found_text, reply_markup=reply_markup)
 
-            set_books(context, pages_of_result, found_books_count)
+            set_books(context, books_session, found_books_count)
             set_last_activity(context, datetime.now())  # Сохраняем время поиска
             # СОХРАНЯЕМ ID СООБЩЕНИЯ С РЕЗУЛЬТАТАМИ И ЗАПРОС
             set_last_bot_message_id(context, processing_msg.message_id)
@@ -301,14 +327,15 @@ async def async_search_series(context: CallbackContext, query_text: str, process
         user_params = get_user_params(context)
 
          # Ищем серии
-        series = await asyncio.get_event_loop().run_in_executor(
-            None,  # Используем стандартный ThreadPoolExecutor
+        series = await DB_BOOKS.run_in_executor(
             lambda: DB_BOOKS.search_series(
                 query_text, user_params.Lang, user_params.BookSize, user_params.Rating,
                 search_area=user_params.SearchArea,
                 locale=user_params.Locale or 'ru',
                 genre_filter=user_params.GenreFilter
-            )
+            ),
+            timeout=DB_SEARCH_TIMEOUT,
+            cancel_key=ContextManager._get_ids_from_context(context)
         )
         found_series_count = len(series)
 
@@ -335,6 +362,15 @@ async def async_search_series(context: CallbackContext, query_text: str, process
         # Обрабатываем результаты
         await process_search_series(context, series, found_series_count, processing_msg, query_text, user)
 
+    except QueryCancelledError:
+        # Пользователь начал новый поиск в этом чате - у него своё сообщение о поиске, это убираем
+        await processing_msg.delete()
+    except asyncio.TimeoutError:
+        # Запрос не уложился в DB_SEARCH_TIMEOUT или прерван сервером по max_statement_time
+        await processing_msg.edit_text(t("search.timeout", context))
+    except DBBusyError:
+        # Очередь запросов к каталогу переполнена - просим повторить позже
+        await processing_msg.edit_text(t("search.busy", context))
     except Exception as e:
         # Обработка ошибок
         await processing_msg.edit_text(t("search.error_detail", context, error=str(e)))
@@ -438,14 +474,15 @@ async def async_search_authors(context: CallbackContext, query_text: str, proces
         user_params = get_user_params(context)
 
         # Ищем авторов
-        authors = await asyncio.get_event_loop().run_in_executor(
-            None,  # Используем стандартный ThreadPoolExecutor
+        authors = await DB_BOOKS.run_in_executor(
             lambda: DB_BOOKS.search_authors(
                 query_text, user_params.Lang, user_params.BookSize, user_params.Rating,
                 search_area=user_params.SearchArea,
                 locale=user_params.Locale or 'ru',
                 genre_filter=user_params.GenreFilter
-            )
+            ),
+            timeout=DB_SEARCH_TIMEOUT,
+            cancel_key=ContextManager._get_ids_from_context(context)
         )
         found_authors_count = len(authors)
 
@@ -472,6 +509,15 @@ async def async_search_authors(context: CallbackContext, query_text: str, proces
         # Обрабатываем результаты
         await process_search_authors(context, authors, found_authors_count, processing_msg, query_text, user)
 
+    except QueryCancelledError:
+        # Пользователь начал новый поиск в этом чате - у него своё сообщение о поиске, это убираем
+        await processing_msg.delete()
+    except asyncio.TimeoutError:
+        # Запрос не уложился в DB_SEARCH_TIMEOUT или прерван сервером по max_statement_time
+        await processing_msg.edit_text(t("search.timeout", context))
+    except DBBusyError:
+        # Очередь запросов к каталогу переполнена - просим повторить позже
+        await processing_msg.edit_text(t("search.busy", context))
     except Exception as e:
         # Обработка ошибок
         await processing_msg.edit_text(t("search.error_detail", context, error=str(e)))
@@ -595,19 +641,20 @@ async def handle_books_page_change(update, context, action, params):
     query = update.callback_query
     try:
         # Проверяем, что данные поиска еще существуют
-        pages_of_books = get_pages_of_books(context)
-        if not pages_of_books:
+        books_session = get_books_session(context)
+        if not books_session:
             await query.edit_message_text(t('search.session_expired', context))
             return
 
         page = int(action.removeprefix(f"{SEARCH_TYPE_BOOKS}_page_"))
+        books_in_page = await DB_BOOKS.get_books_page(books_session, page)
         # Определяем контекст поиска
         user_params = get_user_params(context)
         # если показ новинок/популярных, то клавиатура только по книгам
         show_pop = get_switch_search(context)
         search_context = user_params.SearchType if not show_pop else SEARCH_TYPE_BOOKS
         # print(f"DEBUG: {show_pop}, {search_context}")
-        keyboard = create_books_keyboard(page, pages_of_books, context, search_context)
+        keyboard = create_books_keyboard(page, books_in_page, books_session.pages_count, context, search_context)
 
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -1,11 +1,15 @@
+import asyncio
 import csv
+import shutil
+import tempfile
+from collections import namedtuple
 from datetime import datetime
 from io import BytesIO, TextIOWrapper
-from typing import Any, List
+from typing import Any, Dict, List, Tuple
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
-from telegram.error import TimedOut
+from telegram.error import BadRequest, TelegramError, TimedOut
 from telegram.ext import CallbackContext
 
 from .context import get_user_params, get_current_author_id, get_current_person_type
@@ -14,7 +18,11 @@ from .constants import  BOOK_RATINGS, SEARCH_TYPE_BOOKS, SEARCH_TYPE_SERIES, SEA
 from .i18n import t, get_or_detect_locale
 from .tools import format_size, upload_to_tmpfiles,  get_short_donation_notice
 from .core.structured_logger import structured_logger
-from .flibusta_client import flibusta_client, FlibustaClient
+from .flibusta_client import flibusta_client, FlibustaClient, BookTooLargeError
+from .database import DB_BOOKS
+from .book_cache import BOOK_CACHE
+from .byte_budget import DOWNLOAD_BUDGET
+from .repositories.file_id_repository import FILE_IDS
 
 # ===== УТИЛИТЫ И ХЕЛПЕРЫ =====
 async def handle_send_file(update, context, action, params, for_user = None):
@@ -31,13 +39,190 @@ async def handle_send_file(update, context, action, params, for_user = None):
     # logger.log_user_action(query.from_user, "send file", log_detail)
 
 
+async def send_cached_book(query, context, book_id: int, book_format, generation: int):
+    """
+    Отправляет книгу по file_id, сохранённому после прошлой загрузки в Telegram
+
+    Returns:
+        Имя файла книги или None, если file_id нет или Telegram его не принял
+    """
+    try:
+        cached = FILE_IDS.get_file(book_id, book_format, generation)
+    except Exception as e:
+        print(f"Ошибка чтения кэша file_id: {e}")
+        return None
+    if not cached:
+        return None
+
+    try:
+        await query.message.reply_document(
+            document=cached['file_id'],
+            disable_notification=True,
+            caption=get_short_donation_notice(context),
+            parse_mode=ParseMode.MARKDOWN
+        )
+    except BadRequest as e:
+        # file_id устарел или недействителен - скачиваем книгу заново
+        print(f"Сохранённый file_id книги {book_id}.{book_format} не принят: {e}")
+        try:
+            FILE_IDS.delete_file(book_id, book_format)
+        except Exception as e:
+            print(f"Ошибка удаления из кэша file_id: {e}")
+        return None
+    except TelegramError as e:
+        # Сеть, таймаут или RetryAfter - file_id оставляем, книгу отправляем обычным путём
+        print(f"Ошибка отправки книги {book_id}.{book_format} по file_id: {e}")
+        return None
+
+    try:
+        FILE_IDS.count_sent(book_id, book_format, generation)
+    except Exception as e:
+        print(f"Ошибка записи в кэш file_id: {e}")
+    structured_logger.log_download(
+        user_id=query.from_user.id,
+        username=query.from_user.username or query.from_user.first_name or "Unknown",
+        book_id=book_id,
+        book_title=cached['file_name'],
+        format=book_format,
+        file_size=cached['file_size'] or 0,
+        success=True,
+        via_tmpfiles=False,
+        chat_type="private",
+        chat_id=query.from_user.id,
+        from_cache=True
+    )
+    return cached['file_name']
+
+
+# Скачанная книга, общая для всех ожидающих скачивания: путь к файлу, который каждый открывает сам
+DownloadedBook = namedtuple('DownloadedBook', ['path', 'filename', 'size'])
+
+
+class DownloadTempFiles:
+    """
+    Именованные временные файлы скачанных книг, которые не принял дисковый кэш
+
+    Одно скачивание ждут несколько запросов (fetch_book), каждый открывает файл сам. Файлы книги
+    закрываются (и удаляются) явно, когда последний ожидающий её запрос открыл свой файл или
+    перестал ждать; открытые дескрипторы остаются читаемыми. Используется только из event loop
+    """
+
+    def __init__(self):
+        self._waiters: Dict[Tuple[int, str], int] = {}
+        self._files: Dict[Tuple[int, str], list] = {}
+
+    def join(self, key: Tuple[int, str]) -> None:
+        """Запрос начал ждать книгу"""
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+
+    def add(self, key: Tuple[int, str], temp_file) -> None:
+        """Файл скачанной книги; если её уже никто не ждёт - сразу закрывается"""
+        if key in self._waiters:
+            self._files.setdefault(key, []).append(temp_file)
+        else:
+            temp_file.close()
+
+    def leave(self, key: Tuple[int, str]) -> None:
+        """Запрос открыл свой файл книги или перестал ждать"""
+        self._waiters[key] -= 1
+        if self._waiters[key] == 0:
+            del self._waiters[key]
+            for temp_file in self._files.pop(key, []):
+                temp_file.close()
+
+
+DOWNLOAD_TEMP_FILES = DownloadTempFiles()
+
+
+def _copy_to_temp_file(book_file):
+    """Копирует временный файл скачивания в именованный временный файл на диске"""
+    temp_file = tempfile.NamedTemporaryFile(prefix='book_')
+    try:
+        book_file.seek(0)
+        shutil.copyfileobj(book_file, temp_file)
+        temp_file.flush()
+    except Exception:
+        temp_file.close()
+        raise
+    return temp_file
+
+
+async def store_downloaded_book(book_id: int, book_format, book_file, book_size: int, original_filename):
+    """
+    Переносит временный файл скачивания в дисковый кэш; если кэш отключён или не принял книгу -
+    в именованный временный файл (DOWNLOAD_TEMP_FILES), чтобы ожидающие не делили одну копию книги в памяти
+    """
+    cached = await asyncio.to_thread(BOOK_CACHE.put_file, book_id, book_format, book_file, original_filename)
+    if cached:
+        return DownloadedBook(cached.path, cached.filename, cached.size)
+
+    key = (book_id, book_format)
+    copy = asyncio.ensure_future(asyncio.to_thread(_copy_to_temp_file, book_file))
+
+    def register(task):
+        # Файл учитывается, даже если скачивание отменили во время копирования (тогда он сразу закрывается)
+        if not task.cancelled() and task.exception() is None:
+            DOWNLOAD_TEMP_FILES.add(key, task.result())
+
+    copy.add_done_callback(register)
+    temp_file = await asyncio.shield(copy)
+    return DownloadedBook(temp_file.name, original_filename, book_size)
+
+
+async def fetch_book(book_id: int, book_format):
+    """
+    Файл книги из дискового кэша или с сайта (сначала без авторизации, потом с авторизацией)
+
+    Returns:
+        (открытый двоичный файл, исходное имя файла, размер) или (None, None, 0), если скачать не удалось
+
+    Raises:
+        BookTooLargeError: книга больше лимита Telegram
+    """
+    cached = await asyncio.to_thread(BOOK_CACHE.get, book_id, book_format)
+    if cached:
+        try:
+            return open(cached.path, 'rb'), cached.filename, cached.size
+        except OSError:
+            pass  # файл вытеснен из кэша между проверкой и открытием
+
+    key = (book_id, book_format)
+    DOWNLOAD_TEMP_FILES.join(key)
+    try:
+        book = await flibusta_client.fetch_book(
+            book_id, book_format,
+            lambda book_file, book_size, filename: store_downloaded_book(book_id, book_format, book_file, book_size,
+                                                                         filename)
+        )
+        if not book:
+            return None, None, 0
+
+        try:
+            return open(book.path, 'rb'), book.filename, book.size
+        except OSError as e:
+            print(f"Ошибка открытия скачанной книги: {e}")
+            return None, None, 0
+    finally:
+        # Свой дескриптор уже открыт - общий временный файл можно закрыть, когда откроют все
+        DOWNLOAD_TEMP_FILES.leave(key)
+
+
 async def process_book_download(update, context, book_id: int, book_format, for_user=None):
     """Обрабатывает скачивание и отправку книги сначала без авторизации на сайте, потом с авторизацией"""
     query = update.callback_query
     book_url = FlibustaClient.get_book_url(book_id)
     processing_msg = None
-    book_data = None
+    book_file = None
+    book_size = 0
     public_filename = f"{book_id}.{book_format}"
+    generation = DB_BOOKS.file_generation
+
+    # Книга уже отправлялась - один вызов API без скачивания с сайта и повторной загрузки.
+    # Пока поколение каталога не известно (сразу после старта), кэш file_id не используется
+    if generation is not None:
+        cached_filename = await send_cached_book(query, context, book_id, book_format, generation)
+        if cached_filename:
+            return cached_filename
 
     try:
         processing_msg = await query.message.reply_text(
@@ -46,26 +231,29 @@ async def process_book_download(update, context, book_id: int, book_format, for_
             disable_notification=True
         )
 
-        # Первая попытка — без авторизации
-        book_data, original_filename = await flibusta_client.download_book(book_id, book_format, auth=False)
+        # Из дискового кэша или с сайта
+        book_file, original_filename, book_size = await fetch_book(book_id, book_format)
         public_filename = original_filename if original_filename else f"{book_id}.{book_format}"
 
-        # Если не удалось — вторая попытка с авторизацией
-        if not book_data:
-            book_data, original_filename = await flibusta_client.download_book(book_id, book_format, auth=True)
-            public_filename = original_filename if original_filename else f"{book_id}.{book_format}"
-
-        if book_data:
+        if book_file:
             # Сообщение об истечении срока аренды vps
             message = get_short_donation_notice(context)
 
-            await query.message.reply_document(
-                document=book_data,
-                filename=public_filename,
-                disable_notification=True,
-                caption=message,
-                parse_mode=ParseMode.MARKDOWN
-            )
+            # Библиотека Telegram читает файл в память целиком - размер книги резервируется в общем бюджете
+            async with DOWNLOAD_BUDGET.reserve(book_size):
+                sent = await query.message.reply_document(
+                    document=book_file,
+                    filename=public_filename,
+                    disable_notification=True,
+                    caption=message,
+                    parse_mode=ParseMode.MARKDOWN
+                )
+            try:
+                if sent and sent.document and generation is not None:
+                    FILE_IDS.save_file(book_id, book_format, generation, sent.document.file_id,
+                                       sent.document.file_unique_id, public_filename, sent.document.file_size)
+            except Exception as e:
+                print(f"Ошибка записи в кэш file_id: {e}")
 
             # ✅ ЛОГИРОВАНИЕ УСПЕШНОГО СКАЧИВАНИЯ
             structured_logger.log_download(
@@ -74,7 +262,7 @@ async def process_book_download(update, context, book_id: int, book_format, for_
                 book_id=book_id,
                 book_title=public_filename,
                 format=book_format,
-                file_size=len(book_data) if book_data else 0,
+                file_size=book_size,
                 success=True,
                 via_tmpfiles=False,
                 chat_type="private",
@@ -92,8 +280,9 @@ async def process_book_download(update, context, book_id: int, book_format, for_
         return public_filename
 
     except TimedOut:
-        if processing_msg and book_data:
-            await handle_timeout_error(processing_msg, book_data, book_id, book_format, query, context)
+        if processing_msg and book_file:
+            book_file.seek(0)
+            await handle_timeout_error(processing_msg, book_file, book_id, book_format, query, context)
 
             structured_logger.log_download(
                 user_id=query.from_user.id,
@@ -101,13 +290,18 @@ async def process_book_download(update, context, book_id: int, book_format, for_
                 book_id=book_id,
                 book_title=public_filename,
                 format=book_format,
-                file_size=len(book_data),
+                file_size=book_size,
                 success=True,
                 via_tmpfiles=True,
                 chat_type="private",
                 chat_id=query.from_user.id
             )
 
+    except BookTooLargeError as e:
+        await processing_msg.edit_text(
+            t("download.too_large", context, size=format_size(e.size), book_url=book_url)
+        )
+
     except Exception as e:
         """Обрабатывает ошибку загрузки"""
         print(f"Общая ошибка при отправке книги: {e}")
@@ -126,10 +320,14 @@ async def process_book_download(update, context, book_id: int, book_format, for_
             username=query.from_user.username or query.from_user.first_name or "Unknown"
         )
 
+    finally:
+        if book_file:
+            book_file.close()
+
     return None
 
 
-async def handle_timeout_error(processing_msg, book_data, file_name, file_ext, query, context):
+async def handle_timeout_error(processing_msg, book_file, file_name, file_ext, query, context):
     """Обрабатывает ошибку таймаута"""
     await processing_msg.edit_text(
         t("download.using_external_service", context),
@@ -137,7 +335,7 @@ async def handle_timeout_error(processing_msg, book_data, file_name, file_ext, q
     )
 
     try:
-        download_url = await upload_to_tmpfiles(book_data, f"{file_name}.{file_ext}")
+        download_url = await upload_to_tmpfiles(book_file, f"{file_name}.{file_ext}")
         if download_url:
             direct_download_url = download_url.replace(
                 "https://tmpfiles.org/",
@@ -195,7 +393,7 @@ def add_close_button(keyboard, context):
 
 
 # ===== CSV EXPORT =====
-def generate_books_csv(pages_of_books: List[List[Any]]) -> tuple[str, BytesIO]:
+def generate_books_csv(all_books: List[Any]) -> tuple[str, BytesIO]:
     """
     Generate CSV content from paginated books.
 
@@ -207,16 +405,11 @@ def generate_books_csv(pages_of_books: List[List[Any]]) -> tuple[str, BytesIO]:
     This ensures proper CSV formatting for all field values.
 
     Args:
-        pages_of_books: List of pages, each containing Book namedtuples
+        all_books: Book rows in search result order (list or columnar result set)
 
     Returns:
         Tuple of (filename, BytesIO buffer with CSV content)
     """
-    # Flatten pages to single list
-    all_books = []
-    for page in pages_of_books:
-        all_books.extend(page)
-
     # Create CSV in memory
     buffer = BytesIO()
     # Add BOM for Excel UTF-8 compatibility
@@ -264,28 +457,26 @@ def generate_books_csv(pages_of_books: List[List[Any]]) -> tuple[str, BytesIO]:
 
 
 # ===== КЛАВИАТУРЫ И ИНТЕРФЕЙС =====
-def add_navigation_buttons(keyboard, search_type, page, pages, context):
+def add_navigation_buttons(keyboard, search_type, page, pages_count, context):
     navigation_buttons = []
     if page > 0:
         navigation_buttons.append(InlineKeyboardButton(t("search.pagination.home",context), callback_data=f"{search_type}_page_0"))
         navigation_buttons.append(
             InlineKeyboardButton(t("search.pagination.prev",context), callback_data=f"{search_type}_page_{page - 1}"))
-    if page < len(pages) - 1:
+    if page < pages_count - 1:
         navigation_buttons.append(
             InlineKeyboardButton(t("search.pagination.next",context), callback_data=f"{search_type}_page_{page + 1}"))
         navigation_buttons.append(
-            InlineKeyboardButton(t("search.pagination.end",context), callback_data=f"{search_type}_page_{len(pages) - 1}"))
+            InlineKeyboardButton(t("search.pagination.end",context), callback_data=f"{search_type}_page_{pages_count - 1}"))
     if navigation_buttons:
         keyboard.append(navigation_buttons)
 
 
-def create_books_keyboard(page, pages_of_books, context, search_context=SEARCH_TYPE_BOOKS):
-    """Создание клавиатуры с кнопками книг и кнопками навигации"""
+def create_books_keyboard(page, books_in_page, pages_count, context, search_context=SEARCH_TYPE_BOOKS):
+    """Создание клавиатуры с кнопками книг страницы page и кнопками навигации"""
     keyboard = []
 
-    if pages_of_books:
-        books_in_page = pages_of_books[page]
-
+    if pages_count:
         if books_in_page:
             for book in books_in_page:
                 # ДОБАВЛЯЕМ ЭМОДЗИ РЕЙТИНГА
@@ -299,7 +490,7 @@ def create_books_keyboard(page, pages_of_books, context, search_context=SEARCH_T
                 )])
 
             # Добавляем кнопки для навигации
-            add_navigation_buttons(keyboard, SEARCH_TYPE_BOOKS, page, pages_of_books, context)
+            add_navigation_buttons(keyboard, SEARCH_TYPE_BOOKS, page, pages_count, context)
 
             # Добавляем кнопку скачивания CSV
             keyboard.append([InlineKeyboardButton(t("search.download",context), callback_data="download_books_csv")])
@@ -342,7 +533,7 @@ def create_series_keyboard(page, pages_of_series, context):
                 )])
 
             # Добавляем кнопки для навигации
-            add_navigation_buttons(keyboard, SEARCH_TYPE_SERIES, page, pages_of_series, context)
+            add_navigation_buttons(keyboard, SEARCH_TYPE_SERIES, page, len(pages_of_series), context)
 
             add_close_button(keyboard, context)
 
@@ -365,7 +556,7 @@ def create_authors_keyboard(page, pages_of_authors, context):
                 )])
 
             # Добавляем кнопки для навигации
-            add_navigation_buttons(keyboard, SEARCH_TYPE_AUTHORS, page, pages_of_authors, context)
+            add_navigation_buttons(keyboard, SEARCH_TYPE_AUTHORS, page, len(pages_of_authors), context)
 
             add_close_button(keyboard, context)
 
@@ -1,14 +1,22 @@
+import asyncio
 import psutil
 import gc
 from datetime import datetime
+from time import time
 
 from telegram.ext import CallbackContext
 
 from .context import ContextManager
 from .constants import CLEANUP_INTERVAL
+from .catalog_generation import CACHE_GENRES, CACHE_STATS, CACHE_LEADERBOARDS, CACHE_FILES
 from .core.structured_logger import structured_logger
 from .core.logging_schema import EventType
 from .database import DB_BOOKS
+from .repositories.file_id_repository import FILE_IDS
+from .book_cache import BOOK_CACHE
+from .byte_budget import DOWNLOAD_BUDGET
+from .http_transport import HTTP_TRANSPORT
+from .flibusta_client import flibusta_client
 
 def get_memory_usage():
     """Возвращает использование памяти в MB"""
@@ -24,6 +32,18 @@ def get_system_stats():
         'cpu_percent': f"{psutil.cpu_percent(interval=1):.1f}",
         'open_files': len(psutil.Process().open_files()),
         'threads': psutil.Process().num_threads(),
+        'db_pool': DB_BOOKS.pool_stats(),
+        'db_executor': DB_BOOKS.executor_stats(),
+        'search_cache': DB_BOOKS.search_cache_stats(),
+        'book_row_cache': DB_BOOKS.row_cache_stats(),
+        'sql_statements': DB_BOOKS.statement_stats(),
+        'review_pages': DB_BOOKS.review_cache_stats(),
+        'card_cache': DB_BOOKS.card_cache_stats(),
+        'file_ids': FILE_IDS.get_stats(),
+        'book_cache': BOOK_CACHE.stats(),
+        'flibusta_single_flight': flibusta_client.single_flight_stats(),
+        'download_budget': DOWNLOAD_BUDGET.stats(),
+        'http': HTTP_TRANSPORT.stats(),
         'timestamp': datetime.now().isoformat()
     }
 
@@ -143,7 +163,53 @@ async def cleanup_old_sessions(context: CallbackContext):
             cleanup_memory()
             await log_stats(context)
 
-        DB_BOOKS.invalidate_db_cache()
+        # Время обращения к книгам в дисковом кэше
+        await asyncio.to_thread(BOOK_CACHE.flush)
 
+        await check_catalog_update(context)
+
+    except Exception as e:
+        print(f"❌ Cleanup error: {e}")
+
+
+async def check_catalog_update(context: CallbackContext):
+    """
+    Проверка обновления каталога (при старте и раз в CLEANUP_INTERVAL): сбрасывает устаревшие кэши
+    и запускает их пересчёт. Единственное место, где вызывается invalidate_db_cache: изменения,
+    которые она вернула, больше никто не увидит
+    """
+    try:
+        # Запросы к БД - вне event loop
+        stale = await asyncio.get_running_loop().run_in_executor(None, DB_BOOKS.invalidate_db_cache)
+        if CACHE_LEADERBOARDS in stale:
+            # Обновились книги или их статистика - пересчитываем рейтинги /pop
+            context.job_queue.run_once(refresh_leaderboards, when=0)
+        if stale & {CACHE_GENRES, CACHE_STATS} or not DB_BOOKS.catalog_caches_ready():
+            # Перечитываем жанры, языки, статистику и перезаписываем снимок каталога
+            context.job_queue.run_once(refresh_catalog_caches, when=0)
+        if CACHE_FILES in stale and DB_BOOKS.file_generation is not None:
+            # Файлы книг могли обновиться - file_id прошлых поколений больше не используются
+            await asyncio.to_thread(FILE_IDS.delete_other_generations, DB_BOOKS.file_generation)
+    except Exception as e:
+        print(f"❌ Catalog update check error: {e}")
+
+
+async def refresh_leaderboards(context: CallbackContext):
+    """Пересчёт рейтингов популярных книг и новинок для /pop (при старте и после обновления каталога)"""
+    try:
+        start = time()
+        sizes = await asyncio.get_running_loop().run_in_executor(None, DB_BOOKS.refresh_leaderboards)
+        print(f"🏆 Leaderboards refreshed in {time() - start:.1f}s: {sizes}")
+    except Exception as e:
+        print(f"❌ Leaderboards refresh error: {e}")
+
+
+async def refresh_catalog_caches(context: CallbackContext):
+    """Загрузка кэшей жанров, языков и статистики каталога из БД, если их нет (после check_catalog_update)"""
+    try:
+        start = time()
+        refreshed = await asyncio.get_running_loop().run_in_executor(None, DB_BOOKS.refresh_catalog_caches)
+        if refreshed:
+            print(f"📚 Catalog caches refreshed in {time() - start:.1f}s")
     except Exception as e:
-        print(f"❌ Cleanup error: {e}")
\ No newline at end of file
+        print(f"❌ Catalog caches refresh error: {e}")
@@ -0,0 +1,142 @@
+"""
+Общий HTTP-транспорт бота (aiohttp)
+
+Все сессии (FlibustaClient без авторизации и с авторизацией, загрузка на tmpfiles) работают через
+один TCPConnector: соединения с keep-alive переиспользуются между запросами, число соединений
+ограничено всего и на хост, DNS-ответы кэшируются. Таймауты заданы по видам запросов
+(страница сайта, скачивание книги, загрузка файла) отдельно на подключение, чтение из сокета и весь запрос.
+Счётчики новых и переиспользованных соединений и DNS-кэша собираются через aiohttp.TraceConfig.
+"""
+
+import os
+from typing import Dict, Optional
+
+import aiohttp
+
+from .constants import HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT, HTTP_DNS_CACHE_TTL, \
+    HTTP_TIMEOUTS, HTTP_CALL_PAGE
+
+
+class HttpTransport:
+    """
+    Пул соединений и фабрика сессий aiohttp
+
+    Коннектор создаётся при первом запросе в работающем event loop (и заново после close()).
+    Сессии не владеют коннектором: закрытие сессии не закрывает общие соединения.
+    """
+
+    def __init__(self, limit: int, limit_per_host: int, keepalive_timeout: float, dns_cache_ttl: int):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._trace_config = self._create_trace_config()
+
+        # Метрики
+        self._requests = 0
+        self._errors = 0
+        self._connections_created = 0
+        self._connections_reused = 0
+        self._dns_cache_hits = 0
+        self._dns_cache_misses = 0
+
+    @staticmethod
+    def timeout(call_type: str) -> aiohttp.ClientTimeout:
+        """Таймауты вида запроса (HTTP_CALL_PAGE, HTTP_CALL_DOWNLOAD, HTTP_CALL_UPLOAD)"""
+        connect, sock_read, total = HTTP_TIMEOUTS[call_type]
+        return aiohttp.ClientTimeout(total=total, connect=connect, sock_read=sock_read)
+
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+        return self._connector
+
+    def create_session(self, call_type: str = HTTP_CALL_PAGE, **kwargs) -> aiohttp.ClientSession:
+        """
+        Новая сессия на общем пуле соединений (свои cookies и заголовки)
+
+        call_type задаёт таймауты по умолчанию; отдельный запрос может передать timeout=transport.timeout(...)
+        """
+        return aiohttp.ClientSession(
+            connector=self._get_connector(),
+            connector_owner=False,
+            timeout=self.timeout(call_type),
+            trace_configs=[self._trace_config],
+            **kwargs
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия без cookies для разовых запросов к внешним сервисам"""
+        if self._session is None or self._session.closed:
+            self._session = self.create_session(cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+
+    async def close(self) -> None:
+        """Закрывает общую сессию и все соединения пула (при остановке бота)"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_end(session, ctx, params):
+            self._requests += 1
+
+        async def on_request_exception(session, ctx, params):
+            self._requests += 1
+            self._errors += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self._connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self._connections_reused += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self._dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self._dns_cache_misses += 1
+
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает статистику для мониторинга"""
+        connections = self._connections_created + self._connections_reused
+        return {
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'requests': self._requests,
+            'errors': self._errors,
+            'connections_created': self._connections_created,
+            'connections_reused': self._connections_reused,
+            'reuse_rate': round(self._connections_reused / connections, 3) if connections else 0.0,
+            'dns_cache_hits': self._dns_cache_hits,
+            'dns_cache_misses': self._dns_cache_misses,
+        }
+
+
+HTTP_TRANSPORT = HttpTransport(
+    int(os.getenv('HTTP_POOL_LIMIT', HTTP_POOL_LIMIT)),
+    int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', HTTP_POOL_LIMIT_PER_HOST)),
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+)
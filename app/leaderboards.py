@@ -0,0 +1,115 @@
+"""
+Предрассчитанные рейтинги популярных книг и новинок (для /pop)
+
+Рейтинг периода хранится компактными массивами (ID книги, релевантность и атрибуты
+для фильтров пользователя), поэтому запрос /pop только фильтрует готовый рейтинг
+и догружает данные найденных книг.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .constants import SIZE_BUCKETS
+from .sql_templates import id_list
+
+
+def _parse_ids(value: Optional[str]) -> Optional[set]:
+    """'4,5' -> {4, 5}; пустой или некорректный фильтр -> None"""
+    return set(id_list(value)) or None
+
+
+class Leaderboard:
+    """
+    Рейтинг одного периода, упорядоченный по убыванию релевантности
+
+    Строки загружаются уже отсортированными, не больше depth на язык. Для языков,
+    где рейтинг обрезан, запоминается минимальная сохранённая релевантность: если
+    отфильтрованный результат может зависеть от отброшенных строк, select вернёт None
+    и вызывающий код выполнит живой запрос.
+    """
+
+    def __init__(self, rows: Iterable[Tuple], depth: int):
+        """
+        Args:
+            rows: (BookID, Lang, SizeBucket, RoundedRate, PrimaryGenreID, Relevance), по убыванию Relevance
+            depth: Максимальное число строк на язык, с которым считался рейтинг
+        """
+        self.book_ids = array('L')
+        self.relevance = array('d')
+        self.lang_codes = array('H')
+        self.sizes = array('B')
+        self.rates = array('B')
+        self.genres = array('L')
+        self.langs: List[str] = []
+
+        lang_index: Dict[str, int] = {}
+        lang_counts: Dict[int, int] = {}
+        lang_min_relevance: Dict[int, float] = {}
+
+        for book_id, lang, size_bucket, rounded_rate, genre_id, relevance in rows:
+            lang = (lang or '').lower()
+            code = lang_index.get(lang)
+            if code is None:
+                code = lang_index[lang] = len(self.langs)
+                self.langs.append(lang)
+
+            self.book_ids.append(book_id)
+            self.relevance.append(float(relevance or 0))
+            self.lang_codes.append(code)
+            self.sizes.append(size_bucket or 0)
+            self.rates.append(int(rounded_rate or 0))
+            self.genres.append(genre_id or 0)
+
+            lang_counts[code] = lang_counts.get(code, 0) + 1
+            lang_min_relevance[code] = float(relevance or 0)
+
+        # Языки, у которых в рейтинг попали не все книги: code -> минимальная сохранённая релевантность
+        self.truncated = {code: lang_min_relevance[code]
+                          for code, count in lang_counts.items() if count >= depth}
+        self._lang_index = lang_index
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def select(self, lang, size_limit, rating_filter, genre_filter, limit: int) -> Optional[List[Tuple[int, float]]]:
+        """
+        Фильтрует рейтинг по настройкам пользователя
+
+        Returns:
+            [(BookID, Relevance)] не больше limit строк, либо None, если рейтинг
+            обрезан и результат нельзя гарантировать
+        """
+        lang_code = None
+        if lang:
+            lang_code = self._lang_index.get(lang.lower())
+            if lang_code is None:
+                return []
+
+        size_code = SIZE_BUCKETS.get(size_limit) if size_limit else None
+        rates = _parse_ids(rating_filter)
+        genres = _parse_ids(genre_filter)
+
+        result = []
+        for i in range(len(self.book_ids)):
+            if lang_code is not None and self.lang_codes[i] != lang_code:
+                continue
+            if size_code is not None and self.sizes[i] != size_code:
+                continue
+            if rates is not None and self.rates[i] not in rates:
+                continue
+            if genres is not None and self.genres[i] not in genres:
+                continue
+            result.append((self.book_ids[i], self.relevance[i]))
+            if len(result) >= limit:
+                break
+
+        # Отброшенные строки языка имеют релевантность не выше сохранённого минимума,
+        # поэтому результат точен, только если этот минимум ниже последней выбранной строки
+        threshold = result[-1][1] if len(result) >= limit else float('-inf')
+        codes = [lang_code] if lang_code is not None else self.truncated.keys()
+        for code in codes:
+            cutoff = self.truncated.get(code)
+            if cutoff is not None and cutoff >= threshold:
+                return None
+
+        return result
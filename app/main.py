@@ -1,3 +1,4 @@
+import asyncio
 import os
 from pathlib import Path
 
@@ -19,9 +20,11 @@ from .admin import (
     handle_broadcast_callback, BROADCAST_WAITING_MESSAGE,
 )
 from .database import DB_BOOKS
-from .constants import CLEANUP_INTERVAL
-from .health import cleanup_old_sessions
+from .book_cache import BOOK_CACHE
+from .constants import CLEANUP_INTERVAL, LEADERBOARD_FIRST_REFRESH
+from .health import cleanup_old_sessions, refresh_leaderboards, check_catalog_update
 from .flibusta_client import flibusta_client
+from .http_transport import HTTP_TRANSPORT
 from .handlers_payments import pre_checkout, successful_payment
 from .VERSION import __version__
 from .core.structured_logger import structured_logger
@@ -34,6 +37,11 @@ async def post_stop(app: Application) -> None:
     """Вызывается после остановки бота"""
     # Закрываем открытые сессии с сайтом Флибусты
     await flibusta_client.close()
+    await HTTP_TRANSPORT.close()
+    # Дожидаемся завершения запросов к MariaDB и закрываем пул соединений
+    await asyncio.get_running_loop().run_in_executor(None, DB_BOOKS.close)
+    # Сохраняем индекс дискового кэша книг
+    await asyncio.to_thread(BOOK_CACHE.flush)
 
 async def error_handler(update: Update, context: CallbackContext):
     """Глобальный обработчик ошибок"""
@@ -165,23 +173,19 @@ def main():
         # job_queue.run_repeating(log_stats, interval=MONITORING_INTERVAL, first=10)
         # Периодическая очистка старых пользовательских сессий
         job_queue.run_repeating(cleanup_old_sessions, interval=CLEANUP_INTERVAL, first=CLEANUP_INTERVAL)
+        # Предрасчёт рейтингов /pop (дальше - после каждого обновления каталога)
+        job_queue.run_once(refresh_leaderboards, when=LEADERBOARD_FIRST_REFRESH)
+        # Сверка поколения каталога со снимком: сброс устаревших кэшей и их прогрев
+        job_queue.run_once(check_catalog_update, when=0)
 
-    # Preload genre caches for both supported locales
-    try:
-        for locale in ['ru', 'en']:
-            DB_BOOKS.get_parent_genres_count(locale)
-            DB_BOOKS.load_all_child_genres_cache(locale)
-        structured_logger.log_system(
-            EventType.SYSTEM_STARTUP,
-            "Genre caches preloaded for locales: ru, en",
-            {}
-        )
-    except Exception as e:
-        structured_logger.log_system(
-            EventType.SYSTEM_STARTUP,
-            f"Failed to preload genre caches: {e}",
-            {}
-        )
+    # Кэши жанров, языков и статистики поднимаются из снимка на диске без запросов к БД
+    max_book_id = DB_BOOKS.load_catalog_snapshot()
+    structured_logger.log_system(
+        EventType.SYSTEM_STARTUP,
+        f"Catalog caches loaded from snapshot (max book {max_book_id})" if max_book_id is not None
+        else "Catalog snapshot not found, caches will be warmed in background",
+        {}
+    )
 
     application.add_handler(PreCheckoutQueryHandler(pre_checkout))
     application.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment))
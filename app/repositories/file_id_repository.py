@@ -0,0 +1,114 @@
+"""
+Репозиторий file_id отправленных книг (SQLite)
+
+После первой отправки книги Telegram возвращает file_id документа. Повторная отправка
+той же книги в том же формате по file_id - один вызов API без скачивания с Флибусты
+и без повторной загрузки файла в Telegram.
+"""
+
+from typing import Optional
+from ..repositories.base_sqlite import BaseSQLiteRepository
+from ..constants import FLIBUSTA_DB_FILES_PATH
+
+
+class FileIdRepository(BaseSQLiteRepository):
+    """
+    Репозиторий file_id книг
+
+    БД: FlibustaFiles.sqlite
+    Таблицы: TelegramFileCache
+
+    Ключ - (ID книги, формат, поколение каталога): после обновления таблицы книг
+    старые file_id не используются и удаляются в delete_other_generations
+    """
+
+    def __init__(self, db_path: str = FLIBUSTA_DB_FILES_PATH):
+        """Инициализация репозитория file_id"""
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Инициализация схемы БД при первом запуске"""
+        schema_sql = """
+        CREATE TABLE IF NOT EXISTS TelegramFileCache (
+            book_id INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            generation INTEGER NOT NULL,
+            file_id TEXT NOT NULL,
+            file_unique_id TEXT,
+            file_name TEXT,
+            file_size INTEGER,
+            sent_count INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (book_id, format, generation)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_telegramfilecache_generation ON TelegramFileCache(generation);
+        """
+
+        with self.get_connection() as conn:
+            conn.executescript(schema_sql)
+
+    def get_file(self, book_id: int, book_format: str, generation: int) -> Optional[dict]:
+        """
+        Возвращает сохранённый файл книги
+
+        Returns:
+            {'file_id', 'file_name', 'file_size'} или None
+        """
+        row = self.execute_query(
+            """
+            SELECT file_id, file_name, file_size
+            FROM TelegramFileCache
+            WHERE book_id = ? AND format = ? AND generation = ?
+            """,
+            (book_id, book_format, generation),
+            fetch_one=True
+        )
+        return dict(row) if row else None
+
+    def save_file(self, book_id: int, book_format: str, generation: int, file_id: str,
+                  file_unique_id: Optional[str], file_name: str, file_size: Optional[int]) -> None:
+        """Сохраняет file_id, который Telegram вернул после загрузки книги"""
+        self.execute_update(
+            """
+            INSERT OR REPLACE INTO TelegramFileCache
+                (book_id, format, generation, file_id, file_unique_id, file_name, file_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (book_id, book_format, generation, file_id, file_unique_id, file_name, file_size)
+        )
+
+    def count_sent(self, book_id: int, book_format: str, generation: int) -> None:
+        """Учитывает отправку книги по сохранённому file_id"""
+        self.execute_update(
+            """
+            UPDATE TelegramFileCache SET sent_count = sent_count + 1
+            WHERE book_id = ? AND format = ? AND generation = ?
+            """,
+            (book_id, book_format, generation)
+        )
+
+    def delete_file(self, book_id: int, book_format: str) -> int:
+        """Удаляет file_id книги (Telegram больше не принимает его)"""
+        return self.execute_update(
+            "DELETE FROM TelegramFileCache WHERE book_id = ? AND format = ?",
+            (book_id, book_format)
+        )
+
+    def delete_other_generations(self, generation: int) -> int:
+        """Удаляет file_id прошлых поколений каталога"""
+        return self.execute_update(
+            "DELETE FROM TelegramFileCache WHERE generation != ?",
+            (generation,)
+        )
+
+    def get_stats(self) -> dict:
+        """Статистика кэша file_id для мониторинга"""
+        row = self.execute_query(
+            "SELECT COUNT(*) AS files, COALESCE(SUM(sent_count), 0) AS sent_from_cache FROM TelegramFileCache",
+            fetch_one=True
+        )
+        return dict(row) if row else {'files': 0, 'sent_from_cache': 0}
+
+
+FILE_IDS = FileIdRepository()
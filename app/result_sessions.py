@@ -0,0 +1,201 @@
+"""
+Сессии и компактное представление результатов поиска книг
+
+В контексте пользователя (user_data / bot_data) хранится только компактный массив ID
+найденных книг и параметры запроса. Строки книг для показываемой страницы догружаются
+по ID (DatabaseBooks.get_books_page) через общий для процесса кэш строк.
+
+Полные результаты (кэш поиска, выгрузка в CSV) хранятся по колонкам в ColumnarResultSet:
+числа - в типизированных массивах, строки - индексами в общей таблице уникальных значений.
+"""
+
+import sys
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+class ColumnarResultSet(SequenceABC):
+    """
+    Неизменяемый результат запроса, хранящийся по колонкам
+
+    - Числовые колонки - array с заданным typecode (None хранится как 0)
+    - Текстовые колонки - array('I') индексов в таблице уникальных строк результата,
+      поэтому повторяющиеся авторы, жанры и серии хранятся один раз
+    - Доступ по строкам как к списку: индекс возвращает row_type (namedtuple), срез - список строк
+    """
+
+    def __init__(self, row_type, numeric_columns: Dict[str, Tuple[str, bool]], rows: Iterable[Sequence] = ()):
+        """
+        Args:
+            row_type: namedtuple строки результата
+            numeric_columns: поле -> (typecode массива, True если 0 при чтении означает NULL)
+            rows: строки в порядке полей row_type
+        """
+        self.row_type = row_type
+        self._numeric = numeric_columns
+        fields = row_type._fields
+        self._columns = {field: array(numeric_columns[field][0] if field in numeric_columns else 'I')
+                         for field in fields}
+
+        strings: List[Any] = [None]
+        string_index: Dict[Any, int] = {None: 0}
+        appends = [self._columns[field].append for field in fields]
+        converters = [(float if numeric_columns[field][0] == 'd' else int) if field in numeric_columns else None
+                      for field in fields]
+
+        count = 0
+        for row in rows:
+            for value, append, convert in zip(row, appends, converters):
+                if convert is not None:
+                    append(convert(value or 0))
+                    continue
+                code = string_index.get(value)
+                if code is None:
+                    code = string_index[value] = len(strings)
+                    strings.append(value)
+                append(code)
+            count += 1
+
+        self._strings = strings
+        self._len = count
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(self._len)[index]]
+        return self._row(range(self._len)[index])
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._row(i)
+
+    def _row(self, i: int):
+        values = []
+        for field in self.row_type._fields:
+            value = self._columns[field][i]
+            numeric = self._numeric.get(field)
+            if numeric is None:
+                value = self._strings[value]
+            elif numeric[1] and not value:
+                value = None
+            values.append(value)
+        return self.row_type._make(values)
+
+    def column(self, field: str) -> array:
+        """Числовая колонка целиком (например, ID книг) без сборки строк"""
+        return self._columns[field]
+
+    def estimated_size(self) -> int:
+        """Приблизительный размер в памяти, байт (для SearchResultCache)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self._strings)
+        size += sum(sys.getsizeof(column) for column in self._columns.values())
+        size += sum(sys.getsizeof(value) for value in self._strings)
+        return size
+
+
+# Параметры запроса, от которых зависит вид строки книги при догрузке по ID
+# (для книг автора/серии выбирается строка с нужным автором, переводчиком или серией)
+SearchFingerprint = namedtuple('SearchFingerprint',
+                               ['query', 'lang', 'size_limit', 'rating_filter', 'search_area', 'series_id',
+                                'author_id', 'person_type', 'locale', 'genre_filter', 'days_back'],
+                               defaults=(None, None, None, None, None, 0, 0, 'author', 'ru', None, None))
+
+
+class BookResultSession:
+    """Результат поиска книг: ID в порядке выдачи, размер страницы и параметры запроса"""
+
+    __slots__ = ('book_ids', 'page_size', 'fingerprint')
+
+    def __init__(self, book_ids: Iterable[int], page_size: int, fingerprint: SearchFingerprint):
+        self.book_ids = array('L', book_ids)
+        self.page_size = max(1, page_size)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_books(cls, books: Sequence[Any], page_size: int, fingerprint: SearchFingerprint) -> 'BookResultSession':
+        """Сессия по списку найденных книг (Book, ID в поле FileName)"""
+        if isinstance(books, ColumnarResultSet):
+            return cls(books.column('FileName'), page_size, fingerprint)
+        return cls((book.FileName for book in books), page_size, fingerprint)
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    @property
+    def pages_count(self) -> int:
+        return (len(self.book_ids) + self.page_size - 1) // self.page_size
+
+    def page_ids(self, page: int) -> List[int]:
+        """ID книг страницы page (пустой список для несуществующей страницы)"""
+        if page < 0:
+            return []
+        start = page * self.page_size
+        return self.book_ids[start:start + self.page_size].tolist()
+
+    def row_key(self, book_id: int) -> Tuple:
+        """Ключ строки книги в BookRowCache: строка зависит от языка интерфейса и выбранного автора/серии"""
+        fp = self.fingerprint
+        if fp.days_back is not None:
+            return book_id, fp.locale
+        return book_id, fp.locale, fp.series_id, fp.author_id, fp.person_type
+
+
+class BookRowCache:
+    """Thread-safe LRU строк книг (Book), общий для всех сессий процесса"""
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max(0, max_rows)
+        self._rows: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_many(self, keys: Sequence[Hashable]) -> Dict[Hashable, Any]:
+        """Возвращает найденные в кэше строки: key -> Book"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._rows.get(key)
+                if row is None:
+                    self._misses += 1
+                    continue
+                self._rows.move_to_end(key)
+                found[key] = row
+                self._hits += 1
+        return found
+
+    def put_many(self, items: Iterable[Tuple[Hashable, Any]]) -> None:
+        if not self.max_rows:
+            return
+        with self._lock:
+            for key, row in items:
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Возвращает статистику кэша для мониторинга"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'rows': len(self._rows),
+                'max_rows': self.max_rows,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'evictions': self._evictions,
+            }
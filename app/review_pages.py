@@ -0,0 +1,105 @@
+"""
+Постраничный просмотр отзывов о книге
+
+Отзывы читаются порциями по keyset-курсору (Time, имена уже показанных авторов отзывов с этим Time)
+через индекс idx_libreviews_bookid_time_desc, без OFFSET и без загрузки всех отзывов книги.
+Страница - текст одного сообщения Telegram. Готовые страницы хранятся в небольшом LRU по книгам,
+поэтому листание назад и повторные просмотры популярных книг не обращаются к БД.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Курсор продолжения: (Time последнего показанного отзыва, имена показанных отзывов с этим Time)
+ReviewCursor = Tuple[object, Tuple[str, ...]]
+
+
+def next_cursor(cursor: Optional[ReviewCursor], shown_rows: List[Tuple]) -> ReviewCursor:
+    """Курсор после показанных строк (Name, Time, Text); строки с одинаковым Time не теряются на границе страниц"""
+    last_time = shown_rows[-1][1]
+    names = tuple(name for name, time, _ in shown_rows if time == last_time)
+    if cursor is not None and cursor[0] == last_time:
+        # Вся страница пришлась на тот же Time, что и конец предыдущей
+        names = cursor[1] + names
+    return last_time, names
+
+
+class BookReviewPages:
+    """Уже сформированные страницы отзывов одной книги и курсор для следующей"""
+
+    __slots__ = ('pages', 'cursor', 'complete')
+
+    def __init__(self):
+        self.pages: List[str] = []
+        self.cursor: Optional[ReviewCursor] = None
+        self.complete = False
+
+    def has_page(self, page: int) -> bool:
+        return page < len(self.pages)
+
+    def has_more(self, page: int) -> bool:
+        """Есть ли страница после page (известная или ещё не загруженная)"""
+        return page + 1 < len(self.pages) or not self.complete
+
+
+class ReviewPageCache:
+    """
+    LRU страниц отзывов по ID книги
+
+    Страницы читаются и дополняются из event loop, а clear() вызывается и из потока
+    проверки обновления каталога (invalidate_db_cache), поэтому словарь книг под блокировкой
+    """
+
+    def __init__(self, max_books: int):
+        self.max_books = max(0, max_books)
+        self._books: OrderedDict[int, BookReviewPages] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, book_id: int) -> BookReviewPages:
+        """Страницы книги (новая пустая запись, если книги в кэше нет)"""
+        with self._lock:
+            entry = self._books.get(book_id)
+            if entry is None:
+                entry = BookReviewPages()
+                if self.max_books:
+                    self._books[book_id] = entry
+                    while len(self._books) > self.max_books:
+                        self._books.popitem(last=False)
+                        self._evictions += 1
+            else:
+                self._books.move_to_end(book_id)
+            return entry
+
+    def count(self, hit: bool) -> None:
+        """Учитывает запрос страницы: из кэша или с обращением к БД"""
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._books.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает статистику кэша для мониторинга"""
+        with self._lock:
+            books = len(self._books)
+            pages = sum(len(entry.pages) for entry in self._books.values())
+        lookups = self._hits + self._misses
+        return {
+            'books': books,
+            'max_books': self.max_books,
+            'pages': pages,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+            'evictions': self._evictions,
+        }
@@ -0,0 +1,117 @@
+"""
+Общий (для всех пользователей) кэш результатов поиска в DatabaseBooks
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Приводит поисковый запрос к виду ключа кэша: регистр и лишние пробелы не важны для MATCH"""
+    return ' '.join((query or '').lower().split())
+
+
+def estimate_size(rows: Sequence[Any]) -> int:
+    """Приблизительный размер результата в байтах (список строк-кортежей или ColumnarResultSet)"""
+    if hasattr(rows, 'estimated_size'):
+        return rows.estimated_size()
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        if isinstance(row, tuple):
+            size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class SearchResultCache:
+    """
+    Thread-safe LRU-кэш результатов поиска, ограниченный по объёму и времени жизни
+
+    - Ключ: кортеж из нормализованного запроса и всех фильтров
+    - Список хранится кортежем, наружу отдаётся копия-список (вызывающий код режет его на страницы);
+      неизменяемые результаты (ColumnarResultSet) хранятся и отдаются как есть
+    - Вытеснение самых старых по использованию записей при превышении max_bytes
+    - Записи старше ttl секунд считаются промахом
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl
+
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()  # key -> (expires_at, size, rows)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expired = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[List[Any]]:
+        """Возвращает закэшированный результат или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, size, rows = entry
+            if monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self._expired += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return list(rows) if isinstance(rows, tuple) else rows
+
+    def put(self, key: Hashable, rows: Sequence[Any]) -> None:
+        """Сохраняет результат; слишком большие результаты не кэшируются"""
+        if isinstance(rows, list):
+            rows = tuple(rows)
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (monotonic() + self.ttl, size, rows)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Сбрасывает все записи (например, после обновления каталога)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кэша для мониторинга"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expired': self._expired,
+                'invalidations': self._invalidations,
+            }
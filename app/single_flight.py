@@ -0,0 +1,83 @@
+"""
+Объединение одновременных одинаковых запросов (single flight)
+
+Когда книгу обсуждают в большой группе, десятки пользователей почти одновременно нажимают
+«скачать»: без объединения каждое нажатие заново скачивает тот же файл с сайта и держит
+свою копию в памяти. SingleFlight выполняет по ключу не больше одного запроса; все, кто
+пришёл, пока запрос выполняется, получают тот же результат или то же исключение.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    """Выполняющийся запрос и число ожидающих его результата"""
+
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Не больше одного выполняющегося запроса на ключ в event loop
+
+    - Запрос выполняется отдельной задачей: отмена или таймаут одного ожидающего не прерывает его для остальных
+    - Ожидание ограничено wait_timeout секунд (asyncio.TimeoutError только у того, кто не дождался)
+    - Исключение запроса получают все ожидающие
+    - Если ожидающих не осталось (все отменены или не дождались), запрос отменяется
+    """
+
+    def __init__(self, name: str, wait_timeout: float):
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self._flights: Dict[Hashable, _Flight] = {}
+
+        # Метрики
+        self._started = 0
+        self._coalesced = 0
+        self._timeouts = 0
+        self._errors = 0
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Результат fetch() для ключа; если такой запрос уже выполняется - ждёт его результата"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fetch()))
+            flight.task.add_done_callback(lambda task, key=key: self._finish(key, task))
+            self._flights[key] = flight
+            self._started += 1
+        else:
+            self._coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.wait_timeout)
+        except asyncio.TimeoutError:
+            if not flight.task.done():
+                self._timeouts += 1
+            raise
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is not None and self._flights[key].task is task:
+            del self._flights[key]
+        # Забираем исключение, даже если ожидающих не осталось (иначе asyncio пишет предупреждение)
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает статистику для мониторинга"""
+        return {
+            'in_flight': len(self._flights),
+            'started': self._started,
+            'coalesced': self._coalesced,
+            'timeouts': self._timeouts,
+            'errors': self._errors,
+        }
@@ -0,0 +1,82 @@
+"""
+Шаблоны SQL-запросов к каталогу
+
+Текст запроса зависит только от его формы: область поиска, язык интерфейса, какие фильтры
+заданы и сколько значений в каждом. Все значения пользователя (запрос, язык, оценки, жанры,
+даты, ID) передаются параметрами. Поэтому каждый вид запроса собирается один раз на процесс,
+а на соединении пула один раз готовится на сервере (MariaDBPool, prepared_statements)
+и дальше только выполняется с новыми параметрами.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+# Минимальная длина списка ID в IN (...), см. pad_ids
+MIN_IDS_BUCKET = 8
+
+
+def placeholders(count: int) -> str:
+    """'%s, %s, %s' для IN (...) из count значений"""
+    return ', '.join(['%s'] * count)
+
+
+def id_list(value: Optional[str]) -> List[int]:
+    """'4,5' -> [4, 5]; пустой или некорректный фильтр -> []"""
+    if not value or not value.strip():
+        return []
+    if not all(c.isdigit() or c == ',' for c in value):
+        return []
+    return [int(part) for part in value.split(',') if part]
+
+
+def pad_ids(ids: Sequence[int]) -> List[int]:
+    """
+    Дополняет список ID повтором последнего до ближайшей степени двойки (не меньше MIN_IDS_BUCKET)
+
+    Число параметров в IN (...) определяет форму запроса: без дополнения страница из 7 и из 9 книг
+    давали бы разные подготовленные выражения. Повторы в IN на результат не влияют
+    """
+    ids = list(ids)
+    if not ids:
+        return ids
+    size = MIN_IDS_BUCKET
+    while size < len(ids):
+        size *= 2
+    return ids + [ids[-1]] * (size - len(ids))
+
+
+class QueryTemplates:
+    """Thread-safe кэш текстов SQL-запросов по форме запроса (ключ - кортеж параметров формы)"""
+
+    def __init__(self):
+        self._templates: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], str]) -> str:
+        """Текст запроса формы key; при первом обращении собирается вызовом build()"""
+        with self._lock:
+            sql = self._templates.get(key)
+            if sql is not None:
+                self._hits += 1
+                return sql
+            self._misses += 1
+
+        # Сборка вне блокировки: при гонке оба потока получат одинаковый текст
+        sql = build()
+        with self._lock:
+            return self._templates.setdefault(key, sql)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику шаблонов для мониторинга"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'templates': len(self._templates),
+                'template_hits': self._hits,
+                'template_misses': self._misses,
+                'template_hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+            }
@@ -12,6 +12,7 @@ import aiohttp
 # from urllib.parse import unquote
 from .constants import (
     HEADING_POP,
+    HTTP_CALL_UPLOAD,
     SEARCH_TYPE_AUTHORS,
     SEARCH_TYPE_BOOKS,
     SEARCH_TYPE_SERIES,
@@ -20,6 +21,7 @@ from .constants import (
     SETTING_SEARCH_AREA_BA,
 )
 from .flibusta_client import FlibustaClient
+from .http_transport import HTTP_TRANSPORT
 from .core.structured_logger import structured_logger
 from .i18n import t, tp
 
@@ -82,16 +84,17 @@ def form_header_books(
 async def upload_to_tmpfiles(file, file_name: str) -> Optional[str]:
     """Загружает файл на tmpfiles.org и возвращает URL для скачивания"""
     try:
-        async with aiohttp.ClientSession() as session:
-            form_data = aiohttp.FormData()
-            form_data.add_field("file", file, filename=file_name)
-            params = {"duration": "15m"}
-
-            async with session.post("https://tmpfiles.org/api/v1/upload", data=form_data, params=params) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result["data"]["url"]
-                return None
+        session = HTTP_TRANSPORT.get_session()
+        form_data = aiohttp.FormData()
+        form_data.add_field("file", file, filename=file_name)
+        params = {"duration": "15m"}
+
+        async with session.post("https://tmpfiles.org/api/v1/upload", data=form_data, params=params,
+                                timeout=HTTP_TRANSPORT.timeout(HTTP_CALL_UPLOAD)) as response:
+            if response.status == 200:
+                result = await response.json()
+                return result["data"]["url"]
+            return None
     except Exception as e:
         print(f"Ошибка загрузки: {e}")
         return None
@@ -174,58 +177,42 @@ def truncate_text(text: str, no_more_len: int, stop_sep: str) -> str:
             return truncated + "..."
 
 
-def format_links_from_flat_string(url_routine, flat_str: str, max_num_elem: int) -> Tuple[str, bool]:
-    if not flat_str:
+def format_links(url_routine, items: List[Dict[str, Any]], max_num_elem: int) -> Tuple[str, bool]:
+    """Формирует HTML-ссылки из списка [{'id': .., 'name': ..}] (не больше max_num_elem)"""
+    if not items:
         return "", False
 
-    parts = [part.strip() for part in flat_str.split(",") if part.strip()]
-    orig_len = len(parts)
-    parts = parts[:max_num_elem]
-    trunc_len = len(parts)
-
-    # Если нечётное количество — отбрасываем последний непарный элемент
-    if len(parts) % 2 != 0:
-        parts = parts[:-1]
-
-    links = []
-    for i in range(0, len(parts), 2):
-        try:
-            elem_id = int(parts[i])
-            elem_name = parts[i + 1]
-            url = url_routine(elem_id)
-            links.append(f"<a href='{url}'>{elem_name}</a>")
-        except (ValueError, IndexError):
-            # Пропускаем некорректные пары
-            continue
-
-    return ", ".join(links), orig_len != trunc_len
+    links = [
+        f"<a href='{url_routine(item['id'])}'>{html.escape(str(item['name']))}</a>"
+        for item in items[:max_num_elem]
+    ]
+    return ", ".join(links), len(items) > max_num_elem
 
 
 def format_book_info(book_info, context):
     """Форматирует информацию о книге для сообщения"""
     text = f"📚 <b><a href='{FlibustaClient.get_book_url(book_info['bookid'])}'>{book_info['title']}</a></b>\n"
     # authors = book_info['authors'][:300] + ("..." if len(book_info['authors']) > 300 else "")
-    author_links, is_truncated = format_links_from_flat_string(FlibustaClient.get_author_url, book_info["authors"], 20)
+    author_links, is_truncated = format_links(FlibustaClient.get_author_url, book_info["authors"], 10)
     text += f"\n{t('book.authors',context)} {(author_links + (',...' if is_truncated else '')) or t('book.not_specified', context)}"
     
     # Translators (new)
     if book_info.get("translators"):
-        translator_links, is_truncated = format_links_from_flat_string(FlibustaClient.get_translator_url, book_info["translators"], 20)
+        translator_links, is_truncated = format_links(FlibustaClient.get_translator_url, book_info["translators"], 10)
         text += f"\n{t('book.translators',context)} {(translator_links + (',...' if is_truncated else '')) or t('book.not_specified', context)}"
     
     year = book_info["year"]
-    series = book_info["series"]
-    genre_links, is_truncated = format_links_from_flat_string(FlibustaClient.get_genre_url, book_info["genres"], 10)
+    series_links, _ = format_links(FlibustaClient.get_series_url, book_info["series"], 5)
+    genre_links, is_truncated = format_links(FlibustaClient.get_genre_url, book_info["genres"], 5)
     lang = book_info["lang"]
     src_lang = book_info.get("src_lang")
     pages = book_info["pages"]
     rate = book_info["rate"]
     # book_id = book_info['bookid']
-    series_id = book_info["seqid"]
     if genre_links:
         text += f"\n{t('book.genres',context)} {(genre_links + (',...' if is_truncated else '')) or t('book.not_specified', context)}"
-    if series:
-        text += f"\n{t('book.series',context)} <a href='{FlibustaClient.get_series_url(series_id)}'>{series}</a>"
+    if series_links:
+        text += f"\n{t('book.series',context)} {series_links}"
     if year and year != 0:
         text += f"\n{t('book.year',context)} {year}"
     if lang:
@@ -271,20 +258,23 @@ def format_author_info(author_info, context, person_type='author'):
     return truncate_text(text, 4000, ".")
 
 
-def format_book_reviews(reviews, context):
-    """Форматирует отзывы о книге"""
-    text = f"{t('book.reviews_title',context)}\n\n"
+def format_reviews_page(reviews, max_chars: int) -> Tuple[str, int]:
+    """Форматирует отзывы о книге (Name, Time, Text) в текст одной страницы без заголовка.
+    Возвращает (текст, сколько отзывов поместилось); первый отзыв попадает на страницу всегда"""
+    text = ""
+    shown = 0
 
-    for name, time, review_text in reviews[:50]:
-        reviewer = f"👤 <b>{name}</b> ({time})\n"
-        clean_review = clean_html_tags(review_text)
+    for name, time, review_text in reviews:
+        reviewer = f"👤 <b>{html.escape(name or '')}</b> ({time})\n"
+        clean_review = clean_html_tags(review_text or '')
         clean_review_trunc = f"{clean_review[:1000]}" + ("..." if len(clean_review) > 1000 else "") + "\n"
-        if len(text + reviewer + clean_review_trunc) > 4000:
+        if shown and len(text) + len(reviewer) + len(clean_review_trunc) > max_chars:
             break
         text += reviewer
         text += clean_review_trunc
+        shown += 1
 
-    return text
+    return text, shown
 
 
 def clean_html_tags(text: str) -> str:
@@ -140,6 +140,9 @@ apply_preparation_scripts() {
         "zz_20_create_indexes.sql"
         "zz_30_create_FT_indexes.sql"
         "zz_40_fill_FT.sql"
+        "zz_45_fill_book_stats.sql"
+        "zz_46_fill_book_cards.sql"
+        "zz_47_fill_book_filters.sql"
         "zz_50_repair_FT.sql"
     )
 
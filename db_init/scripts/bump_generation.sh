@@ -0,0 +1,44 @@
+#!/bin/bash
+# bump_generation.sh - Bump catalog_generation versions of activated tables
+# Usage: bump_generation.sh <table> [<table> ...]
+# Table names as in tables.conf (libbook, libreviews, ...) or aux tables (book_stats, book_cards, libbook_fts).
+# The bot polls catalog_generation and invalidates only the caches built from changed tables.
+
+set -e -o pipefail
+
+# Environment variables with defaults
+: "${FLIBUSTA_DB_CONTAINER:=flibusta-db}"
+: "${FLIBUSTA_DB_USER:=flibusta}"
+: "${FLIBUSTA_DB_PASS:=flibusta}"
+: "${FLIBUSTA_DB_NAME:=flibusta}"
+
+# Validate input
+if [ $# -lt 1 ]; then
+    echo "Usage: $0 <table> [<table> ...]"
+    exit 1
+fi
+
+VALUES=""
+for TABLE in "$@"; do
+    # Safety check - plain table names only
+    if [[ ! "$TABLE" =~ ^[A-Za-z0-9_]+$ ]]; then
+        echo "Error: Invalid table name: $TABLE"
+        exit 1
+    fi
+    VALUES="${VALUES:+$VALUES, }('$TABLE', 1, NOW())"
+done
+
+SQL="CREATE TABLE IF NOT EXISTS catalog_generation (
+    TableName VARCHAR(64) NOT NULL PRIMARY KEY,
+    Version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    UpdatedAt DATETIME NOT NULL
+);
+INSERT INTO catalog_generation (TableName, Version, UpdatedAt) VALUES $VALUES
+ON DUPLICATE KEY UPDATE Version = Version + 1, UpdatedAt = NOW();"
+
+if docker exec -i "$FLIBUSTA_DB_CONTAINER" mariadb -u "$FLIBUSTA_DB_USER" -p"$FLIBUSTA_DB_PASS" "$FLIBUSTA_DB_NAME" <<< "$SQL"; then
+    echo "✅ Bumped catalog generation: $*"
+else
+    echo "❌ Failed to bump catalog generation: $*"
+    exit 1
+fi
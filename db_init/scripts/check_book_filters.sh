@@ -0,0 +1,37 @@
+#!/bin/bash
+# check_book_filters.sh - Check that a libbook table has the precomputed filter columns
+# Usage: check_book_filters.sh <table>
+# The bot selects PrimaryGenreID, SizeBucket and RoundedRate (zz_47_fill_book_filters.sql) in every
+# search, /pop and book row query: a libbook without them must never become cb_libbook.
+
+set -e -o pipefail
+
+# Environment variables with defaults
+: "${FLIBUSTA_DB_CONTAINER:=flibusta-db}"
+: "${FLIBUSTA_DB_USER:=flibusta}"
+: "${FLIBUSTA_DB_PASS:=flibusta}"
+: "${FLIBUSTA_DB_NAME:=flibusta}"
+
+# Validate input
+if [ $# -ne 1 ]; then
+    echo "Usage: $0 <table>"
+    exit 1
+fi
+
+TABLE="$1"
+if [[ ! "$TABLE" =~ ^[A-Za-z0-9_]+$ ]]; then
+    echo "Error: Invalid table name: $TABLE"
+    exit 1
+fi
+
+SQL="SELECT COUNT(*) FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '$TABLE'
+  AND COLUMN_NAME IN ('PrimaryGenreID', 'SizeBucket', 'RoundedRate');"
+
+COUNT=$(docker exec -i "$FLIBUSTA_DB_CONTAINER" mariadb -N -B -u "$FLIBUSTA_DB_USER" -p"$FLIBUSTA_DB_PASS" "$FLIBUSTA_DB_NAME" <<< "$SQL")
+if [ "$COUNT" = "3" ]; then
+    echo "✅ $TABLE has filter columns"
+else
+    echo "❌ $TABLE has no filter columns PrimaryGenreID/SizeBucket/RoundedRate (run zz_47_fill_book_filters.sql)"
+    exit 1
+fi
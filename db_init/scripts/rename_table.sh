@@ -19,25 +19,25 @@ fi
 FROM_TABLE="$1"
 TO_TABLE="$2"
 
-# Safety checks according to table lifecycle rules:
+# Safety checks according to table lifecycle rules (lib* also covers aux tables book_stats, book_cards):
 # - lib* → cb_lib* (allowed: activation)
 # - cb_lib* → cb_lib*_old (allowed: backup)
 # - cb_lib*_old → cb_lib* (allowed: restore)
 
 # Check if this is a lib* to cb_lib* rename (activation)
-if [[ "$FROM_TABLE" =~ ^lib.*$ ]] && [[ "$TO_TABLE" =~ ^cb_lib.*$ ]]; then
+if [[ "$FROM_TABLE" =~ ^(lib|book_).*$ ]] && [[ "$TO_TABLE" =~ ^cb_(lib|book_).*$ ]]; then
     # This is allowed for activation
     :
 # Check if this is a cb_lib* to cb_lib*_old rename (backup)
-elif [[ "$FROM_TABLE" =~ ^cb_lib.*$ ]] && [[ "$TO_TABLE" =~ ^cb_lib.*_old$ ]]; then
+elif [[ "$FROM_TABLE" =~ ^cb_(lib|book_).*$ ]] && [[ "$TO_TABLE" =~ ^cb_(lib|book_).*_old$ ]]; then
     # This is allowed for backup
     :
 # Check if this is a cb_lib* to lib* rename (restore 1 step)
-elif [[ "$FROM_TABLE" =~ ^cb_lib.*$ ]] && [[ "$TO_TABLE" =~ ^lib.*$ ]]; then
+elif [[ "$FROM_TABLE" =~ ^cb_(lib|book_).*$ ]] && [[ "$TO_TABLE" =~ ^(lib|book_).*$ ]]; then
     # This is allowed for restore
     :
 # Check if this is a cb_lib*_old to cb_lib* rename (restore 2 step)
-elif [[ "$FROM_TABLE" =~ ^cb_lib.*_old$ ]] && [[ "$TO_TABLE" =~ ^cb_lib.*$ ]]; then
+elif [[ "$FROM_TABLE" =~ ^cb_(lib|book_).*_old$ ]] && [[ "$TO_TABLE" =~ ^cb_(lib|book_).*$ ]]; then
     # This is allowed for restore
     :
 else
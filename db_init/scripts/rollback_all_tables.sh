@@ -40,6 +40,13 @@ rollback_cb_tables() {
 
     local success_count=0
     local total_count=0
+    local rolled_back=()
+
+    # The backup must have precomputed filter columns, otherwise every search fails after rollback
+    if ! "$DB_DIR/scripts/check_book_filters.sh" "cb_libbook_old"; then
+        echo "❌ Aborting rollback: cb_libbook_old has no filter columns"
+        exit 1
+    fi
 
     # Process tables from tables.conf using atomic scripts
     while IFS='=' read -r table filename; do
@@ -55,9 +62,15 @@ rollback_cb_tables() {
         # Rename cb_<table>_old to cb_<table> (rollback)
         "$DB_DIR/scripts/rename_table.sh" "cb_${table}_old" "cb_${table}"
 
+        rolled_back+=("$table")
         success_count=$((success_count + 1))
     done < "$DB_DIR/scripts/tables.conf"
 
+    # Tell the bot which tables changed (catalog_generation)
+    if [ ${#rolled_back[@]} -gt 0 ]; then
+        "$DB_DIR/scripts/bump_generation.sh" "${rolled_back[@]}"
+    fi
+
     echo "✅ Task completed: Rolled back $success_count/$total_count tables"
 }
 
@@ -0,0 +1,57 @@
+#!/bin/bash
+# run_aux_script.sh - Run a preparation SQL script outside the full import pipeline
+# Usage: run_aux_script.sh <script.sql> <staged_table> [<staged_table> ...]
+# Preparation scripts (zz_40, zz_45, zz_46, zz_47) reference staging names (libbook, book_stats, ...),
+# which all exist only during update_all_tables.sh. Every table from tables.conf and every aux table
+# that is NOT listed as staged is rewritten to its active cb_ name, so e.g.
+#   run_aux_script.sh zz_47_fill_book_filters.sql libbook
+# fills the freshly restored libbook from cb_libgenre and cb_book_stats.
+
+set -e -o pipefail
+
+# Load configuration
+CONFIG_FILE="$(dirname "$0")/tables.conf"
+: "${FLIBUSTA_DB_DIR:=$(cd "$(dirname "$0")/.." && pwd)}"
+DB_DIR="$FLIBUSTA_DB_DIR"
+
+# Environment variables with defaults
+: "${FLIBUSTA_DB_CONTAINER:=flibusta-db}"
+: "${FLIBUSTA_DB_USER:=flibusta}"
+: "${FLIBUSTA_DB_PASS:=flibusta}"
+: "${FLIBUSTA_DB_NAME:=flibusta}"
+
+# Aux tables built by preparation scripts
+AUX_TABLES="libbook_fts book_stats book_cards"
+
+# Validate input
+if [ $# -lt 2 ]; then
+    echo "Usage: $0 <script.sql> <staged_table> [<staged_table> ...]"
+    exit 1
+fi
+
+SCRIPT="$1"
+shift
+[[ "$SCRIPT" = /* ]] || SCRIPT="$DB_DIR/$SCRIPT"
+if [ ! -f "$SCRIPT" ]; then
+    echo "Error: Script $SCRIPT not found"
+    exit 1
+fi
+
+# Rewrite references to active tables: \b keeps libavtor from matching libavtorname or cb_libavtor
+SED_EXPR=""
+for TABLE in $(grep -v '^#' "$CONFIG_FILE" | cut -d= -f1) $AUX_TABLES; do
+    STAGED=0
+    for S in "$@"; do
+        [ "$S" = "$TABLE" ] && STAGED=1
+    done
+    [ "$STAGED" -eq 1 ] && continue
+    SED_EXPR="${SED_EXPR}s/\\b${TABLE}\\b/cb_${TABLE}/g;"
+done
+
+echo "$(date '+%Y-%m-%d %H:%M:%S') - Executing SQL script: $(basename "$SCRIPT") (staged: $*)"
+if sed -E "$SED_EXPR" "$SCRIPT" | docker exec -i "$FLIBUSTA_DB_CONTAINER" mariadb -u "$FLIBUSTA_DB_USER" -p"$FLIBUSTA_DB_PASS" "$FLIBUSTA_DB_NAME"; then
+    echo "✅ Completed SQL script: $(basename "$SCRIPT")"
+else
+    echo "❌ Failed SQL script: $(basename "$SCRIPT")"
+    exit 1
+fi
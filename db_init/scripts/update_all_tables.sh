@@ -176,6 +176,13 @@ activate_cb_tables() {
 
     local success_count=0
     local total_count=0
+    local activated=()
+
+    # Never activate a libbook without precomputed filter columns (zz_47_fill_book_filters.sql)
+    if ! "$DB_DIR/scripts/check_book_filters.sh" "libbook"; then
+        echo "$(date '+%Y-%m-%d %H:%M:%S') - ❌ Aborting activation: libbook is not prepared"
+        exit 1
+    fi
 
     # Process tables from tables.conf using atomic scripts
     while IFS='=' read -r table filename; do
@@ -194,9 +201,15 @@ activate_cb_tables() {
         # Rename <table> to cb_<table> (activate) - table is already lib*
         "$DB_DIR/scripts/rename_table.sh" "${table}" "cb_${table}"
 
+        activated+=("$table")
         success_count=$((success_count + 1))
     done < "$DB_DIR/scripts/tables.conf"
 
+    # Tell the bot which tables changed (catalog_generation)
+    if [ ${#activated[@]} -gt 0 ]; then
+        "$DB_DIR/scripts/bump_generation.sh" "${activated[@]}"
+    fi
+
     echo "$(date '+%Y-%m-%d %H:%M:%S') - ✅ Task completed: Activated $success_count/$total_count tables"
 }
 
@@ -263,9 +276,45 @@ process_libbook_fts() {
     # Rename libbook_fts to cb_libbook_fts (activate)
     "$DB_DIR/scripts/rename_table.sh" "libbook_fts" "cb_libbook_fts"
 
+    "$DB_DIR/scripts/bump_generation.sh" "libbook_fts"
+
     echo "$(date '+%Y-%m-%d %H:%M:%S') - ✅ Processed libbook_fts aux table"
 }
 
+process_book_stats() {
+    echo "$(date '+%Y-%m-%d %H:%M:%S') - 📊 Processing aux table: book_stats"
+
+    # Drop old backup table
+    "$DB_DIR/scripts/drop_old_table.sh" "cb_book_stats_old"
+
+    # Rename cb_book_stats to cb_book_stats_old (backup)
+    "$DB_DIR/scripts/rename_table.sh" "cb_book_stats" "cb_book_stats_old"
+
+    # Rename book_stats to cb_book_stats (activate)
+    "$DB_DIR/scripts/rename_table.sh" "book_stats" "cb_book_stats"
+
+    "$DB_DIR/scripts/bump_generation.sh" "book_stats"
+
+    echo "$(date '+%Y-%m-%d %H:%M:%S') - ✅ Processed book_stats aux table"
+}
+
+process_book_cards() {
+    echo "$(date '+%Y-%m-%d %H:%M:%S') - 🗂️  Processing aux table: book_cards"
+
+    # Drop old backup table
+    "$DB_DIR/scripts/drop_old_table.sh" "cb_book_cards_old"
+
+    # Rename cb_book_cards to cb_book_cards_old (backup)
+    "$DB_DIR/scripts/rename_table.sh" "cb_book_cards" "cb_book_cards_old"
+
+    # Rename book_cards to cb_book_cards (activate)
+    "$DB_DIR/scripts/rename_table.sh" "book_cards" "cb_book_cards"
+
+    "$DB_DIR/scripts/bump_generation.sh" "book_cards"
+
+    echo "$(date '+%Y-%m-%d %H:%M:%S') - ✅ Processed book_cards aux table"
+}
+
 # Function to ensure containers are healthy
 ensure_containers_healthy() {
     echo "$(date '+%Y-%m-%d %H:%M:%S') - 🏥 Starting task: Ensure containers are healthy..."
@@ -401,6 +450,10 @@ main() {
             activate_cb_tables
         elif [[ "$task_name" == "process_libbook_fts" ]]; then
             process_libbook_fts
+        elif [[ "$task_name" == "process_book_stats" ]]; then
+            process_book_stats
+        elif [[ "$task_name" == "process_book_cards" ]]; then
+            process_book_cards
         elif [[ "$task_name" == "backup_sql_files" ]]; then
             backup_sql_files
         elif [[ "$task_name" == "restore_sql_files" ]]; then
@@ -23,6 +23,16 @@ TABLE="$1"
 #SCRIPT_DIR="$(dirname "$0")"
 SCRIPT_DIR="$FLIBUSTA_DB_DIR/scripts"
 
+# Tables the aux tables are built from (see zz_40, zz_45, zz_46, zz_47)
+FT_SOURCES="libbook libavtor libavtorname libtranslator libseq libseqname libgenre libgenrelist"
+STATS_SOURCES="librate librecs libreviews"
+CARDS_SOURCES="libbook libbpics libavtor libavtorname libtranslator libgenre libgenrelist libseq libseqname"
+FILTERS_SOURCES="libgenre"
+
+_feeds() {
+    [[ " $2 " == *" $1 "* ]]
+}
+
 echo "🔄 Starting single table update for: $TABLE"
 
 # Step 1: Cleanup .sql.gz file for this table
@@ -41,6 +51,36 @@ echo "📥 Step 3: Download backup..."
 echo "💾 Step 4: Restore to lib table..."
 "$SCRIPT_DIR/restore_to_lib.sh" "$TABLE"
 
+# Step 4a: The bot selects precomputed filter columns from cb_libbook (zz_47)
+if [ "$TABLE" = "libbook" ]; then
+    echo "🧮 Step 4a: Fill libbook filter columns..."
+    "$SCRIPT_DIR/run_aux_script.sh" "zz_47_fill_book_filters.sql" "libbook"
+    "$SCRIPT_DIR/check_book_filters.sh" "libbook"
+fi
+
+# Step 4b: Rebuild aux tables fed by this table, otherwise the bot refills its caches from stale ones
+AUX=()
+if _feeds "$TABLE" "$STATS_SOURCES"; then
+    echo "📊 Step 4b: Rebuild book_stats..."
+    "$SCRIPT_DIR/run_aux_script.sh" "zz_45_fill_book_stats.sql" "$TABLE" "book_stats"
+    AUX+=("book_stats")
+fi
+if _feeds "$TABLE" "$FT_SOURCES"; then
+    echo "📖 Step 4b: Rebuild libbook_fts..."
+    "$SCRIPT_DIR/run_aux_script.sh" "zz_40_fill_FT.sql" "$TABLE" "libbook_fts"
+    AUX+=("libbook_fts")
+fi
+if _feeds "$TABLE" "$CARDS_SOURCES" || _feeds "book_stats" "${AUX[*]}"; then
+    echo "🗂️ Step 4b: Rebuild book_cards..."
+    "$SCRIPT_DIR/run_aux_script.sh" "zz_46_fill_book_cards.sql" "$TABLE" "${AUX[@]}" "book_cards"
+    AUX+=("book_cards")
+fi
+# Primary genre and rounded rate live in cb_libbook itself: refill them in place
+if [ "$TABLE" != "libbook" ] && { _feeds "$TABLE" "$FILTERS_SOURCES" || _feeds "book_stats" "${AUX[*]}"; }; then
+    echo "🧮 Step 4b: Refill cb_libbook filter columns..."
+    "$SCRIPT_DIR/run_aux_script.sh" "zz_47_fill_book_filters.sql" "$TABLE" "${AUX[@]}"
+fi
+
 # Step 5: Rename cb_<table> → cb_<table>_old
 echo "🔄 Step 5: Rename cb_${TABLE} to cb_${TABLE}_old..."
 "$SCRIPT_DIR/rename_table.sh" "cb_${TABLE}" "cb_${TABLE}_old"
@@ -49,4 +89,16 @@ echo "🔄 Step 5: Rename cb_${TABLE} to cb_${TABLE}_old..."
 echo "🔄 Step 6: Rename ${TABLE} to cb_${TABLE}..."
 "$SCRIPT_DIR/rename_table.sh" "${TABLE}" "cb_${TABLE}"
 
+# Step 6a: Activate rebuilt aux tables (previous version stays as cb_<aux>_old)
+for AUX_TABLE in "${AUX[@]}"; do
+    echo "🔄 Step 6a: Activate ${AUX_TABLE}..."
+    "$SCRIPT_DIR/drop_old_table.sh" "cb_${AUX_TABLE}_old"
+    "$SCRIPT_DIR/rename_table.sh" "cb_${AUX_TABLE}" "cb_${AUX_TABLE}_old"
+    "$SCRIPT_DIR/rename_table.sh" "${AUX_TABLE}" "cb_${AUX_TABLE}"
+done
+
+# Step 7: Bump catalog_generation so the bot drops caches built from this table and its aux tables
+echo "🔢 Step 7: Bump catalog generation..."
+"$SCRIPT_DIR/bump_generation.sh" "$TABLE" "${AUX[@]}"
+
 echo "✅ Single table update completed successfully for: $TABLE"
\ No newline at end of file
@@ -14,7 +14,7 @@ SELECT 'Rolling back...' as Status;
 DROP TABLE IF EXISTS cb_libbook, cb_libavtor, cb_libavtorname, cb_libgenre,
     cb_libgenrelist, cb_libseq, cb_libseqname, cb_librate, cb_librecs,
     cb_libreviews, cb_libbannotations, cb_libaannotations, cb_libbook_fts,
-    cb_libapics, cb_libbpics;
+    cb_libapics, cb_libbpics, cb_book_stats, cb_book_cards;
 -- Переименование обратно
 RENAME TABLE cb_libaannotations_old TO cb_libaannotations;
 RENAME TABLE cb_libbook_old TO cb_libbook;
@@ -29,5 +29,7 @@ RENAME TABLE cb_librecs_old TO cb_librecs;
 RENAME TABLE cb_libreviews_old TO cb_libreviews;
 RENAME TABLE cb_libbannotations_old TO cb_libbannotations;
 RENAME TABLE cb_libbook_fts_old TO cb_libbook_fts;
+RENAME TABLE cb_book_stats_old TO cb_book_stats;
+RENAME TABLE cb_book_cards_old TO cb_book_cards;
 
 SELECT 'Rollback completed!' as Status;
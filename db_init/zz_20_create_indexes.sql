@@ -15,3 +15,11 @@ create INDEX IF NOT EXISTS idx_time_bookid on libreviews (Time DESC, BookId);
 
 -- Покрывающий индекс для агрегации рейтингов (ускорит GROUP BY в 5-10 раз)
 create INDEX IF NOT EXISTS idx_bookid_rate_id on librate (BookId, Rate, id);
+
+-- Фильтры пользователя во внутреннем WHERE поиска (DatabaseBooks.build_sql_where_inner):
+-- книги серии, автора и переводчика, основной жанр книги
+-- (индекс по языку, размеру, оценке и жанру книги создаётся в zz_47_fill_book_filters.sql)
+create INDEX IF NOT EXISTS idx_libseq_seqid_bookid on libseq (SeqId, BookId);
+create INDEX IF NOT EXISTS idx_libavtor_avtorid_bookid on libavtor (AvtorId, BookId);
+create INDEX IF NOT EXISTS idx_libtranslator_translatorid_bookid on libtranslator (TranslatorId, BookId);
+create INDEX IF NOT EXISTS idx_libgenre_bookid_genreid on libgenre (BookId, GenreId);
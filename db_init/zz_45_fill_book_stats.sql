@@ -0,0 +1,45 @@
+-- -- АГРЕГАТЫ ОЦЕНОК, РЕКОМЕНДАЦИЙ И ОТЗЫВОВ ПО КНИГАМ -- --
+-- Заменяет GROUP BY по librate/librecs/libreviews в каждом поисковом запросе бота
+DROP TABLE IF EXISTS book_stats;
+SELECT 'book_stats table dropped if existed' AS OperationStatus;
+
+CREATE TABLE book_stats (
+    BookId INT(10) UNSIGNED NOT NULL,
+    LibRate DECIMAL(6,4) NULL,
+    RoundedRate TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    RateCount INT UNSIGNED NOT NULL DEFAULT 0,
+    RecsCount INT UNSIGNED NOT NULL DEFAULT 0,
+    ReviewsCount INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (BookId),
+    KEY idx_book_stats_rounded_rate (RoundedRate)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_unicode_ci;
+SELECT 'book_stats table created' AS OperationStatus;
+
+-- Оценки: средняя, округлённая (для фильтра по рейтингу) и количество
+INSERT INTO book_stats (BookId, LibRate, RoundedRate, RateCount)
+SELECT
+    BookId,
+    AVG(CAST(Rate AS SIGNED)),
+    ROUND(COALESCE(AVG(CAST(Rate AS SIGNED)), 0)),
+    COUNT(DISTINCT ID)
+FROM librate
+GROUP BY BookId;
+SELECT 'book_stats filled with rates' AS OperationStatus;
+
+-- Рекомендации
+INSERT INTO book_stats (BookId, RecsCount)
+SELECT bid, COUNT(DISTINCT id)
+FROM librecs
+GROUP BY bid
+ON DUPLICATE KEY UPDATE RecsCount = VALUES(RecsCount);
+SELECT 'book_stats filled with recs' AS OperationStatus;
+
+-- Отзывы
+INSERT INTO book_stats (BookId, ReviewsCount)
+SELECT BookId, COUNT(DISTINCT Time)
+FROM libreviews
+GROUP BY BookId
+ON DUPLICATE KEY UPDATE ReviewsCount = VALUES(ReviewsCount);
+SELECT 'book_stats filled with reviews' AS OperationStatus;
+
+SELECT COUNT(*) AS RecordsInsertedIntoBookStats FROM book_stats;
@@ -0,0 +1,96 @@
+-- -- КАРТОЧКИ КНИГ: ОДНА СТРОКА НА КНИГУ ДЛЯ get_book_info -- --
+-- Авторы, переводчики, жанры и серии хранятся JSON-массивами [{"id": .., "name": ..}]
+-- Требует book_stats (zz_45_fill_book_stats.sql). Удалённые книги тоже попадают: /b <id> показывает любую книгу
+DROP TABLE IF EXISTS book_cards;
+SELECT 'book_cards table dropped if existed' AS OperationStatus;
+
+CREATE TABLE book_cards (
+    BookId INT(10) UNSIGNED NOT NULL,
+    Title VARCHAR(255) NOT NULL DEFAULT '',
+    Year SMALLINT NOT NULL DEFAULT 0,
+    Lang VARCHAR(16) NOT NULL DEFAULT '',
+    SrcLang VARCHAR(16) NOT NULL DEFAULT '',
+    FileSize INT UNSIGNED NOT NULL DEFAULT 0,
+    Pages INT UNSIGNED NOT NULL DEFAULT 0,
+    CoverFile VARCHAR(255) NULL,
+    LibRate DECIMAL(6,4) NULL,
+    RateCount INT UNSIGNED NOT NULL DEFAULT 0,
+    RecsCount INT UNSIGNED NOT NULL DEFAULT 0,
+    ReviewsCount INT UNSIGNED NOT NULL DEFAULT 0,
+    Authors JSON NULL,
+    Translators JSON NULL,
+    Genres JSON NULL,
+    GenresEn JSON NULL,
+    Series JSON NULL,
+    PRIMARY KEY (BookId)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_unicode_ci;
+SELECT 'book_cards table created' AS OperationStatus;
+
+-- Каждый список агрегируется отдельно, чтобы не перемножать авторов, переводчиков, жанры и серии
+INSERT INTO book_cards (BookId, Title, Year, Lang, SrcLang, FileSize, Pages, CoverFile,
+                        LibRate, RateCount, RecsCount, ReviewsCount,
+                        Authors, Translators, Genres, GenresEn, Series)
+SELECT
+    b.BookID,
+    COALESCE(b.Title, ''),
+    COALESCE(b.Year, 0),
+    COALESCE(b.Lang, ''),
+    COALESCE(b.SrcLang, ''),
+    COALESCE(b.FileSize, 0),
+    COALESCE(b.Pages, 0),
+    bp.File,
+    st.LibRate,
+    COALESCE(st.RateCount, 0),
+    COALESCE(st.RecsCount, 0),
+    COALESCE(st.ReviewsCount, 0),
+    au.Authors,
+    tr.Translators,
+    gr.Genres,
+    gr.GenresEn,
+    sq.Series
+FROM libbook b
+LEFT JOIN (
+    SELECT BookID, MIN(File) AS File
+    FROM libbpics
+    GROUP BY BookID
+) bp ON bp.BookID = b.BookID
+LEFT JOIN book_stats st ON st.BookId = b.BookID
+LEFT JOIN (
+    SELECT a.BookID,
+           JSON_ARRAYAGG(DISTINCT JSON_OBJECT(
+               'id', an.AvtorID,
+               'name', CONCAT_WS(' ', NULLIF(an.LastName, ''), NULLIF(an.FirstName, ''), NULLIF(an.MiddleName, ''))
+           )) AS Authors
+    FROM libavtor a
+    JOIN libavtorname an ON an.AvtorID = a.AvtorID
+    GROUP BY a.BookID
+) au ON au.BookID = b.BookID
+LEFT JOIN (
+    SELECT t.BookID,
+           JSON_ARRAYAGG(DISTINCT JSON_OBJECT(
+               'id', tn.AvtorID,
+               'name', CONCAT_WS(' ', NULLIF(tn.LastName, ''), NULLIF(tn.FirstName, ''), NULLIF(tn.MiddleName, ''))
+           )) AS Translators
+    FROM libtranslator t
+    JOIN libavtorname tn ON tn.AvtorID = t.TranslatorID
+    GROUP BY t.BookID
+) tr ON tr.BookID = b.BookID
+LEFT JOIN (
+    SELECT g.BookID,
+           JSON_ARRAYAGG(DISTINCT JSON_OBJECT('id', gl.GenreID, 'name', gl.GenreDesc)) AS Genres,
+           JSON_ARRAYAGG(DISTINCT JSON_OBJECT('id', gle.GenreID, 'name', gle.GenreDesc)) AS GenresEn
+    FROM libgenre g
+    JOIN libgenrelist gl ON gl.GenreID = g.GenreID
+    LEFT JOIN cb_libgenrelist_en gle ON gle.GenreID = g.GenreID
+    GROUP BY g.BookID
+) gr ON gr.BookID = b.BookID
+LEFT JOIN (
+    SELECT s.BookID,
+           JSON_ARRAYAGG(DISTINCT JSON_OBJECT('id', sn.SeqID, 'name', sn.SeqName)) AS Series
+    FROM libseq s
+    JOIN libseqname sn ON sn.SeqID = s.SeqID
+    GROUP BY s.BookID
+) sq ON sq.BookID = b.BookID;
+
+SELECT 'book_cards table filled with data' AS OperationStatus;
+SELECT COUNT(*) AS RecordsInsertedIntoBookCards FROM book_cards;
@@ -0,0 +1,33 @@
+-- -- ПРЕДРАССЧИТАННЫЕ КОЛОНКИ ФИЛЬТРОВ ПОИСКА В libbook -- --
+-- PrimaryGenreID - основной (минимальный) жанр книги, SizeBucket - категория размера
+-- (0 - неизвестен, 1 - до 800 КБ, 2 - больше 800 КБ), RoundedRate - округлённая оценка из book_stats.
+-- Колонки переезжают в cb_libbook вместе с таблицей при активации (activate_cb_tables).
+-- Требует book_stats (zz_45_fill_book_stats.sql)
+ALTER TABLE libbook
+    ADD COLUMN IF NOT EXISTS PrimaryGenreID INT UNSIGNED NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS SizeBucket TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS RoundedRate TINYINT UNSIGNED NOT NULL DEFAULT 0;
+SELECT 'libbook filter columns added if not existed' AS OperationStatus;
+
+UPDATE libbook b
+LEFT JOIN (
+    SELECT BookID, MIN(GenreID) AS GenreID
+    FROM libgenre
+    GROUP BY BookID
+) g ON g.BookID = b.BookID
+LEFT JOIN book_stats st ON st.BookId = b.BookID
+SET b.PrimaryGenreID = COALESCE(g.GenreID, 0),
+    b.SizeBucket = CASE
+        WHEN b.FileSize IS NULL THEN 0
+        WHEN b.FileSize <= 819200 THEN 1  -- 800 * 1024
+        ELSE 2
+    END,
+    b.RoundedRate = COALESCE(st.RoundedRate, 0);
+SELECT 'libbook filter columns filled' AS OperationStatus;
+
+-- Все фильтры пользователя одним составным индексом, жанр - отдельно (фильтр по жанру без языка)
+CREATE INDEX IF NOT EXISTS idx_libbook_filters ON libbook (Deleted, Lang, SizeBucket, RoundedRate, PrimaryGenreID);
+CREATE INDEX IF NOT EXISTS idx_libbook_primary_genre ON libbook (PrimaryGenreID, Deleted);
+SELECT 'libbook filter indexes created' AS OperationStatus;
+
+SELECT SizeBucket, COUNT(*) AS BooksInSizeBucket FROM libbook GROUP BY SizeBucket;
@@ -62,6 +62,14 @@ SELECT 'Renamed cb_libaannotations to cb_libaannotations_old' AS OperationStatus
 RENAME TABLE IF EXISTS cb_libbook_fts TO cb_libbook_fts_old;
 SELECT 'Renamed cb_libbook_fts to cb_libbook_fts_old' AS OperationStatus;
 
+-- Агрегаты оценок/рекомендаций/отзывов
+RENAME TABLE IF EXISTS cb_book_stats TO cb_book_stats_old;
+SELECT 'Renamed cb_book_stats to cb_book_stats_old' AS OperationStatus;
+
+-- Карточки книг
+RENAME TABLE IF EXISTS cb_book_cards TO cb_book_cards_old;
+SELECT 'Renamed cb_book_cards to cb_book_cards_old' AS OperationStatus;
+
 SELECT 'Migration completed: All cb_lib* tables renamed to cb_lib*_old' AS OperationStatus;
 
 -- ============================================
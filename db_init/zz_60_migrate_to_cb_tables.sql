@@ -62,6 +62,14 @@ SELECT 'Renamed libaannotations to cb_libaannotations' AS OperationStatus;
 RENAME TABLE IF EXISTS libbook_fts TO cb_libbook_fts;
 SELECT 'Renamed libbook_fts to cb_libbook_fts' AS OperationStatus;
 
+-- Агрегаты оценок/рекомендаций/отзывов
+RENAME TABLE IF EXISTS book_stats TO cb_book_stats;
+SELECT 'Renamed book_stats to cb_book_stats' AS OperationStatus;
+
+-- Карточки книг
+RENAME TABLE IF EXISTS book_cards TO cb_book_cards;
+SELECT 'Renamed book_cards to cb_book_cards' AS OperationStatus;
+
 SELECT 'Migration completed: All lib* tables renamed to cb_lib*' AS OperationStatus;
 
 -- ============================================
@@ -0,0 +1,26 @@
+"""
+Общие настройки тестов
+
+Тесты не требуют MariaDB: если mysql-connector не установлен, вместо него подставляется
+пустой модуль, а соединения в тестах пула создаются фейковой фабрикой (monkeypatch connect).
+"""
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import mysql.connector  # noqa: F401
+except ImportError:
+    def _connect(**kwargs):
+        raise RuntimeError("mysql-connector is not installed")
+
+    mysql_module = types.ModuleType('mysql')
+    connector_module = types.ModuleType('mysql.connector')
+    connector_module.connect = _connect
+    connector_module.Error = Exception
+    mysql_module.connector = connector_module
+    sys.modules['mysql'] = mysql_module
+    sys.modules['mysql.connector'] = connector_module
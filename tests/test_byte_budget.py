@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.byte_budget import ByteBudget
+
+
+async def hold(budget, size, order, name, release):
+    """Держит резерв, пока тест не выставит release"""
+    async with budget.reserve(size):
+        order.append(name)
+        await release.wait()
+
+
+def test_reserve_and_release():
+    budget = ByteBudget('test', 100)
+
+    async def scenario():
+        async with budget.reserve(60):
+            assert budget.stats()['used_bytes'] == 60
+        assert budget.stats()['used_bytes'] == 0
+
+    asyncio.run(scenario())
+    assert budget.stats()['peak_bytes'] == 60
+
+
+def test_release_after_error_in_block():
+    budget = ByteBudget('test', 100)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            async with budget.reserve(60):
+                raise ValueError("send failed")
+
+    asyncio.run(scenario())
+    assert budget.stats()['used_bytes'] == 0
+
+
+def test_waits_until_budget_is_released():
+    budget = ByteBudget('test', 100)
+    order = []
+
+    async def scenario():
+        release_first, release_second = asyncio.Event(), asyncio.Event()
+        first = asyncio.ensure_future(hold(budget, 80, order, 'first', release_first))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(hold(budget, 50, order, 'second', release_second))
+        await asyncio.sleep(0)
+        assert order == ['first']
+        assert budget.stats()['waiting'] == 1
+
+        release_first.set()
+        await first
+        await asyncio.sleep(0)
+        assert order == ['first', 'second']
+        release_second.set()
+        await second
+
+    asyncio.run(scenario())
+    stats = budget.stats()
+    assert stats['peak_bytes'] == 80
+    assert stats['queued'] == 1
+    assert stats['used_bytes'] == 0
+
+
+def test_queue_is_fifo():
+    budget = ByteBudget('test', 100)
+    order = []
+
+    async def scenario():
+        releases = {name: asyncio.Event() for name in ('blocker', 'large', 'small')}
+        tasks = []
+        for name, size in (('blocker', 100), ('large', 100), ('small', 5)):
+            tasks.append(asyncio.ensure_future(hold(budget, size, order, name, releases[name])))
+            await asyncio.sleep(0)
+
+        releases['blocker'].set()
+        await tasks[0]
+        await asyncio.sleep(0)
+        # Маленький запрос не обгоняет большой, пришедший раньше, хотя для него хватило бы места
+        assert order == ['blocker', 'large']
+        releases['large'].set()
+        await tasks[1]
+        await asyncio.sleep(0)
+        assert order == ['blocker', 'large', 'small']
+        releases['small'].set()
+        await tasks[2]
+
+    asyncio.run(scenario())
+
+
+def test_oversized_reserve_is_capped():
+    budget = ByteBudget('test', 100)
+
+    async def scenario():
+        async with budget.reserve(500):
+            assert budget.stats()['used_bytes'] == 100
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_block_queue():
+    budget = ByteBudget('test', 100)
+    order = []
+
+    async def scenario():
+        release = asyncio.Event()
+        blocker = asyncio.ensure_future(hold(budget, 100, order, 'blocker', release))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(hold(budget, 100, order, 'waiter', release))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert budget.stats()['waiting'] == 0
+
+        release.set()
+        await blocker
+        async with budget.reserve(100):
+            pass
+
+    asyncio.run(scenario())
+    assert order == ['blocker']
+    assert budget.stats()['used_bytes'] == 0
+
+
+def test_disabled_budget_does_not_wait():
+    budget = ByteBudget('test', 0)
+
+    async def scenario():
+        async with budget.reserve(10 ** 9):
+            async with budget.reserve(10 ** 9):
+                pass
+
+    asyncio.run(scenario())
+    assert budget.stats()['used_bytes'] == 0
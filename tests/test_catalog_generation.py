@@ -0,0 +1,40 @@
+from app.catalog_generation import ALL_CACHES, CACHE_CARDS, CACHE_FILES, CACHE_GENRES, CACHE_LEADERBOARDS, \
+    CACHE_RESULTS, CACHE_REVIEWS, CACHE_STATS, affected_caches, changed_tables
+
+ALL_TABLES = {'libbook', 'libbook_fts', 'libavtor', 'libavtorname', 'libtranslator', 'libseq', 'libseqname',
+              'libgenre', 'libgenrelist', 'book_stats', 'book_cards', 'librecs', 'libreviews', 'libbannotations',
+              'libaannotations', 'libbpics', 'libapics'}
+
+
+def test_changed_tables():
+    old = {'libbook': 3, 'libreviews': 5, 'libseq': 1}
+    new = {'libbook': 3, 'libreviews': 6, 'book_stats': 1}
+
+    assert changed_tables(old, new) == {'libreviews', 'libseq', 'book_stats'}
+    assert changed_tables(old, dict(old)) == set()
+
+
+def test_libbook_affects_every_cache_but_reviews():
+    assert affected_caches(['libbook']) == ALL_CACHES - {CACHE_REVIEWS}
+
+
+def test_reviews_affect_reviews_and_leaderboards():
+    assert affected_caches(['libreviews']) == {CACHE_REVIEWS, CACHE_LEADERBOARDS}
+
+
+def test_aux_tables():
+    assert affected_caches(['book_stats']) == {CACHE_LEADERBOARDS, CACHE_RESULTS, CACHE_CARDS}
+    assert affected_caches(['book_cards']) == {CACHE_CARDS}
+    assert affected_caches(['libgenre']) == {CACHE_GENRES, CACHE_LEADERBOARDS, CACHE_RESULTS}
+
+
+def test_files_depend_only_on_libbook():
+    caches = affected_caches(ALL_TABLES - {'libbook'})
+
+    assert CACHE_FILES not in caches
+    assert CACHE_STATS in caches
+
+
+def test_unknown_or_no_tables():
+    assert affected_caches([]) == set()
+    assert affected_caches(['libdonations']) == set()
@@ -0,0 +1,55 @@
+from collections import namedtuple
+
+import pytest
+
+from app.result_sessions import ColumnarResultSet
+
+Row = namedtuple('Row', ['BookID', 'Title', 'Author', 'Rate', 'Relevance'])
+NUMERIC = {'BookID': ('L', False), 'Rate': ('B', True), 'Relevance': ('d', False)}
+ROWS = [
+    Row(10, 'Война и мир', 'Толстой', 5, 1.5),
+    Row(11, 'Анна Каренина', 'Толстой', None, 1.25),
+    Row(12, None, 'Чехов', 3, 0),
+]
+
+
+@pytest.fixture
+def result():
+    return ColumnarResultSet(Row, NUMERIC, ROWS)
+
+
+def test_rows_round_trip(result):
+    assert len(result) == 3
+    assert list(result) == ROWS
+    assert result[0] == ROWS[0]
+    assert result[-1] == ROWS[-1]
+
+
+def test_slice_returns_rows(result):
+    assert result[1:] == ROWS[1:]
+    assert result[:0] == []
+
+
+def test_index_out_of_range(result):
+    with pytest.raises(IndexError):
+        result[3]
+
+
+def test_numeric_null_and_zero(result):
+    # Оценка: 0 при чтении - NULL; релевантность: 0 остаётся 0
+    assert result[1].Rate is None
+    assert result[2].Relevance == 0.0
+
+
+def test_repeated_strings_stored_once(result):
+    assert result._strings.count('Толстой') == 1
+    assert result.column('BookID').tolist() == [10, 11, 12]
+
+
+def test_empty_result():
+    empty = ColumnarResultSet(Row, NUMERIC)
+
+    assert len(empty) == 0
+    assert not empty
+    assert list(empty) == []
+    assert empty.estimated_size() > 0
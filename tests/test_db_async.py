@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.db_async import DBBusyError, DBExecutor
+
+
+class Blocker:
+    """Вызов, который занимает поток executor'а, пока тест его не отпустит"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        return self.release.wait(5)
+
+    async def wait_started(self):
+        assert await asyncio.to_thread(self.started.wait, 5)
+
+
+@pytest.fixture
+def executor():
+    executor = DBExecutor(max_workers=1, call_timeout=5, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_run_returns_result(executor):
+    assert asyncio.run(executor.run(lambda a, b: a + b, 2, 3)) == 5
+    assert executor.stats()['completed'] == 1
+
+
+def test_run_propagates_exception(executor):
+    def fail():
+        raise ValueError("bad query")
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.run(fail))
+    assert executor.stats()['failed'] == 1
+
+
+def test_rejects_when_queue_is_full(executor):
+    blocker = Blocker()
+
+    async def scenario():
+        # Первый вызов занимает поток, второй ждёт в очереди, третий отклоняется
+        running = asyncio.ensure_future(executor.run(blocker))
+        await blocker.wait_started()
+        queued = asyncio.ensure_future(executor.run(lambda: 'queued'))
+        await asyncio.sleep(0)
+        assert executor.stats()['queued'] == 1
+        with pytest.raises(DBBusyError):
+            await executor.run(lambda: 'rejected')
+        blocker.release.set()
+        return await running, await queued
+
+    try:
+        assert asyncio.run(scenario()) == (True, 'queued')
+    finally:
+        blocker.release.set()
+    stats = executor.stats()
+    assert stats['rejected'] == 1
+    assert stats['queued'] == 0
+
+
+def test_cancel_while_queued_removes_call(executor):
+    blocker = Blocker()
+    calls = []
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(blocker))
+        await blocker.wait_started()
+        queued = asyncio.ensure_future(executor.run(calls.append, 'queued'))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        # Место в очереди освободилось сразу, а не после выполнения вызова
+        assert executor.stats()['queued'] == 0
+        blocker.release.set()
+        await running
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        blocker.release.set()
+    executor.shutdown()
+    assert calls == []
+
+
+def test_timeout_while_queued_removes_call(executor):
+    blocker = Blocker()
+    calls = []
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(blocker))
+        await blocker.wait_started()
+        # Поток занят, пока тест не отпустит blocker, поэтому вызов гарантированно не дождётся очереди
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(calls.append, 'queued', timeout=0.01)
+        assert executor.stats()['queued'] == 0
+        blocker.release.set()
+        await running
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        blocker.release.set()
+    executor.shutdown()
+    assert calls == []
+    assert executor.stats()['timeouts'] == 1
@@ -0,0 +1,172 @@
+import threading
+
+import pytest
+
+from app import db_pool
+from app.db_pool import MariaDBPool, PoolExhaustedError
+
+
+class FakeConnection:
+    """Соединение mysql-connector с нужными пулу атрибутами"""
+
+    def __init__(self, fail_reset=False, fail_ping=False):
+        self.unread_result = False
+        self.in_transaction = False
+        self.fail_reset = fail_reset
+        self.fail_ping = fail_ping
+        self.closed = False
+        self.resets = 0
+
+    def reset_session(self):
+        if self.fail_reset:
+            raise RuntimeError("connection lost")
+        self.resets += 1
+
+    def ping(self, reconnect=False):
+        if self.fail_ping:
+            raise RuntimeError("connection lost")
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Список созданных пулом соединений"""
+    created = []
+
+    def connect(**kwargs):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_pool.mysql.connector, 'connect', connect, raising=False)
+    return created
+
+
+def test_reuses_idle_connection(connections):
+    pool = MariaDBPool({}, size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(connections) == 1
+    # Сессия сбрасывается при каждом возврате в пул
+    assert first.resets == 2
+
+
+def test_acquire_timeout_when_exhausted(connections):
+    pool = MariaDBPool({}, size=1, acquire_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolExhaustedError):
+            with pool.connection():
+                pass
+
+    assert pool.stats()['timeouts'] == 1
+    # После таймаута место в пуле не потеряно
+    with pool.connection(timeout=0.05):
+        pass
+    assert pool.stats()['in_use'] == 0
+
+
+def test_waiter_gets_released_connection(connections):
+    pool = MariaDBPool({}, size=1, acquire_timeout=5)
+    waiter_done = threading.Event()
+    result = []
+
+    def wait_for_connection():
+        with pool.connection() as conn:
+            result.append(conn)
+        waiter_done.set()
+
+    with pool.connection():
+        waiter = threading.Thread(target=wait_for_connection)
+        waiter.start()
+        # Ожидающий поток не получит соединение, пока оно выдано
+        assert not waiter_done.wait(0.05)
+    waiter.join(5)
+
+    assert result == [connections[0]]
+    assert len(connections) == 1
+
+
+def test_recycles_expired_connection(connections):
+    pool = MariaDBPool({}, size=1, max_lifetime=0)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is not second
+    assert first.closed
+    assert pool.stats()['recycled'] >= 1
+
+
+def test_replaces_connection_failing_ping(connections):
+    pool = MariaDBPool({}, size=1, ping_after_idle=0)
+    with pool.connection() as first:
+        pass
+    first.fail_ping = True
+    with pool.connection() as second:
+        pass
+
+    assert second is not first
+    assert first.closed
+    assert pool.stats()['broken'] == 1
+
+
+def test_drops_connection_failing_reset(connections):
+    pool = MariaDBPool({}, size=1)
+    with pool.connection() as first:
+        first.fail_reset = True
+    with pool.connection() as second:
+        pass
+
+    assert second is not first
+    assert first.closed
+    stats = pool.stats()
+    assert stats['broken'] == 1
+    assert stats['in_use'] == 0
+
+
+def test_releases_connection_after_error_in_block(connections):
+    pool = MariaDBPool({}, size=1, acquire_timeout=0.05)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("query failed")
+
+    with pool.connection() as conn:
+        assert conn is connections[0]
+    assert pool.stats()['in_use'] == 0
+
+
+def test_releases_slot_when_connect_fails(monkeypatch):
+    def connect(**kwargs):
+        raise RuntimeError("server is down")
+
+    monkeypatch.setattr(db_pool.mysql.connector, 'connect', connect, raising=False)
+    pool = MariaDBPool({}, size=1, acquire_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                pass
+
+    assert pool.stats()['in_use'] == 0
+    assert pool.stats()['timeouts'] == 0
+
+
+def test_close_rejects_new_connections(connections):
+    pool = MariaDBPool({}, size=1)
+    with pool.connection() as conn:
+        pass
+    pool.close()
+
+    assert conn.closed
+    with pytest.raises(db_pool.PoolClosedError):
+        with pool.connection():
+            pass
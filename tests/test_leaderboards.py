@@ -0,0 +1,59 @@
+from app.constants import SIZE_BUCKET_LESS800, SIZE_BUCKET_MORE800
+from app.leaderboards import Leaderboard
+
+# (BookID, Lang, SizeBucket, RoundedRate, PrimaryGenreID, Relevance) по убыванию Relevance
+ROWS = [
+    (1, 'ru', SIZE_BUCKET_MORE800, 5, 10, 10.0),
+    (2, 'en', SIZE_BUCKET_LESS800, 4, 11, 9.5),
+    (3, 'RU', SIZE_BUCKET_LESS800, 4, 11, 9.0),
+    (4, 'ru', SIZE_BUCKET_MORE800, 3, 10, 8.0),
+    (5, 'en', SIZE_BUCKET_MORE800, 5, 12, 7.0),
+]
+
+
+def test_select_filters_rows_in_order():
+    leaderboard = Leaderboard(ROWS, depth=100)
+
+    assert leaderboard.select(None, None, None, None, 10) == [
+        (1, 10.0), (2, 9.5), (3, 9.0), (4, 8.0), (5, 7.0)]
+    assert leaderboard.select('RU', None, None, None, 10) == [(1, 10.0), (3, 9.0), (4, 8.0)]
+    assert leaderboard.select(None, 'more800', '5', None, 10) == [(1, 10.0), (5, 7.0)]
+    assert leaderboard.select(None, None, None, '11,12', 2) == [(2, 9.5), (3, 9.0)]
+
+
+def test_unknown_language_is_empty():
+    assert Leaderboard(ROWS, depth=100).select('de', None, None, None, 10) == []
+
+
+def test_truncated_language_with_full_page_is_exact():
+    # В рейтинг попали только 3 лучшие книги ru: отброшенные не выше 8.0
+    leaderboard = Leaderboard(ROWS, depth=3)
+
+    assert leaderboard.select('ru', None, None, None, 2) == [(1, 10.0), (3, 9.0)]
+
+
+def test_truncated_language_with_short_page_needs_live_query():
+    leaderboard = Leaderboard(ROWS, depth=3)
+
+    # Отфильтрованных книг меньше limit: среди отброшенных могли быть подходящие
+    assert leaderboard.select('ru', None, '5', None, 2) is None
+    assert leaderboard.select('ru', None, None, None, 3) is None
+
+
+def test_tie_with_cutoff_needs_live_query():
+    rows = [(1, 'ru', 0, 5, 10, 10.0), (2, 'ru', 0, 5, 10, 8.0)]
+    leaderboard = Leaderboard(rows, depth=2)
+
+    # Отброшенная книга могла иметь ту же релевантность, что и последняя выбранная
+    assert leaderboard.select('ru', None, None, None, 2) is None
+    assert leaderboard.select('ru', None, None, None, 1) == [(1, 10.0)]
+
+
+def test_any_language_checks_every_truncated_language():
+    rows = [row for row in ROWS if row[0] != 4]
+    leaderboard = Leaderboard(rows, depth=2)
+
+    # Обрезаны оба языка: en на 7.0, ru на 9.0
+    assert leaderboard.select(None, None, None, None, 2) == [(1, 10.0), (2, 9.5)]
+    assert leaderboard.select(None, None, None, None, 3) is None
+    assert leaderboard.select('en', None, None, None, 1) == [(2, 9.5)]
@@ -0,0 +1,68 @@
+from collections import namedtuple
+
+from app.result_sessions import BookResultSession, BookRowCache, ColumnarResultSet, SearchFingerprint
+
+Book = namedtuple('Book', ['FileName', 'Title'])
+
+
+def make_session(count: int, page_size: int) -> BookResultSession:
+    return BookResultSession(range(1, count + 1), page_size, SearchFingerprint(query='толстой'))
+
+
+def test_page_ids():
+    session = make_session(25, 10)
+
+    assert len(session) == 25
+    assert session.pages_count == 3
+    assert session.page_ids(0) == list(range(1, 11))
+    assert session.page_ids(2) == list(range(21, 26))
+
+
+def test_page_ids_out_of_range():
+    session = make_session(25, 10)
+
+    assert session.page_ids(3) == []
+    assert session.page_ids(-1) == []
+
+
+def test_empty_session():
+    session = make_session(0, 10)
+
+    assert session.pages_count == 0
+    assert session.page_ids(0) == []
+
+
+def test_page_size_at_least_one():
+    session = make_session(3, 0)
+
+    assert session.pages_count == 3
+    assert session.page_ids(1) == [2]
+
+
+def test_from_books_keeps_order():
+    books = [Book(7, 'a'), Book(3, 'b'), Book(5, 'c')]
+    columnar = ColumnarResultSet(Book, {'FileName': ('L', False)}, books)
+
+    for source in (books, columnar):
+        session = BookResultSession.from_books(source, 2, SearchFingerprint())
+        assert session.page_ids(0) == [7, 3]
+        assert session.page_ids(1) == [5]
+
+
+def test_row_key_depends_on_person_and_series():
+    by_author = BookResultSession([1], 10, SearchFingerprint(author_id=4))
+    by_series = BookResultSession([1], 10, SearchFingerprint(series_id=9))
+    popular = BookResultSession([1], 10, SearchFingerprint(days_back=30, author_id=4))
+
+    assert by_author.row_key(1) != by_series.row_key(1)
+    assert popular.row_key(1) == (1, 'ru')
+
+
+def test_row_cache_evicts_least_recent():
+    cache = BookRowCache(max_rows=2)
+    cache.put_many([('a', 1), ('b', 2)])
+    assert cache.get_many(['a']) == {'a': 1}
+    cache.put_many([('c', 3)])
+
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,65 @@
+from app.review_pages import BookReviewPages, ReviewPageCache, next_cursor
+
+T1, T2, T3 = '2024-03-01 10:00:00', '2024-02-01 10:00:00', '2024-01-01 10:00:00'
+
+
+def test_cursor_after_distinct_times():
+    rows = [('anna', T1, 'a'), ('boris', T2, 'b')]
+
+    assert next_cursor(None, rows) == (T2, ('boris',))
+
+
+def test_cursor_keeps_every_name_with_last_time():
+    rows = [('anna', T1, 'a'), ('boris', T2, 'b'), ('vera', T2, 'c')]
+
+    assert next_cursor(None, rows) == (T2, ('boris', 'vera'))
+
+
+def test_cursor_accumulates_names_when_page_has_same_time():
+    # Вся страница пришлась на тот же Time, что и конец предыдущей
+    cursor = (T2, ('boris', 'vera'))
+    rows = [('gleb', T2, 'd'), ('dina', T2, 'e')]
+
+    assert next_cursor(cursor, rows) == (T2, ('boris', 'vera', 'gleb', 'dina'))
+
+
+def test_cursor_resets_names_on_new_time():
+    cursor = (T2, ('boris', 'vera'))
+    rows = [('gleb', T2, 'd'), ('dina', T3, 'e')]
+
+    assert next_cursor(cursor, rows) == (T3, ('dina',))
+
+
+def test_pages_has_more():
+    pages = BookReviewPages()
+    assert pages.has_more(0)
+
+    pages.pages.append('first')
+    pages.complete = True
+    assert pages.has_page(0)
+    assert not pages.has_page(1)
+    assert not pages.has_more(0)
+
+
+def test_cache_evicts_least_recent_book():
+    cache = ReviewPageCache(max_books=2)
+    first = cache.get(1)
+    cache.get(2)
+    assert cache.get(1) is first
+    cache.get(3)
+
+    # Вытеснена книга 2: к книге 1 обращались позже
+    assert cache.get(1) is first
+    stats = cache.stats()
+    assert stats['books'] == 2
+    assert stats['evictions'] == 1
+
+
+def test_cache_clear():
+    cache = ReviewPageCache(max_books=2)
+    cache.get(1).pages.append('page')
+    cache.clear()
+
+    stats = cache.stats()
+    assert stats['books'] == 0
+    assert stats['pages'] == 0
@@ -0,0 +1,39 @@
+import pytest
+
+# app.database тянет за собой клиент сайта и обработчики Telegram
+pytest.importorskip('aiohttp')
+pytest.importorskip('bs4')
+pytest.importorskip('telegram')
+
+from app.constants import SIZE_BUCKET_LESS800, SIZE_BUCKET_MORE800  # noqa: E402
+from app.database import DatabaseBooks  # noqa: E402
+
+build_sql_where_inner = DatabaseBooks.build_sql_where_inner
+
+
+def test_no_filters():
+    assert build_sql_where_inner(None, None) == ('', [])
+
+
+def test_all_filters_are_parameters():
+    sql, params = build_sql_where_inner('RU', 'more800', '4,5', series_id=7, author_id=3, genre_filter='12')
+
+    assert sql == ("AND b.Lang = %s AND b.SizeBucket = %s AND b.RoundedRate IN (%s, %s) "
+                   "AND b.PrimaryGenreID IN (%s) AND s.SeqID = %s AND a.AvtorID = %s ")
+    assert params == ['ru', SIZE_BUCKET_MORE800, 4, 5, 12, 7, 3]
+
+
+def test_translator_filter():
+    sql, params = build_sql_where_inner(None, 'less800', author_id=9, person_type='translator')
+
+    assert sql == "AND b.SizeBucket = %s AND t.TranslatorID = %s "
+    assert params == [SIZE_BUCKET_LESS800, 9]
+
+
+@pytest.mark.parametrize('value', ['', ' ', '4;DROP TABLE', '4, 5'])
+def test_invalid_id_filters_are_ignored(value):
+    assert build_sql_where_inner(None, None, rating_filter=value, genre_filter=value) == ('', [])
+
+
+def test_unknown_size_is_ignored():
+    assert build_sql_where_inner(None, 'huge') == ('', [])
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_fetch():
+    flight = SingleFlight('test', wait_timeout=5)
+    calls = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await gate.wait()
+            return 'book'
+
+        waiters = [asyncio.ensure_future(flight.run('key', fetch)) for _ in range(5)]
+        # Все ожидающие присоединились к одному запросу, пока он не завершён
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == ['book'] * 5
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert stats['started'] == 1
+    assert stats['coalesced'] == 4
+    assert stats['in_flight'] == 0
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight('test', wait_timeout=5)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def fetch():
+            await gate.wait()
+            raise ValueError("site is down")
+
+        waiters = [asyncio.ensure_future(flight.run('key', fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+    stats = flight.stats()
+    assert stats['started'] == 1
+    assert stats['errors'] == 1
+
+
+def test_next_call_after_error_fetches_again():
+    flight = SingleFlight('test', wait_timeout=5)
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("site is down")
+        return 'book'
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await flight.run('key', fetch)
+        return await flight.run('key', fetch)
+
+    assert asyncio.run(scenario()) == 'book'
+    assert len(attempts) == 2
+
+
+def test_timeout_of_one_waiter_keeps_fetch_for_others():
+    flight = SingleFlight('test', wait_timeout=5)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def fetch():
+            await gate.wait()
+            return 'book'
+
+        patient = asyncio.ensure_future(flight.run('key', fetch))
+        await asyncio.sleep(0)
+        # Запрос не завершится, пока тест не откроет gate, поэтому этот ожидающий точно не дождётся
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flight.run('key', fetch), 0.01)
+        gate.set()
+        return await patient
+
+    assert asyncio.run(scenario()) == 'book'
+
+
+def test_fetch_cancelled_without_waiters():
+    flight = SingleFlight('test', wait_timeout=0.01)
+
+    async def scenario():
+        cancelled = asyncio.get_running_loop().create_future()
+
+        async def fetch():
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set_result(True)
+                raise
+
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.run('key', fetch)
+        return await asyncio.wait_for(cancelled, 5)
+
+    assert asyncio.run(scenario()) is True
+    assert flight.stats()['timeouts'] == 1
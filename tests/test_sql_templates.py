@@ -0,0 +1,61 @@
+import pytest
+
+from app.sql_templates import MIN_IDS_BUCKET, QueryTemplates, id_list, pad_ids, placeholders
+
+
+def test_placeholders():
+    assert placeholders(1) == '%s'
+    assert placeholders(3) == '%s, %s, %s'
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('4,5', [4, 5]),
+    ('12', [12]),
+    ('4,,5,', [4, 5]),
+    (None, []),
+    ('', []),
+    ('  ', []),
+    ('4, 5', []),
+    ('1 OR 1=1', []),
+    ('-1', []),
+])
+def test_id_list(value, expected):
+    assert id_list(value) == expected
+
+
+def test_pad_ids_to_min_bucket():
+    padded = pad_ids([1, 2, 3])
+
+    assert len(padded) == MIN_IDS_BUCKET
+    assert padded[:3] == [1, 2, 3]
+    assert set(padded[3:]) == {3}
+
+
+def test_pad_ids_to_power_of_two():
+    ids = list(range(MIN_IDS_BUCKET + 1))
+
+    assert len(pad_ids(ids)) == MIN_IDS_BUCKET * 2
+    assert len(pad_ids(list(range(MIN_IDS_BUCKET * 2)))) == MIN_IDS_BUCKET * 2
+
+
+def test_pad_ids_keeps_empty_list():
+    assert pad_ids([]) == []
+
+
+def test_templates_built_once_per_key():
+    templates = QueryTemplates()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return 'SELECT 1'
+
+    assert templates.get(('books', 1), build) == 'SELECT 1'
+    assert templates.get(('books', 1), build) == 'SELECT 1'
+    assert templates.get(('books', 2), build) == 'SELECT 1'
+
+    assert len(builds) == 2
+    stats = templates.stats()
+    assert stats['templates'] == 2
+    assert stats['template_hits'] == 1
+    assert stats['template_misses'] == 2